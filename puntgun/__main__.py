@@ -96,6 +96,27 @@ def secrets(**kwargs: str) -> None:
     commands.Gen.secrets(cfg.CommandArg.arg_dict_to_enum_dict(**kwargs))
 
 
+@gen.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    cfg.CommandArg.PRIVATE_KEY_FILE.to_arg(),
+    default=cfg.CommandArg.PRIVATE_KEY_FILE.value,
+    show_default=True,
+    help="Password protected private key file which will be used to encrypt the secrets file.",
+)
+@click.option(
+    cfg.CommandArg.SECRETS_FILE.to_arg(),
+    default=cfg.CommandArg.SECRETS_FILE.value,
+    show_default=True,
+    help="Ciphertext file that will contain encrypted secrets.",
+)
+def extra_credentials(**kwargs: str) -> None:
+    """
+    Add one more Twitter API credential set into the secrets file,
+    read-only queries are spread over all credential sets' rate limit quotas.
+    """
+    commands.Gen.extra_credentials(cfg.CommandArg.arg_dict_to_enum_dict(**kwargs))
+
+
 @gen.command(context_settings=CONTEXT_SETTINGS)
 @click.option(
     cfg.CommandArg.PRIVATE_KEY_FILE.to_arg(),
@@ -167,14 +188,92 @@ def check() -> None:
     show_default=True,
     help="Plan configuration file to be checked.",
 )
-def plan(**kwargs: str) -> None:
+@click.option(
+    "--estimate",
+    is_flag=True,
+    help="Also predict API calls per endpoint and the minimum running time of plans, "
+    "according to rate limits and relationship list sizes known from former runs.",
+)
+def plan(estimate: bool, **kwargs: str) -> None:
     """Validate syntax of plan configuration file."""
-    commands.Check.plan(cfg.CommandArg.arg_dict_to_enum_dict(**kwargs))
+    commands.Check.plan(cfg.CommandArg.arg_dict_to_enum_dict(**kwargs), estimate)
+
+
+@click.group(context_settings=CONTEXT_SETTINGS)
+def agent() -> None:
+    """
+    Manage the local secrets agent, which unlocks the private key once
+    and serves decrypted secrets to the tool's later invocations (e.g. scheduled runs),
+    so they needn't enter the password and decrypt secrets again.
+    """
+    pass
+
+
+@agent.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    cfg.CommandArg.CONFIG_PATH.to_arg(),
+    default=cfg.CommandArg.CONFIG_PATH.value,
+    show_default=True,
+    help="Base path of the tool's files, the agent's socket file is created under it.",
+)
+@click.option(
+    cfg.CommandArg.SETTINGS_FILE.to_arg(),
+    default=cfg.CommandArg.SETTINGS_FILE.value,
+    show_default=True,
+    help="Tool settings file that control tool behaviors.",
+)
+@click.option(
+    cfg.CommandArg.PRIVATE_KEY_FILE.to_arg(),
+    default=cfg.CommandArg.PRIVATE_KEY_FILE.value,
+    show_default=True,
+    help="Password protected private key file which was used to encrypt the secrets file.",
+)
+@click.option(
+    cfg.CommandArg.SECRETS_FILE.to_arg(),
+    default=cfg.CommandArg.SECRETS_FILE.value,
+    show_default=True,
+    help="Ciphertext file which contains encrypted secrets.",
+)
+@click.option(
+    "--ttl-hours",
+    type=float,
+    default=None,
+    help="How long (in hours) the agent serves secrets before exiting, default to the setting [agent_ttl_hours].",
+)
+@click.option("--foreground", is_flag=True, help="Keep the agent running in the foreground instead of detaching.")
+def start(ttl_hours: float | None, foreground: bool, **kwargs: str) -> None:
+    """Unlock secrets and start the agent in the background."""
+    commands.Agent.start(cfg.CommandArg.arg_dict_to_enum_dict(**kwargs), ttl_hours, foreground)
+
+
+@agent.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    cfg.CommandArg.CONFIG_PATH.to_arg(),
+    default=cfg.CommandArg.CONFIG_PATH.value,
+    show_default=True,
+    help="Base path of the tool's files, where the agent's socket file is.",
+)
+def stop(**kwargs: str) -> None:
+    """Stop the running agent, it forgets the secrets."""
+    commands.Agent.stop(cfg.CommandArg.arg_dict_to_enum_dict(**kwargs))
+
+
+@agent.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    cfg.CommandArg.CONFIG_PATH.to_arg(),
+    default=cfg.CommandArg.CONFIG_PATH.value,
+    show_default=True,
+    help="Base path of the tool's files, where the agent's socket file is.",
+)
+def status(**kwargs: str) -> None:
+    """Show whether the agent is running and when it expires."""
+    commands.Agent.status(cfg.CommandArg.arg_dict_to_enum_dict(**kwargs))
 
 
 cli.add_command(fire)
 cli.add_command(gen)
 cli.add_command(check)
+cli.add_command(agent)
 
 if __name__ == "__main__":
     cli()
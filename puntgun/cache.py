@@ -0,0 +1,470 @@
+"""
+Local caches of Twitter entities for saving API invocations across plans and runs.
+
+Recurring plans usually query the same group of accounts again and again,
+so the users looked up are kept in a tiered cache:
+an in-process LRU map in front of an (optional) on-disk SQLite store,
+both indexed by user id and by username.
+Users looked up with only part of the fields (see :func:`puntgun.client.user_api_params`)
+are cached with the attributes they have, and only serve lookups needing a subset of them.
+Users that don't exist are remembered too, for not looking them up again.
+
+Relationship lists (blocked, follower, following) are mirrored in another SQLite store,
+only the changed head of the lists needs to be queried on latter runs.
+"""
+from __future__ import annotations
+
+import collections
+import itertools
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Generic, Hashable, Iterable, Iterator, TypeVar
+
+import orjson
+from loguru import logger
+
+from puntgun.conf import config
+from puntgun.rules.data import User, update_user_class_ref
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# User attributes that aren't persisted across runs:
+# relationships with current account may be changed by the user (or former runs) since they're queried.
+PER_RUN_FIELDS = {"connection_status"}
+
+# :class:`User` attributes a cached user has, None for all attributes.
+Attributes = frozenset[str] | None
+
+
+def covers(cached: Attributes, wanted: Attributes) -> bool:
+    """Whether a user cached with ``cached`` attributes can serve a lookup needing ``wanted`` ones."""
+    return cached is None or (wanted is not None and wanted <= cached)
+
+
+class LruCache(Generic[K, V]):
+    """
+    A thread-safe in-memory LRU map with size-based eviction and per-entry time-to-live.
+    """
+
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (stored time, value), least recently used at head
+        self._entries: collections.OrderedDict[K, tuple[float, V]] = collections.OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] + self.ttl < self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: K, value: V) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskUserStore:
+    """
+    Users (with the attributes they have) saved in a local SQLite database file, survive between runs.
+    Entries older than ``ttl`` seconds are ignored and purged,
+    when there are more than ``max_size`` users, the oldest entries are evicted
+    down to a low-water mark, so eviction happens once in many puts instead of on every put.
+    """
+
+    # evict down to this ratio of the max size
+    LOW_WATER = 0.9
+
+    def __init__(self, file: Path, max_size: int, ttl: float, clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # rules query the client from reactivex threads
+        self._conn = sqlite3.connect(file, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS users "
+                "(id INTEGER PRIMARY KEY, username TEXT, data BLOB NOT NULL, cached_at REAL NOT NULL)"
+            )
+            # files written by former versions only have whole users
+            if "attributes" not in {c[1] for c in self._conn.execute("PRAGMA table_info(users)")}:
+                self._conn.execute("ALTER TABLE users ADD COLUMN attributes BLOB")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS users_username ON users (username)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS users_cached_at ON users (cached_at)")
+            self._conn.execute("DELETE FROM users WHERE cached_at < ?", (self._clock() - self.ttl,))
+            # counted once here, then tracked on puts
+            self._count = self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            self._evict_if_full()
+
+    def _query(self, column: str, keys: list[Any]) -> list[tuple[User, Attributes]]:
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data, attributes FROM users WHERE {column} IN ({placeholders}) AND cached_at >= ?",
+                (*keys, self._clock() - self.ttl),
+            ).fetchall()
+        return [
+            (User.parse_obj(orjson.loads(data)), None if attributes is None else frozenset(orjson.loads(attributes)))
+            for data, attributes in rows
+        ]
+
+    def get_by_ids(self, ids: list[int]) -> list[tuple[User, Attributes]]:
+        """:return: found users with their attributes"""
+        return self._query("id", ids)
+
+    def get_by_usernames(self, usernames: list[str]) -> list[tuple[User, Attributes]]:
+        return self._query("username", [n.lower() for n in usernames])
+
+    def put(self, users: Iterable[User], attributes: Attributes = None) -> None:
+        now = self._clock()
+        saved_attributes = None if attributes is None else orjson.dumps(sorted(attributes))
+        rows = [
+            (u.id, u.username.lower(), orjson.dumps(u.dict(exclude=PER_RUN_FIELDS)), now, saved_attributes)
+            for u in users
+        ]
+        if not rows:
+            return
+        ids = list({r[0] for r in rows})
+        with self._lock, self._conn:
+            # replacing existing users doesn't change the count, looking them up by primary key is cheap
+            existing = self._conn.execute(
+                f"SELECT COUNT(*) FROM users WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO users (id, username, data, cached_at, attributes) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._count += len(ids) - existing
+            self._evict_if_full()
+
+    def _evict_if_full(self) -> None:
+        """Call in a transaction with the lock held."""
+        if self._count <= self.max_size:
+            return
+        # other processes may have written the file too, count precisely before evicting
+        self._count = self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        if self._count <= self.max_size:
+            return
+        evicted = self._count - int(self.max_size * self.LOW_WATER)
+        # only walks the evicted part of the "cached_at" index
+        self._conn.execute(
+            "DELETE FROM users WHERE id IN (SELECT id FROM users ORDER BY cached_at LIMIT ?)", (evicted,)
+        )
+        self._count -= evicted
+        logger.debug("Evicted {} oldest users from the disk cache", evicted)
+
+
+class UserCache:
+    """
+    Tiered cache of looked up users, memory LRU first, then the on-disk store (if enabled).
+    Disk hits are promoted into the memory tier.
+
+    Lookups pass the attributes they need, users cached without some of them are misses,
+    along with their attributes, for querying them again with the cached attributes too,
+    so a user's cached attributes only grow.
+    """
+
+    def __init__(
+        self, memory_size: int, ttl: float, disk: DiskUserStore = None, clock: Callable[[], float] = time.time
+    ):
+        self._by_id: LruCache[int, tuple[User, Attributes]] = LruCache(memory_size, ttl, clock)
+        # usernames are case-insensitive, keys are lowercase ones
+        self._by_name: LruCache[str, tuple[User, Attributes]] = LruCache(memory_size, ttl, clock)
+        self._disk = disk
+
+    @staticmethod
+    def from_settings() -> UserCache | None:
+        """Build the cache from tool settings, return None when the cache is disabled."""
+        ttl = float(config.settings.get("user_cache_ttl_hours", 24)) * 3600
+        if ttl <= 0:
+            return None
+
+        disk = None
+        if config.settings.get("user_cache_on_disk", False):
+            disk_size = int(config.settings.get("user_cache_disk_size", 1000000))
+            disk = DiskUserStore(config.config_path.joinpath("user_cache.db"), disk_size, ttl)
+        return UserCache(int(config.settings.get("user_cache_memory_size", 100000)), ttl, disk)
+
+    def _remember(self, entries: Iterable[tuple[User, Attributes]]) -> None:
+        for u, attributes in entries:
+            self._by_id.put(u.id, (u, attributes))
+            self._by_name.put(u.username.lower(), (u, attributes))
+
+    def _get(
+        self,
+        keys: list[K],
+        memory: LruCache[K, tuple[User, Attributes]],
+        from_disk: Callable[[list[K]], list[tuple[User, Attributes]]],
+        key_of: Callable[[User], K],
+        attributes: Attributes,
+    ) -> tuple[dict[K, User], frozenset[str]]:
+        """:return: (hits, attributes of cached users that can't serve the lookup)"""
+        hits: dict[K, User] = {}
+        partial: set[str] = set()
+        for key in keys:
+            if (entry := memory.get(key)) is None:
+                continue
+            if covers(entry[1], attributes):
+                hits[key] = entry[0]
+            else:
+                partial |= entry[1] or set()
+
+        if self._disk and (pending := [k for k in keys if k not in hits]):
+            entries = from_disk(pending)
+            self._remember(entries)
+            for u, cached in entries:
+                if covers(cached, attributes):
+                    hits[key_of(u)] = u
+                else:
+                    partial |= cached or set()
+        return hits, frozenset(partial)
+
+    def get_by_ids(
+        self, ids: list[int | str], attributes: Attributes = None
+    ) -> tuple[dict[int, User], list[int | str], frozenset[str]]:
+        """
+        :param attributes: :class:`User` attributes the lookup needs, None for all attributes
+        :return: (hits keyed by id, missed ids, attributes missed users are cached with)
+        """
+        hits, partial = self._get([int(i) for i in ids], self._by_id, self._disk_get_by_ids, lambda u: u.id, attributes)
+        return hits, [i for i in ids if int(i) not in hits], partial
+
+    def get_by_usernames(
+        self, names: list[str], attributes: Attributes = None
+    ) -> tuple[dict[str, User], list[str], frozenset[str]]:
+        """:return: (hits keyed by lowercase username, missed usernames, attributes missed users are cached with)"""
+        hits, partial = self._get(
+            [n.lower() for n in names],
+            self._by_name,
+            self._disk_get_by_usernames,
+            lambda u: u.username.lower(),
+            attributes,
+        )
+        return hits, [n for n in names if n.lower() not in hits], partial
+
+    def _disk_get_by_ids(self, ids: list[int]) -> list[tuple[User, Attributes]]:
+        return self._disk.get_by_ids(ids) if self._disk else []
+
+    def _disk_get_by_usernames(self, names: list[str]) -> list[tuple[User, Attributes]]:
+        return self._disk.get_by_usernames(names) if self._disk else []
+
+    def put(self, users: list[User], attributes: Attributes = None) -> None:
+        """:param attributes: :class:`User` attributes the users are queried with, None for all attributes"""
+        self._remember((u, attributes) for u in users)
+        if self._disk:
+            self._disk.put(users, attributes)
+        logger.debug("Cached {} users", len(users))
+
+
+class MissingUserStore:
+    """
+    Ids and usernames of users that don't exist (deleted or suspended accounts) in a local SQLite database file,
+    so latter runs don't look them up again.
+    Entries older than ``ttl`` seconds are ignored and purged, since accounts can be restored or reinstated.
+    """
+
+    def __init__(self, file: Path, ttl: float, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS missing (parameter TEXT NOT NULL, value TEXT NOT NULL, "
+                "cached_at REAL NOT NULL, PRIMARY KEY (parameter, value))"
+            )
+            self._conn.execute("DELETE FROM missing WHERE cached_at < ?", (self._clock() - self.ttl,))
+
+    @staticmethod
+    def from_settings() -> MissingUserStore | None:
+        ttl = float(config.settings.get("missing_user_cache_ttl_hours", 720)) * 3600
+        if ttl <= 0:
+            return None
+        return MissingUserStore(config.config_path.joinpath("missing_users.db"), ttl)
+
+    @staticmethod
+    def _key(value: int | str) -> str:
+        # usernames are case-insensitive, ids may be given in string or int
+        return str(value).lower()
+
+    def exclude(self, parameter: str, values: list[Any]) -> list[Any]:
+        """
+        :param parameter: "ids" or "usernames", the parameter of users lookup APIs
+        :return: values that aren't known as missing users
+        """
+        if not values:
+            return values
+        keys = [self._key(v) for v in values]
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT value FROM missing WHERE parameter = ? AND value IN ({placeholders}) AND cached_at >= ?",
+                (parameter, *keys, self._clock() - self.ttl),
+            ).fetchall()
+        missing = {r[0] for r in rows}
+        if missing:
+            logger.debug("Skip looking up {} users known as not existing: {}", len(missing), sorted(missing))
+        return [v for v, k in zip(values, keys) if k not in missing]
+
+    def put(self, parameter: str, values: Iterable[Any]) -> None:
+        now = self._clock()
+        rows = [(parameter, self._key(v), now) for v in values]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO missing VALUES (?, ?, ?)", rows)
+
+
+class RelationshipMirror:
+    """
+    A persistent local copy of relationship lists, in newest-first order like the API responses.
+
+    On sync, pages are queried from the newest one and the querying stops as soon as a page
+    contains an already known user, only users before it are added to the mirror.
+    Removed relationships (unblocking, unfollowing) can't be found in this way,
+    so the whole list is re-queried every ``reconcile_interval`` seconds.
+    """
+
+    FILE_NAME = "relationship_mirror.db"
+
+    def __init__(self, file: Path, reconcile_interval: float, clock: Callable[[], float] = time.time):
+        self.reconcile_interval = reconcile_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file, check_same_thread=False)
+        with self._conn:
+            # "seq" is the position in the list, a bigger one is a newer relationship
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS relations (kind TEXT, owner INTEGER, seq INTEGER, id INTEGER, "
+                "data BLOB NOT NULL, PRIMARY KEY (kind, owner, id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS syncs "
+                "(kind TEXT, owner INTEGER, reconciled_at REAL, PRIMARY KEY (kind, owner))"
+            )
+
+    @staticmethod
+    def from_settings() -> RelationshipMirror | None:
+        """Return None if the mirror is turned off."""
+        if not config.settings.get("relationship_mirror", False):
+            return None
+        return RelationshipMirror._open()
+
+    @staticmethod
+    def existing() -> RelationshipMirror | None:
+        """Open the mirror file left by former runs even if the mirror is turned off now, None if there is none."""
+        if not config.config_path.joinpath(RelationshipMirror.FILE_NAME).exists():
+            return None
+        return RelationshipMirror._open()
+
+    @staticmethod
+    def _open() -> RelationshipMirror:
+        interval = float(config.settings.get("relationship_mirror_reconcile_hours", 168)) * 3600
+        return RelationshipMirror(config.config_path.joinpath(RelationshipMirror.FILE_NAME), interval)
+
+    def list_sizes(self) -> dict[str, tuple[int, bool]]:
+        """
+        Sizes of mirrored lists, of the owner reconciled most recently for each kind.
+        :return: kind -> (size, whether the next sync only queries new pages instead of reconciling)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.kind, s.reconciled_at, COUNT(r.id) FROM syncs s LEFT JOIN relations r "
+                "ON r.kind = s.kind AND r.owner = s.owner GROUP BY s.kind, s.owner ORDER BY s.reconciled_at"
+            ).fetchall()
+        now = self._clock()
+        # later rows (more recently reconciled owners) override earlier ones
+        return {kind: (size, reconciled_at + self.reconcile_interval >= now) for kind, reconciled_at, size in rows}
+
+    def sync(
+        self, kind: str, owner: int, full_loader: Callable[[], list[User]], newest_pages: Iterator[list[User]]
+    ) -> list[User]:
+        """
+        Bring the mirrored list up-to-date and return it.
+
+        :param kind: which relationship list, "blocked", "follower"...
+        :param owner: id of the user that the list belongs to
+        :param full_loader: query the whole list, for the first sync and reconciliations
+        :param newest_pages: lazily queried pages of the list, from the newest one
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reconciled_at FROM syncs WHERE kind = ? AND owner = ?", (kind, owner)
+            ).fetchone()
+
+        if row is None or row[0] + self.reconcile_interval < self._clock():
+            logger.info("Reconcile the whole mirrored [{}] list of user [{}]", kind, owner)
+            users = full_loader()
+            self._replace(kind, owner, users)
+            return users
+
+        known = self._known_ids(kind, owner)
+        new_users: list[User] = []
+        for page in newest_pages:
+            fresh = list(itertools.takewhile(lambda u: u.id not in known, page))
+            new_users.extend(fresh)
+            if len(fresh) < len(page):
+                break
+
+        logger.info("Found {} new users in mirrored [{}] list of user [{}]", len(new_users), kind, owner)
+        self._prepend(kind, owner, new_users)
+        return self._load(kind, owner)
+
+    def _known_ids(self, kind: str, owner: int) -> set[int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM relations WHERE kind = ? AND owner = ?", (kind, owner))
+            return {r[0] for r in rows}
+
+    def _load(self, kind: str, owner: int) -> list[User]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM relations WHERE kind = ? AND owner = ? ORDER BY seq DESC", (kind, owner)
+            ).fetchall()
+        return [User.parse_obj(orjson.loads(r[0])) for r in rows]
+
+    def _replace(self, kind: str, owner: int, users: list[User]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM relations WHERE kind = ? AND owner = ?", (kind, owner))
+            self._insert(kind, owner, users, 0)
+            self._conn.execute("INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)", (kind, owner, self._clock()))
+
+    def _prepend(self, kind: str, owner: int, users: list[User]) -> None:
+        if not users:
+            return
+        with self._lock, self._conn:
+            (top,) = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM relations WHERE kind = ? AND owner = ?", (kind, owner)
+            ).fetchone()
+            self._insert(kind, owner, users, top)
+
+    def _insert(self, kind: str, owner: int, users: list[User], base: int) -> None:
+        """The first user is the newest one, gets the biggest seq."""
+        size = len(users)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO relations VALUES (?, ?, ?, ?, ?)",
+            [
+                (kind, owner, base + size - i, u.id, orjson.dumps(u.dict(exclude=PER_RUN_FIELDS)))
+                for i, u in enumerate(users)
+            ],
+        )
+
+
+# the "pinned_tweet" forward reference must be resolved before parsing cached users.
+update_user_class_ref()
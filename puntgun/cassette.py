@@ -0,0 +1,155 @@
+"""
+Record/replay layer under the Twitter client, on the HTTP transport level.
+
+In "record" mode every request sent by tweepy and its response are appended to a local cassette file.
+In "replay" mode responses are served back from the cassette without network (and without secrets),
+so a production plan can be re-run offline for profiling and reproducible benchmarking
+against real payload shapes.
+"""
+from __future__ import annotations
+
+import collections
+import threading
+from pathlib import Path
+from typing import Any
+
+import orjson
+import requests
+from loguru import logger
+from requests.structures import CaseInsensitiveDict
+
+from puntgun.conf import config
+from puntgun.transport import TWITTER_API_HOST, TunedSession
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(Exception):
+    """The replaying request is not recorded in the cassette."""
+
+    def __init__(self, key: str):
+        super().__init__(f"Request not found in the cassette: {key}")
+
+
+def request_key(
+    method: str | bytes, url: str | bytes, params: dict | None = None, json: Any = None, base_url: str = None
+) -> str:
+    """
+    Identify a request by everything except the authentication headers
+    (OAuth 1.0a signatures differ on every request).
+
+    URLs under the configured ``base_url`` (e.g. the local stand-in server) are keyed as the official host's ones,
+    so a cassette recorded against any base URL replays the same requests.
+    """
+    method = method.decode("utf-8") if isinstance(method, bytes) else method
+    url = url.decode("utf-8") if isinstance(url, bytes) else url
+    if base_url and url.startswith(base_url.rstrip("/")):
+        url = TWITTER_API_HOST + url[len(base_url.rstrip("/")) :]
+    params = {k: str(v) for k, v in (params or {}).items()}
+    return orjson.dumps([method.upper(), url, params, json], option=orjson.OPT_SORT_KEYS).decode("utf-8")
+
+
+class Cassette:
+    """
+    A json lines file of recorded interactions, one interaction per line.
+    The same request recorded several times (e.g. the same page in two plans) is replayed in recorded order,
+    the last recorded response is repeated after that.
+    """
+
+    def __init__(self, file: Path):
+        self.file = file
+        self._lock = threading.Lock()
+        self._tapes: dict[str, collections.deque[dict]] = {}
+
+    def load(self) -> Cassette:
+        with open(self.file, "rb") as f:
+            for line in f:
+                if line.strip():
+                    interaction = orjson.loads(line)
+                    self._tapes.setdefault(interaction["key"], collections.deque()).append(interaction)
+        logger.info("Loaded {} recorded requests from cassette [{}]", len(self._tapes), self.file)
+        return self
+
+    def record(self, key: str, response: requests.Response) -> None:
+        interaction = {
+            "key": key,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "body": response.content.decode("utf-8"),
+        }
+        with self._lock, open(self.file, "ab") as f:
+            f.write(orjson.dumps(interaction) + b"\n")
+
+    def play(self, key: str, url: str) -> requests.Response:
+        with self._lock:
+            tape = self._tapes.get(key)
+            if not tape:
+                raise CassetteMissError(key)
+            interaction = tape.popleft() if len(tape) > 1 else tape[0]
+
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction["reason"]
+        # the content is already decoded when recording
+        response.headers = CaseInsensitiveDict(
+            {k: v for k, v in interaction["headers"].items() if k.lower() not in ("content-encoding", "content-length")}
+        )
+        response._content = interaction["body"].encode("utf-8")
+        response.url = url
+        response.encoding = "utf-8"
+        return response
+
+
+class RecordingSession(TunedSession):
+    """Sends requests as usual (to the base URL if given), and records them into the cassette."""
+
+    def __init__(self, cassette: Cassette, pool_size: int, timeout: tuple[float, float], base_url: str = None):
+        super().__init__(pool_size, timeout, base_url)
+        self.cassette = cassette
+
+    def request(
+        self, method: str | bytes, url: str | bytes, params: Any = None, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        response = super().request(method, url, params, *args, **kwargs)
+        key = request_key(method, url, params, kwargs.get("json"), self.base_url)
+        self.cassette.record(key, response)
+        return response
+
+
+class ReplayingSession(requests.Session):
+    """Never touches the network, serves recorded responses."""
+
+    def __init__(self, cassette: Cassette, base_url: str = None):
+        super().__init__()
+        self.cassette = cassette
+        self.base_url = base_url
+
+    def request(
+        self, method: str | bytes, url: str | bytes, params: Any = None, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        key = request_key(method, url, params, kwargs.get("json"), self.base_url)
+        return self.cassette.play(key, url.decode("utf-8") if isinstance(url, bytes) else url)
+
+
+def cassette_mode() -> str:
+    """Which mode the cassette layer is in: record, replay or off."""
+    mode = config.settings.get("cassette_mode", "off")
+    # yaml parses "off" into boolean false
+    return str(mode).lower() if mode else "off"
+
+
+def cassette_file() -> Path:
+    return Path(config.settings.get("cassette_file", config.config_path.joinpath("cassette.jsonl")))
+
+
+def build_cassette_session(
+    mode: str, pool_size: int, timeout: tuple[float, float], base_url: str = None
+) -> requests.Session:
+    if mode == RECORD:
+        logger.info("Recording Twitter API requests into cassette [{}]", cassette_file())
+        return RecordingSession(Cassette(cassette_file()), pool_size, timeout, base_url)
+    if mode == REPLAY:
+        return ReplayingSession(Cassette(cassette_file()).load(), base_url)
+    raise ValueError(f"Unknown cassette mode [{mode}], expect [{RECORD}] or [{REPLAY}]")
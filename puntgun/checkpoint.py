@@ -0,0 +1,105 @@
+"""
+Checkpoints of paged API queries, for continuing a long pagination from where the last run stopped.
+
+Listing relationships of a big account through 15 requests / 15 min endpoints takes hours,
+a crash or a "Ctrl+C" would throw away every page already queried without these files.
+"""
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+import orjson
+from loguru import logger
+
+from puntgun.conf import config
+
+
+class PagingCheckpoint:
+    """
+    One checkpoint file of one pagination, in json lines format.
+    The first line is the header, each latter line is one queried page:
+    {"entities": [...], "next_token": "..."}
+
+    Pages are appended one by one so saving the checkpoint costs only the size of the new page.
+    """
+
+    def __init__(self, file: Path, max_age: float, clock: Callable[[], float] = time.time):
+        self.file = file
+        self.max_age = max_age
+        self._clock = clock
+
+    @staticmethod
+    def from_settings(name: str) -> PagingCheckpoint | None:
+        """Return None if the checkpoint feature is turned off."""
+        if not config.settings.get("paging_checkpoint", False):
+            return None
+
+        path = config.config_path.joinpath("checkpoints")
+        if not path.exists():
+            os.makedirs(path)
+        max_age = float(config.settings.get("paging_checkpoint_expire_hours", 24)) * 3600
+        return PagingCheckpoint(path.joinpath(f"{name}.jsonl"), max_age)
+
+    def load(self) -> tuple[list[list[dict]], str | None]:
+        """
+        :return: (entities of saved pages, next_token to continue with),
+        ([], None) if there is no valid checkpoint - start from the first page.
+        """
+        if not self.file.exists():
+            return [], None
+
+        lines = self._read_complete_lines()
+
+        if not lines or lines[0].get("created_at", 0) + self.max_age < self._clock():
+            logger.info("Paging checkpoint [{}] expired, start from the first page", self.file)
+            self.clear()
+            return [], None
+
+        pages = lines[1:]
+        if not pages or pages[-1].get("next_token") is None:
+            # nothing saved, or the pagination has finished (but the file wasn't removed)
+            self.clear()
+            return [], None
+
+        logger.info("Continue pagination from checkpoint [{}] with {} saved pages", self.file, len(pages))
+        return [p["entities"] for p in pages], pages[-1]["next_token"]
+
+    def _read_complete_lines(self) -> list[dict]:
+        """
+        A crash in the middle of appending a page leaves a truncated last line,
+        which is cut off from the file so the pagination continues from the last complete page.
+        """
+        with open(self.file, "rb") as f:
+            content = f.read()
+
+        lines, end = [], 0
+        for raw in content.splitlines(keepends=True):
+            if not raw.endswith(b"\n"):
+                break
+            if raw.strip():
+                try:
+                    lines.append(orjson.loads(raw))
+                except orjson.JSONDecodeError:
+                    break
+            end += len(raw)
+
+        if end < len(content):
+            logger.warning("Drop the incomplete last page of paging checkpoint [{}]", self.file)
+            with open(self.file, "r+b") as f:
+                f.truncate(end)
+        return lines
+
+    def append(self, entities: list[dict], next_token: str | None) -> None:
+        if not self.file.exists():
+            with open(self.file, "wb") as f:
+                f.write(orjson.dumps({"created_at": self._clock()}) + b"\n")
+
+        with open(self.file, "ab") as f:
+            f.write(orjson.dumps({"entities": entities, "next_token": next_token}) + b"\n")
+
+    def clear(self) -> None:
+        """Remove the checkpoint after the pagination finished."""
+        self.file.unlink(missing_ok=True)
@@ -1,18 +1,33 @@
 from __future__ import annotations
 
+import asyncio
+import collections
 import datetime
 import functools
 import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
-from typing import Any, Callable, Iterator, TypeVar
+from typing import Any, Awaitable, Callable, Iterable, Iterator, TypeVar
 
+import orjson
+import requests
 import tweepy
 from loguru import logger
 from tweepy import Response
 
-from puntgun.conf import config, encrypto, secret
+from puntgun import cassette
+from puntgun.cache import MissingUserStore, RelationshipMirror, UserCache
+from puntgun.checkpoint import PagingCheckpoint
+from puntgun.conf import agent, config, encrypto, secret
+from puntgun.ledger import BudgetLedger, PlanTweetCap, TweetCapLedger, token_identity
 from puntgun.record import Record, Recordable, Recorder
 from puntgun.rules.data import Media, Place, Poll, Tweet, User
+from puntgun.telemetry import Telemetry
+from puntgun.transport import shared_http_session
+from puntgun.util import single_flight, single_flight_method
 
 
 class TwitterClientError(Exception):
@@ -62,6 +77,17 @@ class ResourceNotFoundError(TwitterApiError):
     title = "Not Found Error"
 
 
+def is_not_found(error: TwitterApiError) -> bool:
+    """Whether the partial error means the queried entity doesn't exist (deleted, or suspended for users)."""
+    # suspended users come with a "Forbidden" title but the same "resource-not-found" problem type
+    return isinstance(error, ResourceNotFoundError) or error.ref_url.endswith("/resource-not-found")
+
+
+def is_transient(error: TwitterApiError) -> bool:
+    """Whether the partial error is temporary, querying the entity again may succeed."""
+    return error.ref_url.endswith("/resource-unavailable")
+
+
 class TwitterApiErrors(Exception, Recordable):
     """
     This error is raised when a Twitter Dev API query returns http status code 200,
@@ -116,6 +142,14 @@ class TwitterApiErrors(Exception, Recordable):
         return TwitterApiErrors(data.get("query_func_name", ""), data.get("query_params", ()), data.get("errors", []))
 
 
+def record_api_errors(client_func: Callable, request_params: dict, resp: Any) -> None:
+    """Record partial errors (if there are) in the response of one Twitter API query."""
+    if hasattr(resp, "errors") and len(resp.errors) > 0:
+        api_errors = TwitterApiErrors(client_func.__name__, request_params, resp.errors)
+        logger.bind(o=True).info(api_errors)
+        Recorder.record(api_errors)
+
+
 def record_twitter_api_errors(client_func: Callable[..., tweepy.Response]) -> Callable:
     """
     Decorator for recording Twitter API errors returned by tweepy or Twitter server
@@ -125,26 +159,201 @@ def record_twitter_api_errors(client_func: Callable[..., tweepy.Response]) -> Ca
     or simplify this api-error-recording implement in another way.
     """
 
-    def record_api_errors(request_params: dict, resp_errors: list) -> None:
-        api_errors = TwitterApiErrors(client_func.__name__, request_params, resp_errors)
-        logger.bind(o=True).info(api_errors)
-        Recorder.record(api_errors)
-
     def decorator(*args: Any, **kwargs: Any) -> tweepy.Response:
         try:
             resp = client_func(*args, **kwargs)
-            if hasattr(resp, "errors") and len(resp.errors) > 0:
-                record_api_errors(kwargs, resp.errors)
+            record_api_errors(client_func, kwargs, resp)
             return resp
-        except tweepy.errors.TweepyException as e:
-            # We have no idea how to handle the error tweepy throws out.
-            # just wrap it in a custom exception and let it fails the entire process.
+        except (tweepy.errors.TweepyException, requests.RequestException) as e:
+            # Retries (if there are) have been made, we have no idea how to handle the error any more.
+            # Just wrap it in a custom exception and let the caller decide
+            # whether to fail the entire process (see :func:`isolate_failure`).
             logger.exception("Client raises unrecoverable error while querying Twitter API")
             raise TwitterClientError from e
 
     return decorator
 
 
+class RawResponse(Response):
+    """A :class:`tweepy.Response` parsed by :func:`decode_raw_response`, its entities are trusted raw dicts."""
+
+
+def decode_raw_response(client_func: Callable, validate: bool = False) -> Callable:
+    """
+    Decorator of tweepy client methods returning :class:`requests.Response` (the ``return_type`` of the client).
+    The body is parsed with orjson into plain dicts, without building tweepy's model objects,
+    then entities are built with the validation-light constructors (``from_raw``),
+    or the validating ones (``from_response``) if ``validate`` is True for debugging.
+    """
+
+    @functools.wraps(client_func)
+    def decorator(*args: Any, **kwargs: Any) -> Any:
+        resp = client_func(*args, **kwargs)
+        if not isinstance(resp, requests.Response):
+            return resp
+        body = orjson.loads(resp.content) if resp.content else {}
+        response_type = Response if validate else RawResponse
+        return response_type(body.get("data"), body.get("includes", {}), body.get("errors", []), body.get("meta", {}))
+
+    return decorator
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether the error raised by tweepy is transient and worth retrying:
+    server errors (5xx), network failures and timeouts, and hitting the rate limit (429).
+    """
+    return isinstance(
+        error,
+        (
+            tweepy.errors.TwitterServerError,
+            tweepy.errors.TooManyRequests,
+            requests.ConnectionError,
+            requests.Timeout,
+        ),
+    )
+
+
+def is_fatal(error: TwitterClientError) -> bool:
+    """
+    Whether the error is caused by bad credentials or insufficient permissions (401, 403),
+    every latter query will fail in the same way, so it's no use continuing the run.
+    """
+    return isinstance(error.__cause__, (tweepy.errors.Unauthorized, tweepy.errors.Forbidden))
+
+
+class RetryPolicy:
+    """
+    Retries transient failures of tweepy client methods (see :func:`is_retryable`),
+    with exponential backoff and full jitter to spread retries of concurrent callers:
+    https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+
+    Rate limited calls wait until the rate limit window resets instead.
+    They aren't retried inside the :class:`ClientPool`, which fails over to other clients.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 4,
+        base_delay: float = 1,
+        max_delay: float = 60,
+        retry_rate_limited: bool = True,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Any] = time.sleep,
+        rand: Callable[[], float] = random.random,
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_rate_limited = retry_rate_limited
+        self._clock = clock
+        self._sleep = sleep
+        self._rand = rand
+
+    @staticmethod
+    def from_settings() -> RetryPolicy:
+        return RetryPolicy(
+            int(config.settings.get("retry_attempts", 4)),
+            float(config.settings.get("retry_base_delay", 1)),
+            float(config.settings.get("retry_max_delay", 60)),
+        )
+
+    def delay(self, error: Exception, attempt: int) -> float | None:
+        """Seconds to wait before the next attempt (counting from 0), None if the error shouldn't be retried."""
+        if not is_retryable(error):
+            return None
+        if isinstance(error, tweepy.errors.TooManyRequests):
+            if not self.retry_rate_limited or attempt + 1 >= self.attempts:
+                return None
+            return max(0.0, rate_limit_reset_time(error) - self._clock()) + 1
+        return self.backoff(attempt)
+
+    def backoff(self, attempt: int) -> float | None:
+        """Seconds to wait before the next attempt (counting from 0), None if there is no attempt left."""
+        if attempt + 1 >= self.attempts:
+            return None
+        return self._rand() * min(self.max_delay, self.base_delay * 2**attempt)
+
+    def sleep(self, seconds: float) -> None:
+        self._sleep(seconds)
+
+    def retrying(self, endpoint: str, client_func: Callable) -> Callable:
+        """Decorator for retrying tweepy client methods."""
+
+        def decorator(*args: Any, **kwargs: Any) -> Any:
+            for attempt in itertools.count():
+                try:
+                    return client_func(*args, **kwargs)
+                except (tweepy.errors.TweepyException, requests.RequestException) as e:
+                    self._sleep(self._on_error(endpoint, e, attempt))
+
+        decorator.__name__ = endpoint
+        return decorator
+
+    def _on_error(self, endpoint: str, error: Exception, attempt: int) -> float:
+        """Return seconds to wait before retrying, or re-raise the error if giving up."""
+        wait = self.delay(error, attempt)
+        if wait is None:
+            raise error
+        logger.warning(
+            "Failed to call [{}] ({}), retry in {:.1f} seconds (attempt {}/{})",
+            endpoint,
+            error,
+            wait,
+            attempt + 2,
+            self.attempts,
+        )
+        return wait
+
+
+class DeadLetter(Recordable):
+    """
+    A query or an action that still failed after retries.
+    It's recorded and skipped so the rest of the run can go on,
+    and can be re-done manually (or by another process) with recorded parameters.
+    """
+
+    def __init__(self, query_func_name: str, query_params: dict, error: str):
+        self.query_func_name = query_func_name
+        self.query_params = query_params
+        self.error = error
+
+    def to_record(self) -> Record:
+        return Record(
+            type="dead_letter",
+            data={"query_func_name": self.query_func_name, "query_params": self.query_params, "error": self.error},
+        )
+
+    @staticmethod
+    def parse_from_record(record: Record) -> DeadLetter:
+        data = record.data
+        return DeadLetter(data.get("query_func_name", ""), data.get("query_params", {}), data.get("error", ""))
+
+
+def isolate_failure(query_func_name: str, client_func: Callable[..., E], fallback: Callable[[], E]) -> Callable[..., E]:
+    """
+    Decorator for not letting one failed query (a batch of lookups, an action on one user...)
+    tear down the whole run. The failed query is recorded as a :class:`DeadLetter`
+    and the ``fallback()`` value is returned instead.
+    Fatal errors (see :func:`is_fatal`) are still raised.
+    """
+
+    def decorator(*args: Any, **kwargs: Any) -> E:
+        try:
+            return client_func(*args, **kwargs)
+        except TwitterClientError as e:
+            if is_fatal(e):
+                raise
+            # sets (e.g. queried fields) can't be dumped into json
+            params = {"args": list(args), **{k: sorted(v) if isinstance(v, set) else v for k, v in kwargs.items()}}
+            dead_letter = DeadLetter(query_func_name, params, str(e.__cause__))
+            logger.bind(o=True).info("Skip failed query, recorded into report: {}", dead_letter.to_record())
+            Recorder.record(dead_letter)
+            return fallback()
+
+    return decorator
+
+
 USER_API_FIELDS = [
     "id",
     "name",
@@ -193,6 +402,74 @@ USER_API_PARAMS = {
     "expansions": "pinned_tweet_id",
 }
 
+# Which requested user fields each :class:`User` attribute comes from,
+# for only requesting fields that the rules read.
+USER_ATTRIBUTE_FIELDS: dict[str, list[str]] = {
+    "profile_image_url": ["profile_image_url"],
+    "created_at": ["created_at"],
+    "protected": ["protected"],
+    "verified": ["verified"],
+    "location": ["location"],
+    "description": ["description"],
+    "followers_count": ["public_metrics"],
+    "following_count": ["public_metrics"],
+    "tweet_count": ["public_metrics"],
+    "pinned_tweet_id": ["pinned_tweet_id"],
+    "pinned_tweet_text": ["pinned_tweet_id"],
+    "pinned_tweet": ["pinned_tweet_id"],
+    # the real url is in "entities.url.urls[]"
+    "url": ["url", "entities"],
+    "entities": ["entities"],
+    "withheld": ["withheld"],
+}
+# Default fields, always in the response.
+DEFAULT_USER_ATTRIBUTES = {"id", "name", "username"}
+
+# Current account's relationship lists -> the flag in users' "connection_status" field
+CONNECTION_STATUS = {"blocked": "blocking", "follower": "followed_by", "following": "following"}
+
+
+def user_api_params(attributes: Iterable[str] | None = None) -> dict:
+    """
+    Additional url params that only request user fields (and the pinned tweet expansion)
+    providing given :class:`User` attributes.
+    Request every field if the attributes are unknown (None) or not recognized.
+    """
+    if attributes is None or not set(attributes) <= USER_ATTRIBUTE_FIELDS.keys() | DEFAULT_USER_ATTRIBUTES:
+        return USER_API_PARAMS
+
+    fields = {f for a in attributes for f in USER_ATTRIBUTE_FIELDS.get(a, [])}
+    params: dict[str, Any] = {"user_auth": True, "user_fields": sorted(DEFAULT_USER_ATTRIBUTES | fields)}
+    if "pinned_tweet" in attributes:
+        params.update(expansions="pinned_tweet_id", tweet_fields=TWEET_API_FIELDS)
+    elif "pinned_tweet_text" in attributes:
+        params.update(expansions="pinned_tweet_id", tweet_fields=["text"])
+    return params
+
+
+def provided_user_attributes(attributes: Iterable[str]) -> frozenset[str]:
+    """
+    Every :class:`User` attribute (except default ones) in responses requested with ``user_api_params(attributes)``,
+    e.g. "following_count" comes with "followers_count" in the same field.
+    """
+    fields = {f for a in attributes for f in USER_ATTRIBUTE_FIELDS.get(a, [])}
+    provided = {a for a, a_fields in USER_ATTRIBUTE_FIELDS.items() if set(a_fields) <= fields}
+    # the pinned tweet is expanded with different tweet fields
+    if "pinned_tweet" not in attributes:
+        provided.discard("pinned_tweet")
+        if "pinned_tweet_text" not in attributes:
+            provided.discard("pinned_tweet_text")
+    return frozenset(provided)
+
+
+def with_connection_status(params: dict) -> dict:
+    """
+    Also request the "connection_status" field (relationships with current account) in users lookups,
+    for checking relationships of the looked up users without downloading whole relationship lists.
+    """
+    return {**params, "user_fields": [*params["user_fields"], "connection_status"]}
+
+
 TWEET_API_PARAMS = {
     "user_auth": True,
     "user_fields": USER_API_FIELDS,
@@ -224,6 +501,227 @@ TWEET_API_PARAMS = {
 }
 
 
+# Documented user-auth rate limits of the tweepy methods we call, (requests, window seconds).
+# https://developer.twitter.com/en/docs/twitter-api/rate-limits
+RATE_LIMITS: dict[str, tuple[int, int]] = {
+    "get_me": (75, 15 * 60),
+    "get_users": (900, 15 * 60),
+    "get_users_by": (900, 15 * 60),
+    "get_tweets": (900, 15 * 60),
+    "get_blocked": (15, 15 * 60),
+    "get_users_followers": (15, 15 * 60),
+    "get_users_following": (15, 15 * 60),
+    "block": (50, 15 * 60),
+    "get_liking_users": (75, 15 * 60),
+    "get_retweeters": (75, 15 * 60),
+    "search_recent_tweets": (180, 15 * 60),
+}
+
+
+# Tweepy methods sending requests to more than one endpoint, each endpoint has its own rate limit.
+# (keyword argument sending the call to another endpoint, name of that endpoint)
+SPLIT_ENDPOINTS: dict[str, tuple[str, str]] = {
+    # get_users(ids=...) requests /2/users, get_users(usernames=...) requests /2/users/by
+    "get_users": ("usernames", "get_users_by"),
+}
+
+
+def split_endpoint(func_name: str, client_func: Callable, wrap: Callable[[str, Callable], Callable]) -> Callable:
+    """
+    Wrap the tweepy method (by ``wrap(endpoint, func)``) for each endpoint it requests,
+    calls go through the wrapper of the endpoint they are sent to, for metering them separately.
+    """
+    if func_name not in SPLIT_ENDPOINTS:
+        return wrap(func_name, client_func)
+
+    kwarg, other = SPLIT_ENDPOINTS[func_name]
+    wrapped, wrapped_other = wrap(func_name, client_func), wrap(other, client_func)
+
+    def decorator(*args: Any, **kwargs: Any) -> Any:
+        return (wrapped_other if kwargs.get(kwarg) else wrapped)(*args, **kwargs)
+
+    decorator.__name__ = func_name
+    return decorator
+
+
+class TokenBucket:
+    """
+    Meters calls to one endpoint, at most ``limit`` calls in any ``window`` seconds.
+
+    Each spent token comes back to the bucket exactly one window after it was spent,
+    so the bucket never lets through more calls than Twitter's window accounting allows
+    (a bucket refilling at a constant rate can let twice the limit through in the first window).
+    Callers that can't get a token are given a reserved slot in the future and queue in order.
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        # times (granted or reserved) at which tokens were spent, in ascending order
+        self._spent: collections.deque[float] = collections.deque()
+
+    def next_slot(self, now: float) -> float:
+        """The earliest time a new call can be made."""
+        while len(self._spent) > self.limit or (self._spent and self._spent[0] <= now - self.window):
+            self._spent.popleft()
+        if len(self._spent) < self.limit:
+            return now
+        return max(now, self._spent[-self.limit] + self.window)
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return the time when the caller is allowed to make the call."""
+        slot = self.next_slot(now)
+        self._spent.append(slot)
+        return slot
+
+
+class RateLimitScheduler:
+    """
+    Proactively meters Twitter API calls of one token with :class:`TokenBucket` per endpoint,
+    queueing callers until their slot instead of firing requests that will fail with 429.
+    Endpoints aren't listed in :data:`RATE_LIMITS` aren't metered.
+
+    With a :class:`BudgetLedger`, calls are reserved in the ledger shared by other processes instead,
+    ``token`` (see :func:`token_identity`) tells the ledger whose budget is spent.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[int, int]] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Any] = time.sleep,
+        telemetry: Telemetry = None,
+        ledger: BudgetLedger = None,
+        token: str = "",
+    ):
+        self._buckets = {endpoint: TokenBucket(*limit) for endpoint, limit in (limits or RATE_LIMITS).items()}
+        self._clock = clock
+        self._sleep = sleep
+        self._telemetry = telemetry or Telemetry.singleton()
+        self._lock = threading.Lock()
+        self._ledger = ledger
+        self._token = token
+
+    @staticmethod
+    def from_settings(consumer_key: str, access_token: str) -> RateLimitScheduler:
+        return RateLimitScheduler(ledger=BudgetLedger.from_settings(), token=token_identity(consumer_key, access_token))
+
+    def _reserve(self, endpoint: str) -> float:
+        """:return: seconds to wait before calling the endpoint."""
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            return 0
+        if self._ledger:
+            return self._ledger.reserve(self._token, endpoint, bucket.limit, bucket.window) - self._clock()
+        with self._lock:
+            now = self._clock()
+            return bucket.reserve(now) - now
+
+    def acquire(self, endpoint: str) -> None:
+        """Block until the caller can call the endpoint."""
+        wait = self._reserve(endpoint)
+        if wait > 0:
+            logger.debug("Wait {:.1f} seconds for the rate limit of [{}]", wait, endpoint)
+            self._telemetry.observe_wait(endpoint, wait)
+            self._sleep(wait)
+
+    def next_slot_at(self, endpoint: str) -> datetime.datetime:
+        """When the next call to the endpoint can be made without waiting, for callers to plan around it."""
+        bucket = self._buckets.get(endpoint)
+        if bucket and self._ledger:
+            slot = self._ledger.next_slot(self._token, endpoint, bucket.limit, bucket.window)
+        else:
+            with self._lock:
+                now = self._clock()
+                slot = bucket.next_slot(now) if bucket else now
+        return datetime.datetime.fromtimestamp(slot)
+
+    def metered(self, endpoint: str, client_func: Callable) -> Callable:
+        """Decorator for letting tweepy client methods wait for their rate limit slot before calling."""
+
+        def decorator(*args: Any, **kwargs: Any) -> Any:
+            self.acquire(endpoint)
+            return client_func(*args, **kwargs)
+
+        decorator.__name__ = endpoint
+        return decorator
+
+
+E = TypeVar("E")
+
+
+class RelationshipIndex:
+    """
+    Id sets of current account's relationships ("blocked", "follower", "following")
+    for O(1) membership checking before any API invocation.
+
+    Each set is loaded from its relationship list on first use,
+    and kept updated as actions succeed, so latter plans see users blocked by former ones.
+    Changes made before loading (e.g. blocked users whose relationships are known from lookups)
+    don't load the set, they're remembered and applied on loading.
+
+    Downloading a list may take hours under its rate limit, so it's done outside the lock
+    (concurrent loaders of the same list share one download, see :class:`puntgun.util.SingleFlight`),
+    checks on loaded sets and changes don't wait for it.
+
+    Loaders return the shared snapshot of the list (e.g. :meth:`Client.cached_blocked`),
+    the set is rebuilt when the loader returns another snapshot (refreshed with ``cached_blocked.refresh()``).
+    """
+
+    def __init__(self, loaders: dict[str, Callable[[], list[User]]]):
+        self._loaders = loaders
+        self._lock = threading.Lock()
+        self._sets: dict[str, set[int]] = {}
+        # kind -> the snapshot which the set is built from
+        self._sources: dict[str, list[User]] = {}
+        # kind -> {user id: in the relationship or not} changed in this run
+        self._changes: dict[str, dict[int, bool]] = collections.defaultdict(dict)
+
+    def _ids(self, kind: str) -> set[int]:
+        # cheap after the first download, the loader returns the shared snapshot
+        snapshot = self._loaders[kind]()
+        with self._lock:
+            if self._sources.get(kind) is snapshot:
+                return self._sets[kind]
+
+        ids = {u.id for u in snapshot}
+        with self._lock:
+            # published by another caller in the meantime
+            if self._sources.get(kind) is not snapshot:
+                # changes made in this run (also during the download) are applied too
+                changes = self._changes[kind]
+                self._sets[kind] = (ids | {i for i, v in changes.items() if v}) - {
+                    i for i, v in changes.items() if not v
+                }
+                self._sources[kind] = snapshot
+            return self._sets[kind]
+
+    def contains(self, kind: str, user_id: int | str, load: bool = True) -> bool:
+        """:param load: False for only checking changes made in this run if the set isn't loaded yet"""
+        if not load and kind not in self._sets:
+            return self._changes[kind].get(int(user_id), False)
+        return int(user_id) in self._ids(kind)
+
+    def _change(self, kind: str, user_id: int | str, related: bool) -> None:
+        with self._lock:
+            self._changes[kind][int(user_id)] = related
+            if kind in self._sets:
+                if related:
+                    self._sets[kind].add(int(user_id))
+                else:
+                    self._sets[kind].discard(int(user_id))
+
+    def add(self, kind: str, user_id: int | str) -> None:
+        self._change(kind, user_id, True)
+
+    def discard(self, kind: str, user_id: int | str) -> None:
+        self._change(kind, user_id, False)
+
+
+# The minimum "max_results" of the searching endpoint, can't query a smaller page.
+SEARCH_MIN_RESULTS = 10
+
+
 class SortOrder(str, Enum):
     """Specify the order in which you want the Tweets returned."""
 
@@ -248,21 +746,67 @@ class Client:
       * It's so sweet that tweepy has inner retry logic for resumable 429 Too Many Request status code.
         https://github.com/tweepy/tweepy/blob/master/tweepy/client.py#L102-L114
 
-    IMPROVE: Change to tweepy.AsyncClient for better performance.
-    It will change a lot of things and require some effort to
-    make the rxpy works with Python async mechanism,
-    but we still should do it ASAP.
-    Leaving all threads busy waiting for Twitter API rate limits sounds terrible.
-    https://docs.tweepy.org/en/stable/asyncclient.html
+    :class:`AsyncClient` is the asyncio-native facade of this class for callers running on an event loop.
     """
 
-    def __init__(self, tweepy_client: tweepy.Client):
+    def __init__(
+        self,
+        tweepy_client: tweepy.Client,
+        scheduler: RateLimitScheduler = None,
+        user_cache: UserCache = None,
+        mirror: RelationshipMirror = None,
+        session: requests.Session = None,
+        retry: RetryPolicy = None,
+        missing_users: MissingUserStore = None,
+        tweet_caps: TweetCapLedger = None,
+    ):
+        # Share one tuned HTTP transport (connection pool, timeouts...) among clients
+        if session is not None:
+            tweepy_client.session = session
+
         # Add a decorator to record Twitter API errors in response
         # on every method of the tweepy client.
+        # Endpoint methods are measured (latency, rate limit headers...) by the telemetry,
+        # with a scheduler, they also wait for their rate limit slot before sending the request.
+        # Transient failures are retried, each attempt waits for the rate limit and is measured.
+        telemetry = Telemetry.singleton()
+        telemetry.install(tweepy_client.session)
+        self.retry = retry or RetryPolicy()
+        # Response bodies are parsed by ourselves, building tweepy's model objects is costly on long lists.
+        tweepy_client.return_type = requests.Response
+        validate = config.settings.get("validate_responses", False)
         for func_name in [method for method in dir(tweepy.Client) if not method.startswith("_")]:
-            setattr(tweepy_client, func_name, record_twitter_api_errors(getattr(tweepy_client, func_name)))
+            # the inner method that every endpoint method sends its request through,
+            # its errors must reach the endpoint method's decorators as they are.
+            if func_name == "request":
+                continue
+            func = decode_raw_response(getattr(tweepy_client, func_name), validate)
+            func = split_endpoint(func_name, func, functools.partial(Client._measured, telemetry, scheduler))
+            func = self.retry.retrying(func_name, func)
+            setattr(tweepy_client, func_name, record_twitter_api_errors(func))
 
         self.clt = tweepy_client
+        self.scheduler = scheduler
+        # Only users missed in the cache will be queried
+        self.user_cache = user_cache
+        # Users known as not existing won't be queried
+        self.missing_users = missing_users
+        # Relationship lists are synced with the local mirror instead of being fully re-queried
+        self.mirror = mirror
+        # Tweets consumed from the monthly Tweet cap are accounted, by this client's token
+        self.tweet_caps = tweet_caps
+        self.token = token_identity(str(tweepy_client.consumer_key), str(tweepy_client.access_token))
+        # Relationships in users lookups are the ones with this client's account,
+        # turned off for the client pool's readers which are not the owner account.
+        self.lookup_connection_status = True
+        # Single lookups from all rules are coalesced into batched queries
+        self.relationships = RelationshipIndex(
+            {
+                "blocked": self.cached_blocked,
+                "follower": self.cached_follower,
+                "following": self.cached_following,
+            }
+        )
         # tweepy 4.10.0 changed return structure of tweepy.Client.get_me()
         # it's different from tweepy.Client.get_user()'s return structure
         # it's not the "data: [my_data]", but "data: my_data"
@@ -271,39 +815,146 @@ class Client:
         self.name = self.me.name
 
     @staticmethod
-    @functools.lru_cache(maxsize=1)
+    @single_flight
     def singleton() -> Client:
-        secrets = secret.load_or_request_all_secrets(encrypto.load_or_generate_private_key())
-        return Client(
-            tweepy.Client(
-                consumer_key=secrets["ak"],
-                consumer_secret=secrets["aks"],
-                access_token=secrets["at"],
-                access_token_secret=secrets["ats"],
+        if cassette.cassette_mode() == cassette.REPLAY:
+            # Replaying recorded responses offline, needn't secrets or waiting for rate limits.
+            return Client(
+                tweepy.Client(
+                    consumer_key=cassette.REPLAY,
+                    consumer_secret=cassette.REPLAY,
+                    access_token=cassette.REPLAY,
+                    access_token_secret=cassette.REPLAY,
+                ),
+                user_cache=UserCache.from_settings(),
+                session=shared_http_session(),
             )
+
+        credentials = load_credentials()
+        return Client(
+            tweepy.Client(**credentials),
+            RateLimitScheduler.from_settings(credentials["consumer_key"], credentials["access_token"]),
+            UserCache.from_settings(),
+            RelationshipMirror.from_settings(),
+            shared_http_session(),
+            RetryPolicy.from_settings(),
+            MissingUserStore.from_settings(),
+            TweetCapLedger.from_settings(),
         )
 
-    def get_users_by_usernames(self, names: list[str]) -> list[User]:
+    @staticmethod
+    def _measured(
+        telemetry: Telemetry, scheduler: RateLimitScheduler | None, endpoint: str, func: Callable
+    ) -> Callable:
+        func = telemetry.timed(endpoint, func)
+        if scheduler and endpoint in RATE_LIMITS:
+            func = scheduler.metered(endpoint, func)
+        return func
+
+    def next_slot_at(self, endpoint: str) -> datetime.datetime:
+        """When the endpoint (see :data:`RATE_LIMITS`) can be called without waiting for its rate limit."""
+        return self.scheduler.next_slot_at(endpoint) if self.scheduler else datetime.datetime.now()
+
+    def get_users_by_usernames(self, names: list[str], fields: set[str] = None) -> list[User]:
         """
         Query users information.
         **Rate limit: 900 / 15 min**
         https://developer.twitter.com/en/docs/twitter-api/users/lookup/api-reference/get-users-by
+
+        :param fields: only query these :class:`User` attributes, all attributes if not given
         """
         if len(names) > 100:
             raise ValueError("at most 100 usernames per request")
 
-        return response_to_users(self.clt.get_users(usernames=names, **USER_API_PARAMS))
+        if not self.user_cache:
+            return self._lookup(user_api_params(fields), "usernames", names)
+
+        hits = self._cached_lookup(self.user_cache, "usernames", names, fields)
+        # keep the order of given usernames
+        return [hits[n.lower()] for n in names if n.lower() in hits]
 
-    def get_users_by_ids(self, ids: list[int | str]) -> list[User]:
+    def get_users_by_ids(self, ids: list[int | str], fields: set[str] = None) -> list[User]:
         """
         Query users information.
         **Rate limit: 900 / 15 min**
         https://developer.twitter.com/en/docs/twitter-api/users/lookup/api-reference/get-users
+
+        :param fields: only query these :class:`User` attributes, all attributes if not given
         """
         if len(ids) > 100:
             raise ValueError("at most 100 user ids per request")
 
-        return response_to_users(self.clt.get_users(ids=ids, **USER_API_PARAMS))
+        if not self.user_cache:
+            return self._lookup(user_api_params(fields), "ids", ids)
+
+        hits = self._cached_lookup(self.user_cache, "ids", ids, fields)
+        return [hits[int(i)] for i in ids if int(i) in hits]
+
+    def _cached_lookup(
+        self, cache: UserCache, parameter: str, values: list, fields: set[str] | None
+    ) -> dict[Any, User]:
+        """
+        Look up users missed in the cache.
+        Users queried with only part of the fields are cached with the attributes they have.
+
+        :param parameter: "ids" or "usernames"
+        :return: users keyed by id or by lowercase username
+        """
+        params = user_api_params(fields)
+        attributes = None if params is USER_API_PARAMS else provided_user_attributes(fields or ())
+        hits: dict[Any, User]
+        misses: list[Any]
+        if parameter == "ids":
+            hits, misses, cached_attributes = cache.get_by_ids(values, attributes)
+        else:
+            hits, misses, cached_attributes = cache.get_by_usernames(values, attributes)
+        if misses:
+            if attributes is not None and cached_attributes:
+                # also query what the missed users are cached with, their cache entries only grow
+                attributes |= cached_attributes
+                params = user_api_params(attributes)
+            fetched = self._lookup(params, parameter, misses)
+            cache.put(fetched, attributes)
+            hits.update({u.id if parameter == "ids" else u.username.lower(): u for u in fetched})
+        return hits
+
+    def _lookup(self, params: dict, parameter: str, values: list) -> list[User]:
+        """
+        Send users lookup requests, with users' relationships with this account if it's enabled.
+
+        Users known as not existing are skipped, newly found ones (in partial errors) are remembered.
+        Users failed with transient partial errors are queried again without the rest of the batch.
+
+        :param parameter: "ids" or "usernames"
+        """
+        if self.lookup_connection_status:
+            params = with_connection_status(params)
+        if self.missing_users:
+            values = self.missing_users.exclude(parameter, values)
+
+        users: list[User] = []
+        if not values:
+            return users
+
+        for attempt in itertools.count():
+            resp = self.clt.get_users(**{parameter: values}, **params)
+            users += response_to_users(resp, self.lookup_connection_status)
+            errors = [TwitterApiError.from_response(e) for e in resp.errors]
+            if self.missing_users:
+                self.missing_users.put(parameter, [e.value for e in errors if is_not_found(e)])
+
+            failed = {str(e.value).lower() for e in errors if is_transient(e)}
+            values = [v for v in values if str(v).lower() in failed]
+            if not values:
+                break
+
+            wait = self.retry.backoff(attempt)
+            if wait is None:
+                logger.warning("Give up looking up users with {} {} after transient errors", parameter, values)
+                break
+            logger.info("Look up users with {} {} again in {:.1f} seconds", parameter, values, wait)
+            self.retry.sleep(wait)
+        return users
 
     def get_blocked(self) -> list[User]:
         """
@@ -311,20 +962,29 @@ class Client:
         **Rate limit: 15 / 15 min**
         https://developer.twitter.com/en/docs/twitter-api/users/blocks/api-reference/get-users-blocking
         """
-        return query_paged_user_api(self.clt.get_blocked)
+        checkpoint = PagingCheckpoint.from_settings(f"blocked_{self.id}")
+        return list(iter_checkpointed_user_api(self.clt.get_blocked, checkpoint))
+
+    def iter_blocked(self, prefetch: bool = False) -> Iterator[User]:
+        """Streaming version of :meth:`get_blocked`, yields users page by page."""
+        return iter_paged_user_api(self.clt.get_blocked, prefetch=prefetch)
 
-    @functools.lru_cache(maxsize=1)
+    @single_flight_method
     def cached_blocked(self) -> list[User]:
         """
         Call query method, cache them, and return the cache on latter calls.
         Since the tool may be constantly modifying the block list,
         this method just takes a snapshot of the list at the beginning,
         and it's sufficient for use.
+
+        Concurrent first callers (e.g. action rules running in parallel) share one download
+        instead of each spending the 15/15min quota on it,
+        call ``cached_blocked.refresh()`` for a new snapshot, which blocking decisions follow.
         """
-        return self.get_blocked()
+        return self._mirrored("blocked", self.id, self.get_blocked, self.clt.get_blocked)
 
-    @functools.lru_cache(maxsize=1)
     def cached_blocked_id_list(self) -> list[int]:
+        # derived on each call, so it follows refreshed snapshots
         return [u.id for u in self.cached_blocked()]
 
     def get_following(self, user_id: int | str) -> list[User]:
@@ -333,13 +993,21 @@ class Client:
         **Rate limit: 15 / 15 min**
         https://developer.twitter.com/en/docs/twitter-api/users/follows/api-reference/get-users-id-following
         """
-        return query_paged_user_api(self.clt.get_users_following, id=user_id)
+        checkpoint = PagingCheckpoint.from_settings(f"following_{user_id}")
+        return list(iter_checkpointed_user_api(self.clt.get_users_following, checkpoint, id=user_id))
+
+    def iter_following(self, user_id: int | str, prefetch: bool = False, fields: set[str] = None) -> Iterator[User]:
+        """Streaming version of :meth:`get_following`, yields users (with only given ``fields``) page by page."""
+        return iter_paged_user_api(
+            self.clt.get_users_following, prefetch=prefetch, api_params=user_api_params(fields), id=user_id
+        )
 
-    @functools.lru_cache(maxsize=1)
+    @single_flight_method
     def cached_following(self) -> list[User]:
-        return self.get_following(self.id)
+        return self._mirrored(
+            "following", self.id, lambda: self.get_following(self.id), self.clt.get_users_following, id=self.id
+        )
 
-    @functools.lru_cache(maxsize=1)
     def cached_following_id_list(self) -> list[int]:
         return [u.id for u in self.cached_following()]
 
@@ -349,52 +1017,97 @@ class Client:
         **Rate limit: 15 / 15 min**
         https://developer.twitter.com/en/docs/twitter-api/users/follows/api-reference/get-users-id-followers
         """
-        return query_paged_user_api(self.clt.get_users_followers, id=user_id)
+        checkpoint = PagingCheckpoint.from_settings(f"follower_{user_id}")
+        return list(iter_checkpointed_user_api(self.clt.get_users_followers, checkpoint, id=user_id))
 
-    @functools.lru_cache(maxsize=1)
+    def iter_follower(self, user_id: int | str, prefetch: bool = False, fields: set[str] = None) -> Iterator[User]:
+        """
+        Streaming version of :meth:`get_follower`, yields users (with only given ``fields``) page by page,
+        newer followers come first.
+        """
+        return iter_paged_user_api(
+            self.clt.get_users_followers, prefetch=prefetch, api_params=user_api_params(fields), id=user_id
+        )
+
+    @single_flight_method
     def cached_follower(self) -> list[User]:
-        return self.get_follower(self.id)
+        return self._mirrored(
+            "follower", self.id, lambda: self.get_follower(self.id), self.clt.get_users_followers, id=self.id
+        )
 
-    @functools.lru_cache(maxsize=1)
     def cached_follower_id_list(self) -> list[int]:
         return [u.id for u in self.cached_follower()]
 
-    def block_user_by_id(self, target_user_id: int | str) -> bool:
+    def _mirrored(
+        self,
+        kind: str,
+        user_id: int,
+        full_loader: Callable[[], list[User]],
+        clt_func: Callable[..., Response],
+        **kwargs: Any,
+    ) -> list[User]:
+        """Get a relationship list through the local mirror if it's enabled."""
+        if self.mirror is None:
+            return full_loader()
+        # lazy, pages are only queried when the mirror asks for them
+        newest_pages = (response_to_users(r) for r in paged_api_iter(clt_func, {**USER_API_PARAMS, **kwargs}))
+        return self.mirror.sync(kind, user_id, full_loader, newest_pages)
+
+    def block_user_by_id(self, target_user_id: int | str, connection_status: list[str] = None) -> bool:
         """
         Block given user on current account.
         **Rate limit: 50 / 15 min**
         https://help.twitter.com/en/using-twitter/advanced-twitter-block-options
         https://developer.twitter.com/en/docs/twitter-api/users/blocks/api-reference/post-users-user_id-blocking
+
+        :param connection_status: the user's :attr:`User.connection_status` if it's known,
+            relationships are checked with it instead of downloading whole relationship lists.
         """
 
-        # this user has already been blocked
-        if target_user_id in self.cached_blocked_id_list():
+        # this user has already been blocked (maybe by former plans)
+        if self._related("blocked", target_user_id, connection_status):
             logger.info(f"User[id={target_user_id}] has already been blocked.")
             return True
 
         # do not block your follower
-        if (not config.settings.get("block_follower", True)) and target_user_id in self.cached_follower_id_list():
+        if (not config.settings.get("block_follower", True)) and self._related(
+            "follower", target_user_id, connection_status
+        ):
             logger.info(f"User[id={target_user_id}] is follower, not block base on config.")
             return False
 
         # do not block your following
-        if (not config.settings.get("block_following", False)) and target_user_id in self.cached_following_id_list():
+        if (not config.settings.get("block_following", False)) and self._related(
+            "following", target_user_id, connection_status
+        ):
             logger.info(f"User[id={target_user_id}] is following, not block base on config.")
             return False
 
         # call the block api
-        return self.clt.block(target_user_id=target_user_id).data["blocking"]
+        blocked = self.clt.block(target_user_id=target_user_id).data["blocking"]
+        if blocked:
+            self.relationships.add("blocked", target_user_id)
+        return blocked
+
+    def _related(self, kind: str, user_id: int | str, connection_status: list[str] | None) -> bool:
+        if connection_status is None:
+            return self.relationships.contains(kind, user_id)
+        # the status was queried before this run's latter changes (e.g. blocked by former plans)
+        return CONNECTION_STATUS[kind] in connection_status or self.relationships.contains(kind, user_id, load=False)
 
     def get_tweets_by_ids(self, ids: list[int | str]) -> list[Tweet]:
         """
         Query tweets information.
         **Rate limit: 900 / 15 min**
+        **Counted in monthly Tweet consumption cap**
         https://developer.twitter.com/en/docs/twitter-api/tweets/lookup/api-reference/get-tweets
         """
         if len(ids) > 100:
             raise ValueError("at most 100 tweet ids per request")
 
-        return response_to_tweets(self.clt.get_tweets(ids=ids, **TWEET_API_PARAMS))
+        tweets = response_to_tweets(self.clt.get_tweets(ids=ids, **TWEET_API_PARAMS))
+        self.consume_tweets(len(tweets))
+        return tweets
 
     def get_users_who_like_tweet(self, tweet_id: int | str) -> list[User]:
         """
@@ -412,6 +1125,22 @@ class Client:
         """
         return query_paged_user_api(self.clt.get_retweeters, max_results=100, id=tweet_id)
 
+    def tweets_allowed(self) -> int | None:
+        """
+        How many tweets can still be consumed, by the monthly Tweet cap and the running plan's cap.
+        None for no limit.
+        """
+        caps = [PlanTweetCap.allowed()]
+        if self.tweet_caps:
+            caps.append(self.tweet_caps.remaining(self.token))
+        caps = [c for c in caps if c is not None]
+        return min(caps) if caps else None
+
+    def consume_tweets(self, tweets: int) -> None:
+        if self.tweet_caps:
+            self.tweet_caps.consume(self.token, tweets)
+        PlanTweetCap.consume(tweets)
+
     def search_tweets(
         self,
         query: str,
@@ -431,7 +1160,10 @@ class Client:
         1. https://developer.twitter.com/en/docs/twitter-api/tweets/search/api-reference/get-tweets-search-recent
         2. https://developer.twitter.com/en/docs/twitter-api/tweets/search/integrate/build-a-query
         3. https://developer.twitter.com/en/docs/twitter-api/tweet-caps
-        TODO unfinished
+
+        Pages are queried until there is no more result, ``hundreds_number`` pages are queried,
+        or the remaining allowance (see :meth:`tweets_allowed`) can't afford another page,
+        the last page is shrunk to the remaining allowance.
 
         :param query: One query for matching Tweets.
         :param hundreds_number: The number of tweets you want to get, in hundreds.
@@ -440,83 +1172,239 @@ class Client:
         :param end_time: The newest, most recent UTC timestamp to which the Tweets will be provided, exclusive.
         :param since_id: Returns results with a Tweet ID greater than (more recent than) the specified ID, exclusive.
         :param until_id: Returns results with a Tweet ID less than (older than) the specified ID, exclusive.
-        :return:
+        :return: matched tweets
         """
-        return []
+        params: dict[str, Any] = {
+            **TWEET_API_PARAMS,
+            "query": query,
+            "sort_order": sort_order.value,
+            "start_time": start_time,
+            "end_time": end_time,
+            "since_id": since_id,
+            "until_id": until_id,
+        }
+
+        tweets: list[Tweet] = []
+        next_token = None
+        for _ in range(hundreds_number) if hundreds_number is not None else itertools.count():
+            allowed = self.tweets_allowed()
+            if allowed is not None and allowed < SEARCH_MIN_RESULTS:
+                logger.warning("Stop searching tweets [{}], the tweet cap is about to be used up", query)
+                break
+
+            # the endpoint pages with "next_token" instead of "pagination_token"
+            response = self.clt.search_recent_tweets(
+                max_results=min(100, allowed) if allowed is not None else 100, next_token=next_token, **params
+            )
+            page = response_to_tweets(response)
+            self.consume_tweets(len(page))
+            tweets.extend(page)
+            if (next_token := next_page_token(response)) is None:
+                break
 
+        return tweets
 
-def response_to_users(resp: tweepy.Response) -> list[User]:
-    """Build a list of :class:`User` instances from one response."""
-    if not resp.data:
-        return []
 
-    pinned_tweets = [Tweet.from_response(d) for d in resp.includes.get("tweets", [])]
+class AsyncClient:
+    """
+    Asyncio-native facade of :class:`Client`, methods are coroutines with the same names and semantics.
+
+    Hundreds of lookups and actions can be outstanding on one event loop:
+    they wait for their endpoint's rate limit slot on the loop (sleeping coroutines instead of threads),
+    then the :class:`Client` method is run by a bounded pool of worker threads,
+    as many as the kept-alive connections of the shared HTTP session.
+    Every call goes through the wrapped :class:`Client`, caches, relationship index, retries,
+    telemetry and tweet cap accounting are the same ones.
+    """
 
-    def map_one(data: dict) -> User:
-        """Build one user instance"""
-        # find this user's pinned tweet
-        pinned_tweet = next(filter(lambda t: t.id == data.get("pinned_tweet_id"), pinned_tweets), Tweet())
-        return User.from_response(data, pinned_tweet)
+    def __init__(
+        self,
+        client: Client,
+        max_workers: int = 32,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.client = client
+        self.id = client.id
+        self.name = client.name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-client")
+        self._sleep = sleep
 
-    return [map_one(d) for d in resp.data]
+    @staticmethod
+    @single_flight
+    def singleton() -> AsyncClient:
+        return AsyncClient(Client.singleton(), int(config.settings.get("http_pool_size", 32)))
 
+    async def _call(self, endpoint: str | None, client_func: Callable[..., E], *args: Any, **kwargs: Any) -> E:
+        """
+        Wait until the endpoint (see :data:`RATE_LIMITS`) can be called, then run the blocking method in a worker.
+        Calls of a saturated endpoint don't occupy workers that other endpoints' calls could use.
+        """
+        if endpoint is not None:
+            wait = self.client.next_slot_at(endpoint).timestamp() - time.time()
+            if wait > 0:
+                await self._sleep(wait)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(client_func, *args, **kwargs)
+        )
 
-def response_to_tweets(resp: tweepy.Response) -> list[Tweet]:
-    """Build a list of :class:`Tweet` instances from one response."""
-    if not resp.data:
-        return []
+    async def get_users_by_usernames(self, names: list[str], fields: set[str] = None) -> list[User]:
+        """See :meth:`Client.get_users_by_usernames`."""
+        return await self._call("get_users_by", self.client.get_users_by_usernames, names, fields)
+
+    async def get_users_by_ids(self, ids: list[int | str], fields: set[str] = None) -> list[User]:
+        """See :meth:`Client.get_users_by_ids`."""
+        return await self._call("get_users", self.client.get_users_by_ids, ids, fields)
+
+    async def get_blocked(self) -> list[User]:
+        """See :meth:`Client.get_blocked`."""
+        return await self._call("get_blocked", self.client.get_blocked)
+
+    async def get_following(self, user_id: int | str) -> list[User]:
+        """See :meth:`Client.get_following`."""
+        return await self._call("get_users_following", self.client.get_following, user_id)
+
+    async def get_follower(self, user_id: int | str) -> list[User]:
+        """See :meth:`Client.get_follower`."""
+        return await self._call("get_users_followers", self.client.get_follower, user_id)
+
+    async def cached_blocked(self) -> list[User]:
+        return await self._call(None, self.client.cached_blocked)
 
-    # Get data in "includes" field and transform them into our data structures.
-    # these items can be found by searching "includes." on official doc
-    authors = [User.from_response(d) for d in resp.includes.get("users", [])]
-    places = [Place(**d) for d in resp.includes.get("places", [])]
-    mediums = [Media(**d) for d in resp.includes.get("media", [])]
-    # Don't know why the tweepy.Poll.options field (list type)
-    # would prevent the dict() to the poll objects.
-    polls = [
-        Poll(
-            id=d.get("id"),
-            options=d.get("options"),
-            duration_minutes=d.get("duration_minutes"),
-            end_datetime=d.get("end_datetime"),
-            voting_status=d.get("voting_status"),
+    async def cached_following(self) -> list[User]:
+        return await self._call(None, self.client.cached_following)
+
+    async def cached_follower(self) -> list[User]:
+        return await self._call(None, self.client.cached_follower)
+
+    async def block_user_by_id(self, target_user_id: int | str, connection_status: list[str] = None) -> bool:
+        """See :meth:`Client.block_user_by_id`, users known as blocked don't wait for the rate limit."""
+        known = CONNECTION_STATUS["blocked"] in (connection_status or []) or self.client.relationships.contains(
+            "blocked", target_user_id, load=False
         )
-        for d in resp.includes.get("polls", [])
-    ]
-    tweets = [Tweet.from_response(d) for d in resp.includes.get("tweets", [])]
-
-    def map_one(data: dict) -> Tweet:
-        """Build one tweet instance"""
-        author = next(filter(lambda u: u.id == data["author_id"], authors), User())
-        attachments_data = data["attachments"] if data["attachments"] is not None else {}
-
-        tweet_mediums = (
-            list(filter(lambda m: m.media_key in data["attachments"]["media_keys"], mediums))
-            if "media_keys" in attachments_data
-            else []
+        return await self._call(
+            None if known else "block", self.client.block_user_by_id, target_user_id, connection_status
         )
 
-        tweet_polls = (
-            list(filter(lambda p: p.id in data["attachments"]["poll_ids"], polls))
-            if "poll_ids" in attachments_data
-            else []
-        )
+    async def get_tweets_by_ids(self, ids: list[int | str]) -> list[Tweet]:
+        """See :meth:`Client.get_tweets_by_ids`."""
+        return await self._call("get_tweets", self.client.get_tweets_by_ids, ids)
 
-        place: Place = (
-            next(filter(lambda p: p.id == data["geo"]["place_id"], places), Place())
-            if data["geo"] is not None
-            else Place()
-        )
+    async def get_users_who_like_tweet(self, tweet_id: int | str) -> list[User]:
+        """See :meth:`Client.get_users_who_like_tweet`."""
+        return await self._call("get_liking_users", self.client.get_users_who_like_tweet, tweet_id)
+
+    async def get_users_who_retweet_tweet(self, tweet_id: int | str) -> list[User]:
+        """See :meth:`Client.get_users_who_retweet_tweet`."""
+        return await self._call("get_retweeters", self.client.get_users_who_retweet_tweet, tweet_id)
+
+    async def search_tweets(self, query: str, **kwargs: Any) -> list[Tweet]:
+        """See :meth:`Client.search_tweets`."""
+        return await self._call("search_recent_tweets", self.client.search_tweets, query, **kwargs)
+
+
+@single_flight
+def load_secrets() -> dict[str, Any]:
+    """
+    Load secrets once for every client.
+    Ask the running secrets agent first, it saves unlocking the private key and decrypting secrets.
+    """
+    return agent.request_secrets() or secret.load_or_request_all_secrets(encrypto.load_or_generate_private_key())
+
+
+def to_credentials(secrets: dict[str, str]) -> dict[str, str]:
+    """Map a secrets set to tweepy clients' constructor parameters."""
+    return {
+        "consumer_key": secrets["ak"],
+        "consumer_secret": secrets["aks"],
+        "access_token": secrets["at"],
+        "access_token_secret": secrets["ats"],
+    }
+
+
+def load_credentials() -> dict[str, str]:
+    """Credentials of the owner account, built from the main secrets."""
+    return to_credentials(load_secrets())
+
+
+def load_extra_credentials() -> list[dict[str, str]]:
+    """Extra credential sets saved in the secrets file, see :class:`ClientPool`."""
+    return [to_credentials(s) for s in load_secrets().get(secret.extra_credentials_name.lower(), [])]
+
+
+class ResponseIncludes:
+    """
+    The join stage of one response.
+    Entities in the "includes" field are transformed and indexed by id (media by media key) once,
+    then joined onto each primary entity with dictionary lookups
+    instead of scanning the whole includes lists for every entity.
+    """
+
+    def __init__(self, includes: dict, trusted: bool = False):
+        """:param trusted: entities are raw dicts of :class:`RawResponse`, built without validation"""
+        self.user_of = User.from_raw if trusted else User.from_response
+        self.tweet_from = Tweet.from_raw if trusted else Tweet.from_response
+        # these items can be found by searching "includes." on official doc
+        self.users = {u.id: u for u in (self.user_of(d) for d in includes.get("users", []))}
+        self.tweets = {t.id: t for t in (self.tweet_from(d) for d in includes.get("tweets", []))}
+        self.places = {p.id: p for p in (Place(**d) for d in includes.get("places", []))}
+        self.mediums = {m.media_key: m for m in (Media(**d) for d in includes.get("media", []))}
+        # Don't know why the tweepy.Poll.options field (list type)
+        # would prevent the dict() to the poll objects.
+        self.polls = {
+            p.id: p
+            for p in (
+                Poll(
+                    id=d.get("id"),
+                    options=d.get("options"),
+                    duration_minutes=d.get("duration_minutes"),
+                    end_datetime=d.get("end_datetime"),
+                    voting_status=d.get("voting_status"),
+                )
+                for d in includes.get("polls", [])
+            )
+        }
+
+    def pinned_tweet_of(self, data: dict) -> Tweet:
+        tweet_id = data.get("pinned_tweet_id")
+        return self.tweets.get(int(tweet_id), Tweet()) if tweet_id else Tweet()
+
+    def tweet_of(self, data: dict) -> Tweet:
+        """Build one tweet instance with its includes."""
+        author = self.users.get(int(data["author_id"]), User()) if data.get("author_id") else User()
+        # raw dicts don't have keys of absent fields
+        attachments = data.get("attachments") or {}
+        tweet_mediums = [self.mediums[k] for k in attachments.get("media_keys", []) if k in self.mediums]
+        tweet_polls = [self.polls[str(i)] for i in attachments.get("poll_ids", []) if str(i) in self.polls]
+        geo = data.get("geo")
+        place = self.places.get(str(geo["place_id"]), Place()) if geo and "place_id" in geo else Place()
+        referenced_tweets = [
+            self.tweets[int(t["id"])] for t in (data.get("referenced_tweets") or []) if int(t["id"]) in self.tweets
+        ]
+        return self.tweet_from(data, author, tweet_mediums, tweet_polls, place, referenced_tweets)
+
+
+def response_to_users(resp: tweepy.Response, connection_status: bool = False) -> list[User]:
+    """
+    Build a list of :class:`User` instances from one response.
+
+    :param connection_status: whether the "connection_status" field is requested,
+        the field is absent in users having no relationship with current account.
+    """
+    if not resp.data:
+        return []
+
+    includes = ResponseIncludes(resp.includes, isinstance(resp, RawResponse))
+    absent: dict[str, Any] = {"connection_status": []} if connection_status else {}
+    return [includes.user_of({**absent, **d}, includes.pinned_tweet_of(d)) for d in resp.data]
 
-        referenced_tweets = (
-            list(filter(lambda t: t.id in [t["id"] for t in data["referenced_tweets"]], tweets))
-            if data["referenced_tweets"] is not None
-            else []
-        )
 
-        return Tweet.from_response(data, author, tweet_mediums, tweet_polls, place, referenced_tweets)
+def response_to_tweets(resp: tweepy.Response) -> list[Tweet]:
+    """Build a list of :class:`Tweet` instances from one response."""
+    if not resp.data:
+        return []
 
-    return [map_one(d) for d in resp.data]
+    includes = ResponseIncludes(resp.includes, isinstance(resp, RawResponse))
+    return [includes.tweet_of(d) for d in resp.data]
 
 
 def query_paged_user_api(clt_func: Callable[..., Response], max_results: int = 1000, **kwargs: Any) -> list[User]:
@@ -527,7 +1415,45 @@ def query_paged_tweet_api(clt_func: Callable[..., Response], times: int = None,
     return query_paged_entity_api(clt_func, TWEET_API_PARAMS, response_to_tweets, times, max_results=100, **kwargs)
 
 
-E = TypeVar("E")
+def iter_paged_user_api(
+    clt_func: Callable[..., Response],
+    max_results: int = 1000,
+    prefetch: bool = False,
+    api_params: dict = None,
+    **kwargs: Any,
+) -> Iterator[User]:
+    return iter_paged_entity_api(
+        clt_func,
+        api_params or USER_API_PARAMS,
+        response_to_users,
+        max_results=max_results,
+        prefetch=prefetch,
+        **kwargs,
+    )
+
+
+def iter_checkpointed_user_api(
+    clt_func: Callable[..., Response], checkpoint: PagingCheckpoint | None, max_results: int = 1000, **kwargs: Any
+) -> Iterator[User]:
+    """
+    Like :func:`iter_paged_user_api`, but every queried page is saved into the ``checkpoint``,
+    and an unfinished pagination of the last run is continued from its saved pages and next token.
+    The checkpoint is removed once the last page is queried.
+    """
+    if checkpoint is None:
+        yield from iter_paged_user_api(clt_func, max_results, **kwargs)
+        return
+
+    pages, token = checkpoint.load()
+    for entities in pages:
+        yield from (User.parse_obj(e) for e in entities)
+
+    params = {**USER_API_PARAMS, **kwargs}
+    for response in paged_api_iter(clt_func, params, max_results, pagination_token=token):
+        users = response_to_users(response)
+        checkpoint.append([u.dict() for u in users], next_page_token(response))
+        yield from users
+    checkpoint.clear()
 
 
 def query_paged_entity_api(
@@ -538,57 +1464,261 @@ def query_paged_entity_api(
     max_results: int = 100,
     **kwargs: Any,
 ) -> list[E]:
-    # mix two part of params into one dict
-    params = {}
-    for k, v in api_params.items():
-        params[k] = v
-    if kwargs:
-        for k, v in kwargs.items():
-            params[k] = v
+    """Return all entities in (at most ``times``) pages as one list."""
+    return list(iter_paged_entity_api(clt_func, api_params, transforming_func, times, max_results, **kwargs))
 
-    # only query limited pages
-    # or use list() to query all pages
-    api_iter = paged_api_iter(clt_func, params, max_results)
-    responses = list(itertools.islice(api_iter, times)) if times else list(api_iter)
 
-    # and return all entities in responses as one list
-    return functools.reduce(lambda a, b: a + b, [transforming_func(r) for r in responses], [])
+def iter_paged_entity_api(
+    clt_func: Callable[..., Response],
+    api_params: dict,
+    transforming_func: Callable[[Response], list[E]],
+    times: int = None,
+    max_results: int = 100,
+    prefetch: bool = False,
+    **kwargs: Any,
+) -> Iterator[E]:
+    """
+    Stream entities page by page, only query limited pages if ``times`` is given.
+    Only the current page (and the prefetched next page) is kept in memory,
+    so the consumer can start processing entities before the last page is queried.
+    """
+    # mix two part of params into one dict
+    params = {**api_params, **kwargs}
+    for response in itertools.islice(paged_api_iter(clt_func, params, max_results, prefetch=prefetch), times):
+        yield from transforming_func(response)
 
 
 def paged_api_iter(
-    clt_func: Callable[..., Response], params: dict, max_results: int = 1000, pagination_token: str = None
-) -> tweepy.Response:
+    clt_func: Callable[..., Response],
+    params: dict,
+    max_results: int = 1000,
+    pagination_token: str = None,
+    prefetch: bool = False,
+) -> Iterator[tweepy.Response]:
     """
-    A recursion style generator that continue querying next page until hit the end.
-    https://stackoverflow.com/questions/8991840/recursion-using-yield
+    A generator that continue querying next page until hit the end.
+
+    With ``prefetch``, the next page is queried in a background thread while the caller
+    is processing the current one. When the caller stops early, at most one more page
+    than consumed is queried.
     """
-    response = clt_func(max_results=max_results, pagination_token=pagination_token, **params)
-    yield response
 
-    # if is called again, query next page
-    if hasattr(response, "meta") and "next_token" in response.meta:
-        yield from paged_api_iter(clt_func, params, max_results, response.meta["next_token"])
+    def query(token: str | None) -> tweepy.Response:
+        return clt_func(max_results=max_results, pagination_token=token, **params)
+
+    if not prefetch:
+        while True:
+            response = query(pagination_token)
+            yield response
+            if (pagination_token := next_page_token(response)) is None:
+                return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future: Future | None = executor.submit(query, pagination_token)
+        while future is not None:
+            response = future.result()
+            token = next_page_token(response)
+            future = executor.submit(query, token) if token is not None else None
+            yield response
+
+
+def next_page_token(response: tweepy.Response) -> str | None:
+    return response.meta["next_token"] if hasattr(response, "meta") and "next_token" in response.meta else None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether the error is caused by hitting a Twitter API rate limit (429 Too Many Requests)."""
+    return isinstance(error, TwitterClientError) and isinstance(error.__cause__, tweepy.errors.TooManyRequests)
+
+
+def rate_limit_reset_time(error: Exception, default_wait: float = 15 * 60) -> float:
+    """
+    Read the epoch seconds when the rate limit window resets from the 429 response headers.
+    :param error: the :class:`TwitterClientError` or the tweepy error it wraps
+    """
+    cause = error.__cause__ if isinstance(error, TwitterClientError) else error
+    response = getattr(cause, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    reset = headers.get("x-rate-limit-reset")
+    return float(reset) if reset else time.time() + default_wait
+
+
+class ClientPool:
+    """
+    A load-balancing client grid, contains one :class:`Client` for each configured credential set.
+
+    Reads (querying users, tweets...) are sent through the client which has the most remaining quota
+    on that endpoint, and automatically fail over to other clients when one of them hits 429.
+    Writes (blocking...) and queries about current account's relationship
+    are pinned to the owner client - the one built with the main secrets,
+    since the action should be performed on the owner account.
+
+    Remaining quota is estimated by counting each client's calls in the last rate limit window,
+    all clients share the same documented limits, so the least used one has the most quota.
+
+    Users lookups are the exception, they are sent through the owner client until its quota is used up:
+    only the owner's lookups tell the looked up users' relationships with the owner account ("connection_status"),
+    without them, blocking users needs downloading whole relationship lists (15 pages / 15 min),
+    which costs much more than the readers' lookups save.
+    """
+
+    # The rate limit window of Twitter API
+    WINDOW_SECONDS = 15 * 60
+
+    # reads sent through the owner client first -> their endpoint (see :data:`RATE_LIMITS`)
+    OWNER_FIRST = {"get_users_by_ids": "get_users", "get_users_by_usernames": "get_users_by"}
+
+    def __init__(self, owner: Client, readers: list[Client], sleep: Callable[[float], None] = time.sleep):
+        self.owner = owner
+        self._sleep = sleep
+        self.clients = [owner, *readers]
+        # fail over to other clients instead of waiting for the rate limit reset
+        for c in self.clients:
+            c.retry.retry_rate_limited = False
+        # readers' relationships are not the owner's, which blocking decisions are made with
+        for r in readers:
+            r.lookup_connection_status = False
+        self._lock = threading.Lock()
+        # (client index, endpoint) -> call timestamps in the current window
+        self._calls: dict[tuple[int, str], collections.deque] = collections.defaultdict(collections.deque)
+        # (client index, endpoint) -> epoch seconds when the client can query this endpoint again
+        self._exhausted_until: dict[tuple[int, str], float] = {}
+        # the trade-off of sending owner-first reads through readers is logged once
+        self._owner_first_fell_over = False
+
+    @staticmethod
+    def singleton() -> Client | ClientPool:
+        """Return the plain owner client if there is no extra credential saved in the secrets file."""
+        if config.settings.get("extra_credentials"):
+            logger.warning(
+                "Extra credentials in plaintext settings are ignored, "
+                'save them into the secrets file with "puntgun gen extra-credentials"'
+            )
+        if secret.extra_credentials_count() == 0:
+            return Client.singleton()
+        return ClientPool._pool_singleton()
+
+    @staticmethod
+    @single_flight
+    def _pool_singleton() -> ClientPool:
+        readers = [
+            Client(
+                tweepy.Client(**c),
+                RateLimitScheduler.from_settings(c["consumer_key"], c["access_token"]),
+                UserCache.from_settings(),
+                session=shared_http_session(),
+                retry=RetryPolicy.from_settings(),
+                missing_users=MissingUserStore.from_settings(),
+                # tweets read with each token are counted in its own monthly cap
+                tweet_caps=TweetCapLedger.from_settings(),
+            )
+            for c in load_extra_credentials()
+        ]
+        logger.info("Built client pool with {} extra credential sets", len(readers))
+        return ClientPool(Client.singleton(), readers)
+
+    def __getattr__(self, name: str) -> Any:
+        """Anything not declared as a read goes to the owner client."""
+        return getattr(self.owner, name)
+
+    def _pick(self, endpoint: str) -> tuple[int, float]:
+        """
+        Choose the client with the most remaining quota that isn't rate limited.
+        :return: (client index, 0) or (-1, seconds to wait) if all clients are rate limited.
+        """
+        now = time.time()
+        with self._lock:
+            best, best_used, earliest_reset = -1, 0, float("inf")
+            for i in range(len(self.clients)):
+                until = self._exhausted_until.get((i, endpoint), 0)
+                if until > now:
+                    earliest_reset = min(earliest_reset, until)
+                    continue
+
+                calls = self._calls[(i, endpoint)]
+                while calls and calls[0] <= now - self.WINDOW_SECONDS:
+                    calls.popleft()
+                if i == 0 and self._owner_has_quota(endpoint, len(calls)):
+                    best = 0
+                    break
+                if best < 0 or len(calls) < best_used:
+                    best, best_used = i, len(calls)
+
+            if best < 0:
+                return -1, earliest_reset - now
+
+            if best > 0 and endpoint in self.OWNER_FIRST and not self._owner_first_fell_over:
+                self._owner_first_fell_over = True
+                logger.warning(
+                    "The owner credential's quota of [{}] is used up, looking up users with extra credentials, "
+                    "whose lookups don't tell relationships with your account, "
+                    "relationship lists will be downloaded for blocking these users",
+                    endpoint,
+                )
+            self._calls[(best, endpoint)].append(now)
+            return best, 0
+
+    def _owner_has_quota(self, endpoint: str, used: int) -> bool:
+        """Whether the read is sent through the owner client first and it has quota left in the window."""
+        limit = RATE_LIMITS.get(self.OWNER_FIRST.get(endpoint, ""))
+        return limit is not None and used < limit[0]
+
+    def _read(self, endpoint: str, *args: Any, **kwargs: Any) -> Any:
+        while True:
+            index, wait = self._pick(endpoint)
+            if index < 0:
+                logger.info("All clients hit the rate limit of [{}], wait {:.0f} seconds", endpoint, wait)
+                Telemetry.singleton().observe_wait(endpoint, wait)
+                self._sleep(wait)
+                continue
+
+            try:
+                return getattr(self.clients[index], endpoint)(*args, **kwargs)
+            except TwitterClientError as e:
+                if not is_rate_limited(e):
+                    raise
+                logger.info("Client[{}] hit the rate limit of [{}], fail over to other clients", index, endpoint)
+                with self._lock:
+                    self._exhausted_until[(index, endpoint)] = rate_limit_reset_time(e)
+
+    def get_users_by_usernames(self, names: list[str], fields: set[str] = None) -> list[User]:
+        return self._read("get_users_by_usernames", names, fields)
+
+    def get_users_by_ids(self, ids: list[int | str], fields: set[str] = None) -> list[User]:
+        return self._read("get_users_by_ids", ids, fields)
+
+    def get_following(self, user_id: int | str) -> list[User]:
+        return self._read("get_following", user_id)
+
+    def get_follower(self, user_id: int | str) -> list[User]:
+        return self._read("get_follower", user_id)
+
+    def get_tweets_by_ids(self, ids: list[int | str]) -> list[Tweet]:
+        return self._read("get_tweets_by_ids", ids)
+
+    def get_users_who_like_tweet(self, tweet_id: int | str) -> list[User]:
+        return self._read("get_users_who_like_tweet", tweet_id)
+
+    def get_users_who_retweet_tweet(self, tweet_id: int | str) -> list[User]:
+        return self._read("get_users_who_retweet_tweet", tweet_id)
 
 
 class NeedClientMixin:
     """
     Some rules need a :class:`Client` to call for getting extra information.
-    This class provides a lazy loading client field (call Client.singleton()).
+    This class provides a lazy loading client field (call ClientPool.singleton()).
 
     This class can also be used to label filter rules that take time to run their judgements
     (because they need to query Twitter API) and can't return immediately.
-
-    IMPROVE: Use multiple Twitter API tokens to build multiple clients, make a load-balancing client grid,
-    reducing the impact of API rate limit on program performance.
     """
 
     @property
-    def client(self) -> Client:
+    def client(self) -> Client | ClientPool:
         """
         Lazy load the client field to avoid:
         run unit test -> initialize this class -> call Client.singleton() -> require terminal input -> test fail
         https://github.com/samuelcolvin/pydantic/issues/1035#issuecomment-559043877
 
-        Directly return the invocation for now, may complicate it for load balancing in the future.
+        Returns the load-balancing pool when there are extra credential sets configured.
         """
-        return Client.singleton()
+        return ClientPool.singleton()
@@ -1,12 +1,16 @@
 """The implementation of commands"""
 from __future__ import annotations
 
+import os
+from datetime import datetime
 from pathlib import Path
+from typing import Any
 
+import orjson
 from loguru import logger
 
 from puntgun import runner, util
-from puntgun.conf import config, encrypto, example, secret
+from puntgun.conf import agent, config, encrypto, example, secret
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
@@ -25,7 +29,7 @@ def fire(args: dict[config.CommandArg, str]) -> None:
         exit(1)
 
 
-def load_secrets_with_keyboard_interrupt_exit() -> dict[str, str]:
+def load_secrets_with_keyboard_interrupt_exit() -> dict[str, Any]:
     try:
         return secret.load_or_request_all_secrets(encrypto.load_or_generate_private_key())
     except KeyboardInterrupt:
@@ -44,6 +48,16 @@ class Gen:
         config.reload_important_files(args)
         load_secrets_with_keyboard_interrupt_exit()
 
+    @staticmethod
+    def extra_credentials(args: dict[config.CommandArg, str]) -> None:
+        config.reload_important_files(args)
+        try:
+            secrets = secret.add_extra_credentials(encrypto.load_or_generate_private_key())
+        except KeyboardInterrupt:
+            logger.bind(o=True).info("The tool is stopped by the keyboard.")
+            exit(1)
+        print(f"There are {len(secrets[secret.extra_credentials_name.lower()])} extra credential sets now.")
+
     @staticmethod
     def new_password(args: dict[config.CommandArg, str]) -> None:
         def get_new_password() -> str:
@@ -82,7 +96,11 @@ class Gen:
         output_file_path = Path(output_file)
         util.backup_if_exists(output_file_path)
         with open(output_file_path, "w", encoding="utf-8") as f:
-            f.writelines(f"{key}: {value}\n" for key, value in secrets.items())
+            # extra credential sets are dumped as a json (also yaml) list
+            f.writelines(
+                f"{key}: {value if isinstance(value, str) else orjson.dumps(value).decode('utf-8')}\n"
+                for key, value in secrets.items()
+            )
 
         print(f"Secrets are dumped: {output_file_path}")
 
@@ -105,6 +123,64 @@ class Gen:
 
 class Check:
     @staticmethod
-    def plan(args: dict[config.CommandArg, str]) -> None:
+    def plan(args: dict[config.CommandArg, str], estimate: bool = False) -> None:
+        config.reload_important_files(args)
+        plans = runner.parse_plans_config(runner.get_and_validate_plan_config())
+        if estimate:
+            runner.estimate_plans(plans)
+
+
+AGENT_STARTED = """Secrets agent started (pid {pid}), it serves secrets until {expires_at}.
+Stop it earlier with "puntgun agent stop"."""
+
+
+class Agent:
+    @staticmethod
+    def start(args: dict[config.CommandArg, str], ttl_hours: float | None = None, foreground: bool = False) -> None:
+        config.reload_important_files(args)
+        if not agent.agent_available():
+            print("The secrets agent is not supported on this platform (needs Unix domain sockets).")
+            return
+        if agent.request("status") is not None:
+            print(f"A secrets agent is already running on {agent.socket_file()}")
+            return
+
+        ttl = ttl_hours * 3600 if ttl_hours is not None else agent.SecretsAgent.ttl_from_settings()
+        secrets_agent = agent.SecretsAgent(load_secrets_with_keyboard_interrupt_exit(), agent.socket_file(), ttl)
+        expires_at = datetime.fromtimestamp(secrets_agent.expires_at)
+        if foreground:
+            print(AGENT_STARTED.format(pid=os.getpid(), expires_at=expires_at))
+            secrets_agent.serve()
+            return
+
+        # detach from the terminal like ssh-agent, the password has been entered
+        pid = os.fork()
+        if pid:
+            print(AGENT_STARTED.format(pid=pid, expires_at=expires_at))
+            return
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        try:
+            secrets_agent.serve()
+        finally:
+            os._exit(0)
+
+    @staticmethod
+    def stop(args: dict[config.CommandArg, str]) -> None:
+        config.reload_important_files(args)
+        if agent.request("stop") is None:
+            print("No secrets agent is running.")
+        else:
+            print("Secrets agent stopped.")
+
+    @staticmethod
+    def status(args: dict[config.CommandArg, str]) -> None:
         config.reload_important_files(args)
-        runner.parse_plans_config(runner.get_and_validate_plan_config())
+        status = agent.request("status")
+        if status is None:
+            print("No secrets agent is running.")
+        else:
+            expires_at = datetime.fromtimestamp(status["expires_at"])
+            print(f"Secrets agent (pid {status['pid']}) is serving on {agent.socket_file()} until {expires_at}")
@@ -0,0 +1,171 @@
+"""
+A local secrets agent, like ssh-agent.
+
+Loading secrets from the secrets file costs a password prompt (or the "read_password_from_stdin" workaround),
+the expensive key derivation of the password protected private key and several RSA decryptions,
+which make up most of the startup time of short runs scheduled by cron.
+
+The agent process unlocks the private key once, keeps the decrypted secrets in memory
+and serves them to the tool's invocations of the same OS user over a Unix domain socket under the config path,
+until its session expires (or it's stopped).
+Invocations fall back to loading secrets by themselves if there is no agent running.
+
+The protocol is one json line request and one json line response per connection:
+{"op": "secrets" | "status" | "stop"}
+"""
+from __future__ import annotations
+
+import os
+import socket
+import socketserver
+import struct
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import orjson
+from loguru import logger
+
+from puntgun.conf import config
+
+SOCKET_FILE_NAME = "agent.sock"
+
+# Seconds that a client waits for the agent, a living agent answers in milliseconds.
+CLIENT_TIMEOUT = 2
+# Seconds that the agent waits for a connected client's request before dropping the connection.
+REQUEST_TIMEOUT = 2
+
+
+def agent_available() -> bool:
+    """Unix domain sockets are not available on every platform (e.g. Windows)."""
+    return hasattr(socket, "AF_UNIX")
+
+
+def socket_file() -> Path:
+    return config.config_path.joinpath(SOCKET_FILE_NAME)
+
+
+def peer_uid(conn: socket.socket) -> int | None:
+    """The OS user id of the process on the other side, None if the platform can't tell."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+class SecretsAgent:
+    """
+    Serves ``secrets`` on the socket file until ``expires_at``, or a "stop" request.
+    Only accepts connections from processes of the same OS user, the socket file is only accessible by the user too.
+    Connections are served in their own threads, a client that never sends its request
+    can't block other clients or the expiry, which forgets the secrets.
+    """
+
+    def __init__(
+        self,
+        secrets: dict[str, Any],
+        file: Path,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._secrets = secrets
+        self.file = file
+        self.expires_at = clock() + ttl
+        self._clock = clock
+        self._stopped = False
+
+    @staticmethod
+    def ttl_from_settings() -> float:
+        return float(config.settings.get("agent_ttl_hours", 8)) * 3600
+
+    def expired(self) -> bool:
+        return self._stopped or self._clock() >= self.expires_at
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.get("op")
+        if self.expired():
+            return {"error": "session expired"}
+        if op == "secrets":
+            return {"secrets": self._secrets}
+        if op == "status":
+            return {"pid": os.getpid(), "expires_at": self.expires_at}
+        if op == "stop":
+            self._stopped = True
+            return {"stopped": True}
+        return {"error": f"unknown operation: {op}"}
+
+    def serve(self) -> None:
+        """Block until the session expires, the socket file is removed at the end."""
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            # set on the connection's socket, reading the request line times out
+            timeout = REQUEST_TIMEOUT
+
+            def handle(self) -> None:
+                uid = peer_uid(self.request)
+                if uid is not None and uid != os.getuid():
+                    logger.warning("Refuse a connection from another user [uid={}]", uid)
+                    return
+                try:
+                    line = self.rfile.readline()
+                except TimeoutError:
+                    logger.info("Drop a connection that sent no request in {} seconds", REQUEST_TIMEOUT)
+                    return
+                try:
+                    response = agent.handle(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    response = {"error": "invalid request"}
+                self.wfile.write(orjson.dumps(response) + b"\n")
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if self.file.exists():
+            self.file.unlink()
+        # the socket file is created with permissions of the umask
+        old_umask = os.umask(0o177)
+        try:
+            server = Server(str(self.file), Handler)
+        finally:
+            os.umask(old_umask)
+
+        # wake up periodically for checking the expiry
+        server.timeout = 1
+        logger.info("Secrets agent is serving on [{}]", self.file)
+        try:
+            with server:
+                while not self.expired():
+                    server.handle_request()
+        finally:
+            self._secrets = {}
+            if self.file.exists():
+                self.file.unlink()
+            logger.info("Secrets agent stopped")
+
+
+def request(op: str, file: Path = None) -> dict[str, Any] | None:
+    """Send one request to the agent, return None if there is no agent running."""
+    file = file or socket_file()
+    if not agent_available() or not file.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(CLIENT_TIMEOUT)
+            conn.connect(str(file))
+            conn.sendall(orjson.dumps({"op": op}) + b"\n")
+            with conn.makefile("rb") as f:
+                return orjson.loads(f.readline())
+    except (OSError, orjson.JSONDecodeError) as e:
+        # e.g. the socket file is left by a killed agent
+        logger.info("Secrets agent on [{}] is not available: {}", file, e)
+        return None
+
+
+def request_secrets(file: Path = None) -> dict[str, Any] | None:
+    """Decrypted secrets from the agent, None if there is no agent running."""
+    response = request("secrets", file)
+    if response is None or "secrets" not in response:
+        return None
+    logger.info("Loaded secrets from the secrets agent")
+    return response["secrets"]
@@ -1,21 +1,141 @@
-"""Methods that access, modify, and save secrets that need to be encrypted, as well as private key itself."""
+"""
+Methods that access, modify, and save secrets that need to be encrypted, as well as private key itself.
+
+There are two cipher backends, chosen by the type of the key:
+* :class:`X25519EnvelopeCipher` (secrets file format 2, the default for new keys):
+  key agreement with an ephemeral X25519 key, then one AES-GCM envelope over the whole secrets mapping.
+  Generating keys and decrypting are near-instant.
+* :class:`RsaOaepCipher` (secrets file format 1, legacy): each secret is encrypted separately with a RSA-4096 key.
+  Legacy private keys are replaced with X25519 ones when they are loaded,
+  along with re-encrypting the secrets file, see :func:`migrate_legacy_key`.
+"""
+from __future__ import annotations
+
 import functools
+import os
 import sys
 from pathlib import Path
+from typing import Union
 
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding, rsa
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
+from cryptography.hazmat.primitives.asymmetric.x25519 import (
+    X25519PrivateKey,
+    X25519PublicKey,
+)
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from loguru import logger
 
 from puntgun import util
 from puntgun.conf import config
 
+PrivateKey = Union[X25519PrivateKey, RSAPrivateKey]
+PublicKey = Union[X25519PublicKey, RSAPublicKey]
+
 encrypt_padding = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
 
 
+class RsaOaepCipher:
+    """Legacy backend, encrypts each secret with RSA-OAEP, the plaintext length is limited by the key size."""
+
+    FORMAT = 1
+    # whether the whole secrets mapping is encrypted into one envelope
+    ENVELOPE = False
+    private_key_type = RSAPrivateKey
+    public_key_type = RSAPublicKey
+
+    @staticmethod
+    def generate_private_key() -> RSAPrivateKey:
+        return rsa.generate_private_key(public_exponent=65537, key_size=4096)
+
+    @staticmethod
+    def encrypt(pub_key: RSAPublicKey, plaintext: bytes) -> bytes:
+        return pub_key.encrypt(plaintext, encrypt_padding)
+
+    @staticmethod
+    def decrypt(pri_key: RSAPrivateKey, ciphertext: bytes) -> bytes:
+        return pri_key.decrypt(ciphertext, encrypt_padding)
+
+
+class X25519EnvelopeCipher:
+    """
+    Hybrid (envelope) encryption, like the ECIES:
+    an AES-256-GCM key is derived (HKDF-SHA256) from the X25519 key agreement
+    between an ephemeral key and the recipient key, then the plaintext is encrypted with it.
+    Ciphertext layout: ephemeral public key (32 bytes) | nonce (12 bytes) | AES-GCM ciphertext and tag.
+    """
+
+    FORMAT = 2
+    ENVELOPE = True
+    private_key_type = X25519PrivateKey
+    public_key_type = X25519PublicKey
+
+    KEY_LENGTH = 32
+    NONCE_LENGTH = 12
+    INFO = b"puntgun secrets envelope v2"
+
+    @staticmethod
+    def generate_private_key() -> X25519PrivateKey:
+        return X25519PrivateKey.generate()
+
+    @staticmethod
+    def _raw(pub_key: X25519PublicKey) -> bytes:
+        return pub_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+    @staticmethod
+    def _derive_key(shared: bytes, ephemeral: bytes, recipient: bytes) -> AESGCM:
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=X25519EnvelopeCipher.KEY_LENGTH,
+            # bind the key to both parties of the agreement
+            salt=ephemeral + recipient,
+            info=X25519EnvelopeCipher.INFO,
+        )
+        return AESGCM(hkdf.derive(shared))
+
+    @staticmethod
+    def encrypt(pub_key: X25519PublicKey, plaintext: bytes) -> bytes:
+        cipher = X25519EnvelopeCipher
+        ephemeral_key = X25519PrivateKey.generate()
+        ephemeral = cipher._raw(ephemeral_key.public_key())
+        aead = cipher._derive_key(ephemeral_key.exchange(pub_key), ephemeral, cipher._raw(pub_key))
+        nonce = os.urandom(cipher.NONCE_LENGTH)
+        return ephemeral + nonce + aead.encrypt(nonce, plaintext, cipher.INFO)
+
+    @staticmethod
+    def decrypt(pri_key: X25519PrivateKey, ciphertext: bytes) -> bytes:
+        cipher = X25519EnvelopeCipher
+        ephemeral = ciphertext[: cipher.KEY_LENGTH]
+        nonce = ciphertext[cipher.KEY_LENGTH : cipher.KEY_LENGTH + cipher.NONCE_LENGTH]
+        if len(nonce) != cipher.NONCE_LENGTH:
+            raise ValueError("The ciphertext is too short to be an envelope")
+        shared = pri_key.exchange(X25519PublicKey.from_public_bytes(ephemeral))
+        aead = cipher._derive_key(shared, ephemeral, cipher._raw(pri_key.public_key()))
+        try:
+            return aead.decrypt(nonce, ciphertext[cipher.KEY_LENGTH + cipher.NONCE_LENGTH :], cipher.INFO)
+        except InvalidTag as e:
+            # same error type as the RSA backend's decrypting failure
+            raise ValueError("Failed to decrypt, the key is wrong or the ciphertext is modified") from e
+
+
+CIPHERS: list[type[X25519EnvelopeCipher] | type[RsaOaepCipher]] = [X25519EnvelopeCipher, RsaOaepCipher]
+# the backend of newly generated keys
+DEFAULT_CIPHER = X25519EnvelopeCipher
+
+
+def cipher_of(key: PrivateKey | PublicKey) -> type[X25519EnvelopeCipher] | type[RsaOaepCipher]:
+    """The backend that can handle the key."""
+    for cipher in CIPHERS:
+        if isinstance(key, (cipher.private_key_type, cipher.public_key_type)):
+            return cipher
+    raise TypeError(f"Unsupported key type: {type(key)}")
+
+
 @functools.lru_cache(maxsize=1)
-def load_or_generate_public_key() -> RSAPublicKey:
+def load_or_generate_public_key() -> PublicKey:
     """For encrypting secrets."""
     return load_or_generate_private_key().public_key()
 
@@ -42,27 +162,29 @@ just delete the private key file and the secrets file and run it again.
 {secrets_file}"""
 
 
-def load_or_generate_private_key() -> RSAPrivateKey:
-    """Load private key for decrypting secrets."""
+def load_or_generate_private_key() -> PrivateKey:
+    """Load private key for decrypting secrets, legacy keys are migrated on loading."""
 
-    def load_with_password_from_prompt() -> RSAPrivateKey:
+    def load_with_password_from_prompt() -> tuple[PrivateKey, str]:
         """Trying different passwords in an infinity loop till the user get bored."""
         err_count = 0
         while True:
             if err_count > 2:
                 print("Maybe you want to reset the password as described above.")
             try:
-                private_key = load_private_key(util.get_secret_from_terminal("Password"), config.pri_key_file)
+                pwd = util.get_secret_from_terminal("Password")
+                private_key = load_private_key(pwd, config.pri_key_file)
                 logger.info("Private key file loaded with correct password")
-                return private_key
+                return private_key, pwd
             except ValueError:
                 err_count += 1
                 print("Incorrect password.")
 
-    def load_with_password_from_stdin() -> RSAPrivateKey:
-        return load_private_key("".join(sys.stdin.readlines()), config.pri_key_file)
+    def load_with_password_from_stdin() -> tuple[PrivateKey, str]:
+        pwd = "".join(sys.stdin.readlines())
+        return load_private_key(pwd, config.pri_key_file), pwd
 
-    def generate_and_save() -> RSAPrivateKey:
+    def generate_and_save() -> PrivateKey:
         pwd = util.get_secret_from_terminal("Password")
         pri_key = generate_private_key()
         dump_private_key(pri_key, pwd, config.pri_key_file)
@@ -74,27 +196,104 @@ def load_or_generate_private_key() -> RSAPrivateKey:
         logger.info("Found the existing private key, trying to load with password")
         print(ENTER_PWD.format(pri_key_file=config.pri_key_file, secrets_file=config.secrets_file))
         if config.settings.get("read_password_from_stdin", False):
-            return load_with_password_from_stdin()
+            private_key, pwd = load_with_password_from_stdin()
         else:
-            return load_with_password_from_prompt()
+            private_key, pwd = load_with_password_from_prompt()
+        if cipher_of(private_key) is not DEFAULT_CIPHER:
+            return migrate_legacy_key(private_key, pwd)
+        return private_key
     else:
         logger.info("Generated a new private key")
         print(GENERATE_PRI_KEY.format(pri_key_file=config.pri_key_file, secrets_file=config.secrets_file))
         return generate_and_save()
 
 
+MIGRATED = """The private key and the secrets file have been migrated to a faster encryption scheme,
+with the same password. The original files are kept with a ".bak" suffix:
+{pri_key_file}
+{secrets_file}"""
+
+
+def migrate_legacy_key(legacy_key: PrivateKey, pwd: str) -> PrivateKey:
+    """
+    Replace the legacy private key with a new one of the default backend protected by the same password,
+    and re-encrypt the secrets file with it.
+    Keep using the legacy key if the secrets file can't be decrypted with it.
+
+    Both new files are written aside first, then renamed into place (the secrets file first),
+    so the legacy key stays in place until the re-encrypted secrets file is.
+    A migration interrupted between the two renames is finished on the next start:
+    the new key left aside is moved into place once it decrypts the secrets file.
+    """
+    # import lazily, the secret module depends on this module
+    from puntgun.conf import secret
+
+    def aside(path: Path) -> Path:
+        return path.with_name(path.name + ".tmp")
+
+    def move_into_place(file: Path, path: Path) -> None:
+        util.backup_if_exists(path)
+        os.replace(file, path)
+
+    def resume() -> PrivateKey | None:
+        """The new key of an interrupted migration, if the secrets file is already re-encrypted with it."""
+        if not aside(config.pri_key_file).exists():
+            return None
+        try:
+            key = load_private_key(pwd, aside(config.pri_key_file))
+            secret.load_secrets_from_settings(key)
+        except (ValueError, TypeError):
+            return None
+        move_into_place(aside(config.pri_key_file), config.pri_key_file)
+        load_or_generate_public_key.cache_clear()
+        logger.info("Finished the interrupted migration of the private key")
+        return key
+
+    try:
+        secrets = secret.load_secrets_from_settings(legacy_key) if secret.secrets_config_file_valid() else {}
+    except (ValueError, TypeError):
+        if key := resume():
+            return key
+        logger.warning("Failed to decrypt the secrets file with the legacy private key, skip migrating")
+        return legacy_key
+
+    new_key = generate_private_key()
+    new_key_file = aside(config.pri_key_file)
+    new_key_file.unlink(missing_ok=True)
+    dump_private_key(new_key, pwd, new_key_file)
+    if secrets:
+        new_secrets_file = aside(config.secrets_file)
+        new_secrets_file.unlink(missing_ok=True)
+        secret.encrypt_and_save_secrets_into_file(new_key.public_key(), new_secrets_file, **secrets)
+        move_into_place(new_secrets_file, config.secrets_file)
+
+    move_into_place(new_key_file, config.pri_key_file)
+    if secrets:
+        secret.reload_secrets_settings()
+    load_or_generate_public_key.cache_clear()
+    logger.bind(o=True).info(MIGRATED.format(pri_key_file=config.pri_key_file, secrets_file=config.secrets_file))
+    return new_key
+
+
 # == low level ==
 
 
-def encrypt(pub_key: RSAPublicKey, plaintext: str) -> bytes:
-    return pub_key.encrypt(bytes(plaintext, "utf-8"), encrypt_padding)
+def encrypt(pub_key: PublicKey, plaintext: str | bytes) -> bytes:
+    if isinstance(plaintext, str):
+        plaintext = bytes(plaintext, "utf-8")
+    # dispatch on the key itself, which narrows its type for the backend
+    if isinstance(pub_key, X25519PublicKey):
+        return X25519EnvelopeCipher.encrypt(pub_key, plaintext)
+    return RsaOaepCipher.encrypt(pub_key, plaintext)
 
 
-def decrypt(pri_key: RSAPrivateKey, ciphertext: bytes) -> str:
-    return pri_key.decrypt(ciphertext, encrypt_padding).decode("utf-8")
+def decrypt(pri_key: PrivateKey, ciphertext: bytes) -> str:
+    if isinstance(pri_key, X25519PrivateKey):
+        return X25519EnvelopeCipher.decrypt(pri_key, ciphertext).decode("utf-8")
+    return RsaOaepCipher.decrypt(pri_key, ciphertext).decode("utf-8")
 
 
-def dump_private_key(pri_key: RSAPrivateKey, pwd: str, file_path: Path) -> None:
+def dump_private_key(pri_key: PrivateKey, pwd: str, file_path: Path) -> None:
     """will overwrite the file if it already exists"""
     util.backup_if_exists(file_path)
     with open(file_path, "wb") as f:
@@ -111,14 +310,14 @@ def dump_private_key(pri_key: RSAPrivateKey, pwd: str, file_path: Path) -> None:
         )
 
 
-def load_private_key(pwd: str, file_path: Path) -> RSAPrivateKey:
+def load_private_key(pwd: str, file_path: Path) -> PrivateKey:
     with open(file_path, "rb") as f:
-        return serialization.load_pem_private_key(f.read(), password=bytes(pwd, "utf-8"))
+        private_key = serialization.load_pem_private_key(f.read(), password=bytes(pwd, "utf-8"))
+    if not isinstance(private_key, (X25519PrivateKey, RSAPrivateKey)):
+        raise TypeError(f"Unsupported key type: {type(private_key)}")
+    return private_key
 
 
-def generate_private_key() -> RSAPrivateKey:
+def generate_private_key() -> PrivateKey:
     # https://crypto.stackexchange.com/questions/19458/what-is-the-difference-between-secp-and-sect
-    #
-    # IMPROVE: If we can change the encryption algorithm to something in elliptic curve class,
-    # we can speed up processes related to encryption (and improve security level?)
-    return rsa.generate_private_key(public_exponent=65537, key_size=4096)
+    return DEFAULT_CIPHER.generate_private_key()
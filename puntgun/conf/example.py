@@ -28,6 +28,88 @@ tool_settings = """# The settings of the tool itself.
 # instead of ask user input it through terminal.
 # One of several ways to automate the running of this tool.
 #read_password_from_stdin: false
+
+# How long (in hours) the secrets agent ("puntgun agent start") serves decrypted secrets before exiting.
+#agent_ttl_hours: 8
+
+# How long looked up users are cached (in hours) to save API invocations,
+# set to 0 for turning off the cache.
+#user_cache_ttl_hours: 24
+
+# How many users can be cached in memory.
+#user_cache_memory_size: 100000
+
+# Whether to also save looked up users into a local file for later runs.
+#user_cache_on_disk: false
+
+# How many users can be saved in the local file.
+#user_cache_disk_size: 1000000
+
+# How long (in hours) not existing users (deleted or suspended accounts) are remembered in a local file
+# for not looking them up again, set to 0 for turning it off.
+#missing_user_cache_ttl_hours: 720
+
+# Whether to save every queried page of long lists (blocked, follower, following)
+# into local checkpoint files, so that an interrupted run continues from where it stopped.
+#paging_checkpoint: false
+
+# How long (in hours) an unfinished checkpoint can be continued, older ones are dropped.
+#paging_checkpoint_expire_hours: 24
+
+# Whether to keep a local mirror of your blocked, follower and following lists,
+# only the newly added part of the lists is queried on latter runs.
+#relationship_mirror: false
+
+# How often (in hours) the mirrored lists are fully re-queried, for noticing removed relationships.
+#relationship_mirror_reconcile_hours: 168
+
+# How many kept-alive connections to Twitter API can be opened at the same time,
+# shared by all credential sets.
+#http_pool_size: 32
+
+# Seconds to wait for connecting to and reading from Twitter API before giving up.
+#http_connect_timeout: 10
+#http_read_timeout: 60
+
+# How many times a Twitter API request is attempted when it fails transiently
+# (server errors, network failures, timeouts, rate limited),
+# failed queries are skipped and recorded into the report after the last attempt.
+#retry_attempts: 4
+
+# Exponential backoff (with random jitter) between attempts, in seconds.
+#retry_base_delay: 1
+#retry_max_delay: 60
+
+# Whether to build users and tweets from Twitter API responses with full validation,
+# slower on long lists, only for debugging when the responses look wrong.
+#validate_responses: false
+
+# Whether to share rate limit budgets with other runs of the tool on this machine
+# through a local file, for running several plan files (e.g. from cron) against the same account
+# without all of them hitting the rate limits.
+#budget_ledger: false
+
+# How many tweets your Twitter API access can consume in a month (Tweet cap),
+# consumed tweets are accounted in a local file, and tweet consuming queries (searching tweets)
+# stop before the cap is used up. Set to 0 for turning the accounting off.
+# https://developer.twitter.com/en/docs/twitter-api/tweet-caps
+#monthly_tweet_cap: 500000
+
+# Record every Twitter API request and response into a local cassette file ("record"),
+# or serve responses from the cassette without network and secrets ("replay"),
+# for re-running plans offline. Set to "off" for normal runs.
+#cassette_mode: off
+
+# Where the cassette file is, default is "cassette.jsonl" under the config path.
+#cassette_file: ~/.puntgun/cassette.jsonl
+
+# Send Twitter API requests to another host instead of "https://api.twitter.com",
+# e.g. the local stand-in server for load testing (python -m puntgun.standin).
+#api_base_url: http://127.0.0.1:8000
+
+# Extra Twitter API credential sets for spreading read-only queries (looking up users...)
+# over more rate limit quotas are saved in the encrypted secrets file,
+# add them with the "puntgun gen extra-credentials" command.
 """
 
 plan_config = """# This is an example plan configuration file.
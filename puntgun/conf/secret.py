@@ -1,16 +1,19 @@
 from __future__ import annotations
 
 import binascii
+import functools
 from pathlib import Path
+from typing import Any
 
 import dynaconf
-from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
+import orjson
 from loguru import logger
 from pydantic import BaseModel
 from tweepy import OAuth1UserHandler
 
 from puntgun import util
 from puntgun.conf import config, encrypto
+from puntgun.conf.encrypto import PrivateKey, PublicKey
 
 # names of secrets in the secret settings file
 twitter_api_key_name = "AK"
@@ -18,6 +21,17 @@ twitter_api_key_secret_name = "AKS"
 twitter_access_token_name = "AT"
 twitter_access_token_secret_name = "ATS"
 
+# The secrets file's format version (see :mod:`encrypto`), files without it are in the legacy format 1:
+# one "<name>: <hex of ciphertext>" line per secret.
+# Since format 2, all secrets are encrypted into one envelope under the "secrets" key.
+secrets_format_name = "SECRETS_FORMAT"
+secrets_envelope_name = "SECRETS"
+# Extra credential sets for spreading read-only queries (see :class:`puntgun.client.ClientPool`),
+# a list of {"ak", "aks", "at", "ats"} mappings in the envelope,
+# and their count in plaintext for deciding whether to build the pool before loading secrets.
+extra_credentials_name = "EXTRA_CREDENTIALS"
+extra_credentials_count_name = "EXTRA_CREDENTIALS_COUNT"
+
 GET_API_SECRETS_FROM_INPUT = """Now we need a "Twitter Dev OAuth App API" to continue.
 With this, we can request the developer APIs provided by Twitter.
 You can get one by signing up on link below for free if you have a Twitter account.
@@ -68,7 +82,7 @@ class TwitterAPISecrets(BaseModel):
         )
 
     @staticmethod
-    def from_settings(pri_key: RSAPrivateKey) -> TwitterAPISecrets:
+    def from_settings(pri_key: PrivateKey) -> TwitterAPISecrets:
         return TwitterAPISecrets(
             key=load_and_decrypt_secret_from_settings(pri_key, twitter_api_key_name),
             secret=load_and_decrypt_secret_from_settings(pri_key, twitter_api_key_secret_name),
@@ -110,7 +124,7 @@ class TwitterAccessTokenSecrets(BaseModel):
         )
 
     @staticmethod
-    def from_settings(pri_key: RSAPrivateKey) -> TwitterAccessTokenSecrets:
+    def from_settings(pri_key: PrivateKey) -> TwitterAccessTokenSecrets:
         return TwitterAccessTokenSecrets(
             token=load_and_decrypt_secret_from_settings(pri_key, twitter_access_token_name),
             secret=load_and_decrypt_secret_from_settings(pri_key, twitter_access_token_secret_name),
@@ -130,15 +144,18 @@ so next time you running this tool you need not enter these annoying unreadable
 And we'll encrypt them before saving, it's time to load your private key."""
 
 
-def load_or_request_all_secrets(pri_key: RSAPrivateKey) -> dict[str, str]:
+def load_or_request_all_secrets(pri_key: PrivateKey) -> dict[str, Any]:
     api_secrets = load_or_request_api_secrets(pri_key)
     access_token_secrets = load_or_request_access_token_secrets(api_secrets, pri_key)
-    secrets = {
+    secrets: dict[str, Any] = {
         "ak": api_secrets.key,
         "aks": api_secrets.secret,
         "at": access_token_secrets.token,
         "ats": access_token_secrets.secret,
     }
+    extra_credentials = load_extra_credentials(pri_key)
+    if extra_credentials:
+        secrets[extra_credentials_name.lower()] = extra_credentials
 
     # Save the secrets into file if they are not saved yet.
     # Must save them at once because saving method will override the existing file.
@@ -150,7 +167,7 @@ def load_or_request_all_secrets(pri_key: RSAPrivateKey) -> dict[str, str]:
     return secrets
 
 
-def load_or_request_api_secrets(pri_key: RSAPrivateKey = None) -> TwitterAPISecrets:
+def load_or_request_api_secrets(pri_key: PrivateKey = None) -> TwitterAPISecrets:
     try:
         return TwitterAPISecrets.from_environment()
     except ValueError:
@@ -178,7 +195,7 @@ def load_or_request_api_secrets(pri_key: RSAPrivateKey = None) -> TwitterAPISecr
 
 
 def load_or_request_access_token_secrets(
-    api_secrets: TwitterAPISecrets, pri_key: RSAPrivateKey = None
+    api_secrets: TwitterAPISecrets, pri_key: PrivateKey = None
 ) -> TwitterAccessTokenSecrets:
     try:
         return TwitterAccessTokenSecrets.from_environment()
@@ -200,6 +217,51 @@ def load_or_request_access_token_secrets(
     return TwitterAccessTokenSecrets.from_input(api_secrets)
 
 
+def load_extra_credentials(pri_key: PrivateKey) -> list[dict[str, str]]:
+    """Extra credential sets saved in the secrets file, empty if there is none."""
+    if extra_credentials_count() == 0 or not secrets_config_file_valid():
+        return []
+    try:
+        return load_extra_credentials_from_settings(pri_key)
+    except (ValueError, TypeError):
+        logger.warning("Failed to load extra credentials from the secrets file, only use the main secrets")
+        return []
+
+
+def extra_credentials_count(dynaconf_settings: dynaconf.Dynaconf = None) -> int:
+    """How many extra credential sets are saved in the secrets file, without decrypting it."""
+    if not dynaconf_settings:
+        dynaconf_settings = config.settings
+    return int(dynaconf_settings.get(extra_credentials_count_name.lower(), 0))
+
+
+ADD_EXTRA_CREDENTIALS = """Extra credential sets are only used for read-only queries (looking up users...),
+each of them is an API key pair of another "Twitter Dev OAuth App" and an access token authorized for that App.
+Actions like blocking are still performed with the main secrets."""
+
+
+def add_extra_credentials(pri_key: PrivateKey) -> dict[str, Any]:
+    """Request one more extra credential set from input and save it into the secrets file with other secrets."""
+    secrets = load_or_request_all_secrets(pri_key)
+    print(ADD_EXTRA_CREDENTIALS)
+    api_secrets = TwitterAPISecrets.from_input()
+    access_token_secrets = TwitterAccessTokenSecrets.from_input(api_secrets)
+    secrets[extra_credentials_name.lower()] = [
+        *secrets.get(extra_credentials_name.lower(), []),
+        {
+            "ak": api_secrets.key,
+            "aks": api_secrets.secret,
+            "at": access_token_secrets.token,
+            "ats": access_token_secrets.secret,
+        },
+    ]
+
+    encrypt_and_save_secrets_into_file(encrypto.load_or_generate_public_key(), config.secrets_file, **secrets)
+    reload_secrets_settings()
+    logger.bind(o=True).info(f"Secrets saved into file:\n({config.secrets_file})")
+    return secrets
+
+
 # == low level ==
 
 
@@ -214,28 +276,90 @@ def load_settings_from_environment_variables(name: str, dynaconf_settings: dynac
 
 
 def load_and_decrypt_secret_from_settings(
-    private_key: RSAPrivateKey, name: str, dynaconf_settings: dynaconf.Dynaconf = None
+    private_key: PrivateKey, name: str, dynaconf_settings: dynaconf.Dynaconf = None
 ) -> str:
     if not dynaconf_settings:
         dynaconf_settings = config.settings
-    return encrypto.decrypt(private_key, binascii.unhexlify(dynaconf_settings.get(name)))
+    if int(dynaconf_settings.get(secrets_format_name, 1)) < 2:
+        return encrypto.decrypt(private_key, binascii.unhexlify(dynaconf_settings.get(name)))
+
+    secrets = decrypt_envelope(private_key, dynaconf_settings.get(secrets_envelope_name))
+    if name.upper() not in secrets:
+        raise ValueError(f"Secret [{name}] is not in the secrets file")
+    return secrets[name.upper()]
+
+
+@functools.lru_cache(maxsize=1)
+def decrypt_envelope(private_key: PrivateKey, envelope: str) -> dict[str, Any]:
+    """
+    All secrets in the envelope (hex of the ciphertext), keyed by upper case names.
+    Decrypted once for reading every secret of the same file, a rewritten file has another envelope.
+    """
+    return {k.upper(): v for k, v in orjson.loads(encrypto.decrypt(private_key, binascii.unhexlify(envelope))).items()}
+
+
+def load_extra_credentials_from_settings(
+    private_key: PrivateKey, dynaconf_settings: dynaconf.Dynaconf = None
+) -> list[dict[str, str]]:
+    """Extra credential sets are only saved in the envelope, legacy files don't have them."""
+    if not dynaconf_settings:
+        dynaconf_settings = config.settings
+    if int(dynaconf_settings.get(secrets_format_name, 1)) < 2:
+        return []
+    return decrypt_envelope(private_key, dynaconf_settings.get(secrets_envelope_name)).get(extra_credentials_name, [])
+
+
+def load_secrets_from_settings(private_key: PrivateKey) -> dict[str, Any]:
+    """All secrets in the secrets file, named as :func:`load_or_request_all_secrets` does."""
+    names = [
+        twitter_api_key_name,
+        twitter_api_key_secret_name,
+        twitter_access_token_name,
+        twitter_access_token_secret_name,
+    ]
+    secrets: dict[str, Any] = {n.lower(): load_and_decrypt_secret_from_settings(private_key, n) for n in names}
+    extra_credentials = load_extra_credentials_from_settings(private_key)
+    if extra_credentials:
+        secrets[extra_credentials_name.lower()] = extra_credentials
+    return secrets
+
+
+def reload_secrets_settings() -> None:
+    """Let the loaded settings see the rewritten secrets file."""
+    config.settings.load_file(path=str(config.secrets_file))
 
 
 def encrypt_and_save_secrets_into_file(
-    public_key: RSAPublicKey, file_path: Path = config.secrets_file, **kwargs: str
+    public_key: PublicKey, file_path: Path = config.secrets_file, **kwargs: Any
 ) -> None:
     """
     Will overwrite the file if already exists.
-    Save the encrypted bytes as hex format into a file.
+    Save the encrypted bytes as hex format into a file,
+    in the format of the public key's backend (see :mod:`encrypto`).
+    Only the envelope format can save extra credential sets.
     """
 
-    def transform(msg: str) -> str:
+    def transform(msg: str | bytes) -> str:
         return binascii.hexlify(encrypto.encrypt(public_key, msg)).decode("utf-8")
 
+    cipher = encrypto.cipher_of(public_key)
+    if cipher.ENVELOPE:
+        # quoted for not being parsed as a number by chance
+        lines = [
+            f"{secrets_format_name.lower()}: {cipher.FORMAT}",
+            f'{secrets_envelope_name.lower()}: "{transform(orjson.dumps(kwargs))}"',
+        ]
+        if kwargs.get(extra_credentials_name.lower()):
+            lines.append(f"{extra_credentials_count_name.lower()}: {len(kwargs[extra_credentials_name.lower()])}")
+    else:
+        if extra_credentials_name.lower() in kwargs:
+            raise ValueError("Extra credentials can't be saved in the legacy secrets file format")
+        lines = [f"{key}: {transform(value)}" for key, value in kwargs.items()]
+
     util.backup_if_exists(file_path)
     with open(file_path, "w", encoding="utf-8") as f:
         # if we do not add '\n' at the tail, all items are printed into one line
-        f.writelines(f"{key}: {transform(value)}\n" for key, value in kwargs.items())
+        f.writelines(f"{line}\n" for line in lines)
 
 
 def secrets_config_file_valid() -> bool:
@@ -0,0 +1,195 @@
+"""
+Dry-run estimation of plans' API costs, without sending any request.
+
+Each rule tells how many calls it sends to each endpoint for the users it gets,
+the numbers are summed up along the plan tree, then the documented rate limits
+give the minimum wall-clock time that the plan needs.
+
+Filter rules' selectivity can't be known before running,
+so action costs are estimated for the worst case: every source user triggers the filter rules.
+"""
+from __future__ import annotations
+
+import collections
+import datetime
+import math
+from typing import Iterable
+
+from puntgun.cache import RelationshipMirror
+from puntgun.client import RATE_LIMITS, ClientPool
+from puntgun.conf import config
+
+# users per page of the relationship list APIs
+PAGE_SIZE = 1000
+# users or tweets per request of the lookup APIs
+LOOKUP_BATCH_SIZE = 100
+
+# tweepy methods for querying current account's relationship lists
+LIST_ENDPOINTS = {
+    "blocked": "get_blocked",
+    "follower": "get_users_followers",
+    "following": "get_users_following",
+}
+
+# Reads that the :class:`ClientPool` balances among all credential sets,
+# their rate limits are multiplied by the number of credential sets.
+POOLED_ENDPOINTS = frozenset({"get_users", "get_users_by", "get_tweets", "get_liking_users", "get_retweeters"})
+
+UNKNOWN_LIST_SIZE = "size of your {kind} list (enable relationship_mirror and run once to know it)"
+
+
+def pages(size: int, page_size: int = PAGE_SIZE) -> int:
+    """Number of requests for querying ``size`` entities, at least one even if there is no entity."""
+    return max(1, math.ceil(size / page_size))
+
+
+class RelationshipSizes:
+    """
+    Sizes of current account's relationship lists, known from the relationship mirror left by former runs.
+    It's the only source of sizes in dry-run, which doesn't send any request.
+    """
+
+    def __init__(self, sizes: dict[str, int] = None, synced: Iterable[str] = ()):
+        self._sizes = sizes or {}
+        # lists that the mirror will sync by querying only the newest pages
+        self._synced = set(synced)
+
+    @staticmethod
+    def from_mirror() -> RelationshipSizes:
+        mirror = RelationshipMirror.existing()
+        if mirror is None:
+            return RelationshipSizes()
+
+        lists = mirror.list_sizes()
+        mirror_on = config.settings.get("relationship_mirror", False)
+        return RelationshipSizes(
+            {kind: size for kind, (size, _) in lists.items()},
+            [kind for kind, (_, fresh) in lists.items() if mirror_on and fresh],
+        )
+
+    def size(self, kind: str) -> int | None:
+        return self._sizes.get(kind)
+
+    def pages(self, kind: str) -> int | None:
+        """Requests for loading the list, None if the list size is unknown."""
+        if kind in self._synced:
+            # usually no more than one page of newly added relationships
+            return 1
+        size = self.size(kind)
+        return None if size is None else pages(size)
+
+
+class Estimate:
+    """
+    Predicted cost of (a part of) a plan.
+
+    :param calls: tweepy method name -> number of calls
+    :param users: how many users this part passes to the next part, None if unknown
+    :param lists: current account's relationship lists loaded (once per run) by this part
+    :param unknowns: things that can't be estimated, so the estimation is a lower bound
+    :param unflagged: whether some of the passed users come without relationships with current account
+        (:attr:`User.connection_status` is only returned by users lookups),
+        actions load relationship lists for checking them
+    """
+
+    def __init__(
+        self,
+        calls: dict[str, int] = None,
+        users: int | None = 0,
+        lists: Iterable[str] = (),
+        unknowns: Iterable[str] = (),
+        unflagged: bool = False,
+    ):
+        self.calls: collections.Counter[str] = collections.Counter(calls or {})
+        self.users = users
+        self.lists = set(lists)
+        self.unknowns = set(unknowns)
+        self.unflagged = unflagged
+
+    def __add__(self, other: Estimate) -> Estimate:
+        return Estimate(
+            self.calls + other.calls,
+            None if self.users is None or other.users is None else self.users + other.users,
+            self.lists | other.lists,
+            self.unknowns | other.unknowns,
+            self.unflagged or other.unflagged,
+        )
+
+    @staticmethod
+    def sum(estimates: Iterable[Estimate]) -> Estimate:
+        return sum(estimates, Estimate())
+
+    def total_calls(self, sizes: RelationshipSizes) -> collections.Counter[str]:
+        """Calls including loading relationship lists, unknown sized lists are counted as one page."""
+        calls = collections.Counter(self.calls)
+        for kind in self.lists:
+            calls[LIST_ENDPOINTS[kind]] += sizes.pages(kind) or 1
+        return calls
+
+    def lookups_fall_over(self, clients: int) -> bool:
+        """
+        Whether users lookups use up the owner credential set's quota and fall over to the extra ones,
+        whose looked up users come without relationships with current account, see :class:`ClientPool`.
+        """
+        return clients > 1 and any(self.calls[e] > RATE_LIMITS[e][0] for e in ClientPool.OWNER_FIRST.values())
+
+    def unknown_notes(self, sizes: RelationshipSizes) -> list[str]:
+        notes = sorted(self.unknowns)
+        notes += [UNKNOWN_LIST_SIZE.format(kind=kind) for kind in sorted(self.lists) if sizes.size(kind) is None]
+        return notes
+
+
+def minimum_seconds(endpoint: str, calls: int, clients: int = 1) -> float:
+    """
+    The shortest time for sending ``calls`` requests to the endpoint with fresh rate limit windows:
+    the first window's quota is used up immediately, and each following window gives another quota.
+    """
+    if endpoint not in RATE_LIMITS or calls <= 0:
+        return 0
+    limit, window = RATE_LIMITS[endpoint]
+    if endpoint in POOLED_ENDPOINTS:
+        limit *= clients
+    return (math.ceil(calls / limit) - 1) * window
+
+
+class EstimateReport:
+    """Rate limit analysis of the estimated calls of one or more plans."""
+
+    def __init__(self, title: str, estimate: Estimate, sizes: RelationshipSizes, clients: int = 1):
+        self.title = title
+        self.estimate = estimate
+        self.sizes = sizes
+        self.clients = clients
+        self.calls = estimate.total_calls(sizes)
+
+    def seconds(self) -> dict[str, float]:
+        return {e: minimum_seconds(e, c, self.clients) for e, c in self.calls.items()}
+
+    def bottleneck(self) -> str | None:
+        """The endpoint whose rate limit takes the longest time to wait, None if there is no call."""
+        seconds = self.seconds()
+        return max(seconds, key=lambda e: (seconds[e], self.calls[e])) if seconds else None
+
+    def minimum_seconds(self) -> float:
+        """Endpoints are metered independently, so the slowest one decides the time."""
+        return max(self.seconds().values(), default=0)
+
+    def __str__(self) -> str:
+        seconds = self.seconds()
+        users = "unknown" if self.estimate.users is None else f"at most {self.estimate.users}"
+        lines = [f"{self.title}:", f"  Source users: {users}", f"  {'Endpoint':<24}{'Calls':>10}  Rate limit"]
+        for endpoint in sorted(self.calls, key=lambda e: -seconds[e]):
+            limit = RATE_LIMITS.get(endpoint)
+            rate = f"{limit[0]} / {limit[1] // 60} min" if limit else "unlimited"
+            if limit and endpoint in POOLED_ENDPOINTS and self.clients > 1:
+                rate += f" x {self.clients} credential sets"
+            lines.append(f"  {endpoint:<24}{self.calls[endpoint]:>10}  {rate}")
+
+        notes = self.estimate.unknown_notes(self.sizes)
+        at_least = "at least " if notes else ""
+        lines.append(f"  Bottleneck: {self.bottleneck() or 'none'}")
+        lines.append(
+            f"  Minimum wall-clock time: {at_least}{datetime.timedelta(seconds=math.ceil(self.minimum_seconds()))}"
+        )
+        lines += [f"  Unknown: {n}" for n in notes]
+        return "\n".join(lines)
@@ -0,0 +1,236 @@
+"""
+Ledgers of Twitter API budgets shared by every process of the tool running on this machine.
+
+Several runs (e.g. scheduled by cron with different plan files) against the same account
+spend the same 15-minute rate limit windows, but each :class:`puntgun.client.RateLimitScheduler`
+only knows calls made in its own process, so they all hit 429 and wait for the window to reset.
+With the ledger, calls are reserved in a local SQLite file locked on each reservation,
+and overlapping processes queue for their slots in the order they asked for them.
+
+Tweets consumed from the monthly Tweet cap are accounted in the same way,
+for stopping tweet consuming queries before the cap is used up.
+"""
+from __future__ import annotations
+
+import contextlib
+import datetime
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+from puntgun.conf import config
+
+# Seconds a reservation is kept in the file, much longer than any rate limit window.
+RETENTION = 24 * 3600
+
+
+def token_identity(consumer_key: str, access_token: str) -> str:
+    """
+    Rate limits are counted per user token of an app,
+    the ledger records a digest of them instead of the secrets themselves.
+    """
+    return hashlib.sha256(f"{consumer_key}:{access_token}".encode()).hexdigest()[:16]
+
+
+class BudgetLedger:
+    """
+    Calls (granted or reserved) to each endpoint per token, in a local SQLite database file.
+
+    The accounting is the same as :class:`puntgun.client.TokenBucket`:
+    at most ``limit`` calls in any ``window`` seconds, a spent call comes back after one window.
+    Each reservation is made in an immediate (write-locked) transaction,
+    so concurrent processes never take the same slot.
+    """
+
+    FILE_NAME = "budget_ledger.db"
+
+    def __init__(self, file: Path, clock: Callable[[], float] = time.time, lock_timeout: float = 30):
+        self._clock = clock
+        self._lock = threading.Lock()
+        # transactions are managed by ourselves for taking the write lock before reading
+        self._conn = sqlite3.connect(file, timeout=lock_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spent (token TEXT NOT NULL, endpoint TEXT NOT NULL, at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spent_of_endpoint ON spent (token, endpoint, at)")
+        self._conn.execute("DELETE FROM spent WHERE at < ?", (self._clock() - RETENTION,))
+
+    @staticmethod
+    def from_settings() -> BudgetLedger | None:
+        """Return None if the ledger is turned off."""
+        if not config.settings.get("budget_ledger", False):
+            return None
+        return BudgetLedger(config.config_path.joinpath(BudgetLedger.FILE_NAME))
+
+    def _spent(self, token: str, endpoint: str, window: float, now: float) -> list[float]:
+        """Call in a transaction. Times of calls still counted in the window, in ascending order."""
+        self._conn.execute(
+            "DELETE FROM spent WHERE token = ? AND endpoint = ? AND at <= ?", (token, endpoint, now - window)
+        )
+        rows = self._conn.execute(
+            "SELECT at FROM spent WHERE token = ? AND endpoint = ? ORDER BY at", (token, endpoint)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    @staticmethod
+    def _slot(spent: list[float], limit: int, window: float, now: float) -> float:
+        if len(spent) < limit:
+            return now
+        return max(now, spent[-limit] + window)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[float]:
+        """A write-locked transaction, other processes wait for it. Yields the current time."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._clock()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def reserve(self, token: str, endpoint: str, limit: int, window: float) -> float:
+        """Take a call of the endpoint and return the time when the caller is allowed to make it."""
+        with self._transaction() as now:
+            slot = self._slot(self._spent(token, endpoint, window, now), limit, window, now)
+            self._conn.execute("INSERT INTO spent VALUES (?, ?, ?)", (token, endpoint, slot))
+        return slot
+
+    def next_slot(self, token: str, endpoint: str, limit: int, window: float) -> float:
+        """The earliest time a new call can be made, without taking it."""
+        with self._transaction() as now:
+            return self._slot(self._spent(token, endpoint, window, now), limit, window, now)
+
+
+class TweetCapLedger:
+    """
+    Tweets consumed per token in each month (UTC calendar month), in a local SQLite database file.
+
+    Endpoints returning tweets (searching, looking up...) count them in a monthly Tweet consumption cap,
+    a greedy plan could use up the whole month's allowance in one day without noticing.
+    https://developer.twitter.com/en/docs/twitter-api/tweet-caps
+
+    The file is only created when tweets are consumed for the first time,
+    runs that never query tweets don't touch it.
+    """
+
+    FILE_NAME = "tweet_caps.db"
+
+    def __init__(self, file: Path, cap: int, clock: Callable[[], float] = time.time):
+        self.file = file
+        self.cap = cap
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self, create: bool) -> sqlite3.Connection | None:
+        """Call with the lock held. Return None if nothing has been consumed (no file) and not ``create``."""
+        if self._conn is None:
+            if not create and not self.file.exists():
+                return None
+            self._conn = sqlite3.connect(self.file, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS consumed (token TEXT NOT NULL, month TEXT NOT NULL, "
+                    "tweets INTEGER NOT NULL, PRIMARY KEY (token, month))"
+                )
+        return self._conn
+
+    @staticmethod
+    def from_settings() -> TweetCapLedger | None:
+        """Return None if the accounting is turned off."""
+        cap = int(config.settings.get("monthly_tweet_cap", 500000))
+        if cap <= 0:
+            return None
+        return TweetCapLedger(config.config_path.joinpath(TweetCapLedger.FILE_NAME), cap)
+
+    def _month(self) -> str:
+        return time.strftime("%Y-%m", time.gmtime(self._clock()))
+
+    def consume(self, token: str, tweets: int) -> None:
+        if tweets <= 0:
+            return
+        with self._lock:
+            conn = self._connection(create=True)
+            with conn:
+                conn.execute(
+                    "INSERT INTO consumed VALUES (?, ?, ?) "
+                    "ON CONFLICT (token, month) DO UPDATE SET tweets = tweets + excluded.tweets",
+                    (token, self._month(), tweets),
+                )
+
+    def consumed(self, token: str) -> int:
+        """Tweets consumed in this month."""
+        with self._lock:
+            conn = self._connection(create=False)
+            if conn is None:
+                return 0
+            row = conn.execute(
+                "SELECT tweets FROM consumed WHERE token = ? AND month = ?", (token, self._month())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def remaining(self, token: str) -> int:
+        return max(0, self.cap - self.consumed(token))
+
+    def usage(self) -> dict[str, TweetCapUsage]:
+        """token -> usage in this month, of every token that consumed tweets."""
+        with self._lock:
+            conn = self._connection(create=False)
+            if conn is None:
+                return {}
+            rows = conn.execute("SELECT token, tweets FROM consumed WHERE month = ?", (self._month(),)).fetchall()
+        return {token: TweetCapUsage(tweets, self.cap, self._month_elapsed()) for token, tweets in rows}
+
+    def _month_elapsed(self) -> float:
+        """How much (0~1] of this month has passed."""
+        now = datetime.datetime.fromtimestamp(self._clock(), datetime.timezone.utc)
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+        return max((now - start) / (end - start), 1e-6)
+
+
+class TweetCapUsage:
+    """Tweets consumed in this month and the projection at the month's end by the current pace."""
+
+    def __init__(self, consumed: int, cap: int, month_elapsed: float):
+        self.consumed = consumed
+        self.cap = cap
+        self.remaining = max(0, cap - consumed)
+        self.projected = round(consumed / month_elapsed)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.consumed} of {self.cap} tweets consumed this month ({self.remaining} remaining), "
+            f"{self.projected} projected by the end of month at this pace"
+        )
+
+
+class PlanTweetCap:
+    """
+    Tweets the running plan can still consume, set by the runner with the plan's cap before running each plan.
+    Plans run one by one, so there is only one running plan at the same time.
+    """
+
+    _lock = threading.Lock()
+    _left: int | None = None
+
+    @staticmethod
+    def start(cap: int | None) -> None:
+        """:param cap: None for no limit"""
+        with PlanTweetCap._lock:
+            PlanTweetCap._left = cap
+
+    @staticmethod
+    def allowed() -> int | None:
+        return PlanTweetCap._left
+
+    @staticmethod
+    def consume(tweets: int) -> None:
+        with PlanTweetCap._lock:
+            if PlanTweetCap._left is not None:
+                PlanTweetCap._left = max(0, PlanTweetCap._left - tweets)
@@ -3,11 +3,14 @@ from __future__ import annotations
 import datetime
 import itertools
 import sys
-from typing import ClassVar
+from typing import TYPE_CHECKING, ClassVar
 
 from pydantic import BaseModel, Field, root_validator
 from reactivex import Observable
 
+if TYPE_CHECKING:
+    from puntgun.estimate import Estimate, RelationshipSizes
+
 
 class FromConfig(BaseModel):
     """
@@ -74,9 +77,21 @@ class Plan(FromConfig):
     # https://pydantic-docs.helpmanual.io/usage/models/#field-with-dynamic-default-value
     id: int = Field(default_factory=generate_id)
 
+    # At most how many tweets the plan can consume from the monthly Tweet cap,
+    # None for no limit other than the cap itself.
+    tweet_cap: int | None = None
+
     def __call__(self) -> Observable:
         raise NotImplementedError
 
+    def estimate(self, sizes: RelationshipSizes, clients: int = 1) -> Estimate:
+        """
+        Predict API calls of running this plan without sending any request, see :mod:`puntgun.estimate`.
+
+        :param clients: number of credential sets the :class:`puntgun.client.ClientPool` has
+        """
+        raise NotImplementedError
+
 
 def validate_required_fields_exist(rule_keyword: str, conf: dict, required_field_names: list[str]) -> None:
     """
@@ -6,7 +6,7 @@ https://en.wikipedia.org/wiki/Data_transfer_object
 import sys
 from datetime import datetime
 from enum import Enum
-from typing import Any, List, Mapping, Optional
+from typing import Any, List, Mapping, Optional, Type, TypeVar
 
 from pydantic import BaseModel, validator
 
@@ -14,6 +14,18 @@ from puntgun.rules.base import FromConfig
 
 DEFAULT_TIME = datetime.utcnow()
 
+M = TypeVar("M", bound=BaseModel)
+
+
+def parse_api_time(value: str | None) -> datetime:
+    """Times in Twitter API responses are like "2022-06-30T09:00:00.000Z"."""
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z") if value else DEFAULT_TIME
+
+
+def construct(model: Type[M], values: Mapping) -> M:
+    """Build the model without validation, unknown keys (e.g. fields we don't model) are dropped."""
+    return model.construct(**{k: v for k, v in values.items() if k in model.__fields__})
+
 
 def get_default_tweet_instance() -> "Tweet":
     return getattr(sys.modules[__name__], "Tweet")()
@@ -60,6 +72,9 @@ class User(BaseModel):
     entities: Optional[dict[str, Any]] = {}
     url: str | None = ""
     withheld: Optional[dict[str, Any]] = {}
+    # Relationships with current account ("blocking", "followed_by", "following"...),
+    # only returned by users lookups, None if unknown (the user comes from other APIs or the disk cache).
+    connection_status: Optional[list[str]] = None
 
     @staticmethod
     def from_response(resp_data: Mapping, pinned_tweet: "Tweet" = None) -> "User":
@@ -96,6 +111,47 @@ class User(BaseModel):
             pinned_tweet=pinned_tweet,
         )
 
+    @staticmethod
+    def from_raw(data: dict, pinned_tweet: "Tweet" = None) -> "User":
+        """
+        Faster :meth:`from_response` for trusted raw data (dict parsed from the response body),
+        skips pydantic validation and only converts what Twitter sends in other types (ids in strings, times).
+        """
+        if not data:
+            return User()
+
+        update_user_class_ref()
+        if not pinned_tweet:
+            pinned_tweet = Tweet.construct()
+
+        public_metrics = data.get("public_metrics") or {}
+        url = data.get("url") or ""
+        if url:
+            urls = data.get("entities", {}).get("url", {}).get("urls", [])
+            url = next((u.get("expanded_url") for u in urls if u.get("url") == url), url)
+
+        return User.construct(
+            id=int(data["id"]),
+            name=data.get("name") or "",
+            username=data.get("username") or "",
+            profile_image_url=data.get("profile_image_url") or "",
+            created_at=parse_api_time(data.get("created_at")),
+            protected=data.get("protected") or False,
+            verified=data.get("verified") or False,
+            location=data.get("location") or "",
+            description=data.get("description") or "",
+            followers_count=public_metrics.get("followers_count", 0),
+            following_count=public_metrics.get("following_count", 0),
+            tweet_count=public_metrics.get("tweet_count", 0),
+            pinned_tweet_id=int(data.get("pinned_tweet_id") or 0),
+            pinned_tweet_text=pinned_tweet.text,
+            pinned_tweet=pinned_tweet,
+            entities=data.get("entities") or {},
+            url=url,
+            withheld=data.get("withheld") or {},
+            connection_status=data.get("connection_status"),
+        )
+
     class Config:
         validate_assignment = True
 
@@ -309,17 +365,6 @@ class Tweet(BaseModel):
 
         public_metrics = resp_data["public_metrics"] if ("public_metrics" in resp_data) else {}
 
-        def corresponding_tweet(_id: str) -> "Tweet":
-            return next(filter(lambda _t: _t.id == _id, referenced_tweets), Tweet())
-
-        relations = {}
-        if referenced_tweets:
-            for t in resp_data["referenced_tweets"]:
-                if t.get("type") not in relations:
-                    relations[t.get("type")] = [corresponding_tweet(t.get("id"))]
-                else:
-                    relations[t.get("type")] += corresponding_tweet(t.get("id"))
-
         return Tweet(
             **resp_data,
             retweet_count=public_metrics.get("retweet_count", 0),
@@ -330,9 +375,68 @@ class Tweet(BaseModel):
             mediums=mediums,
             polls=polls,
             place=place,
-            related_tweets=relations,
+            related_tweets=Tweet._relations(resp_data, referenced_tweets),
         )
 
+    @staticmethod
+    def from_raw(
+        data: dict,
+        author: User = None,
+        mediums: List[Media] = None,
+        polls: List[Poll] = None,
+        place: Place = None,
+        referenced_tweets: List["Tweet"] = None,
+    ) -> "Tweet":
+        """Faster :meth:`from_response` for trusted raw data, see :meth:`User.from_raw`."""
+        if not data:
+            return Tweet()
+
+        public_metrics = data.get("public_metrics") or {}
+        reply_settings = data.get("reply_settings")
+
+        return Tweet.construct(
+            id=int(data["id"]),
+            author=author,
+            created_at=parse_api_time(data.get("created_at")),
+            possibly_sensitive=data.get("possibly_sensitive") or False,
+            text=data.get("text") or "",
+            retweet_count=public_metrics.get("retweet_count", 0),
+            reply_count=public_metrics.get("reply_count", 0),
+            like_count=public_metrics.get("like_count", 0),
+            quote_count=public_metrics.get("quote_count", 0),
+            reply_settings=ReplySettings(reply_settings) if reply_settings else ReplySettings.EVERYONE,
+            context_annotations=[
+                ContextAnnotation.construct(
+                    domain=construct(ContextAnnotation.Domain, a.get("domain", {})),
+                    entity=construct(ContextAnnotation.Entity, a.get("entity", {})),
+                )
+                for a in data.get("context_annotations") or []
+            ],
+            withheld=data.get("withheld") or {},
+            conversation_id=int(data.get("conversation_id") or 0),
+            in_reply_to_user_id=int(data.get("in_reply_to_user_id") or 0),
+            referenced_tweets=data.get("referenced_tweets") or [],
+            related_tweets=Tweet._relations(data, referenced_tweets),
+            source=data.get("source") or "",
+            attachments=data.get("attachments") or {},
+            mediums=mediums,
+            polls=polls,
+            geo=data.get("geo") or {},
+            place=place,
+            lang=data.get("lang") or "",
+            entities=data.get("entities") or {},
+        )
+
+    @staticmethod
+    def _relations(data: Mapping, referenced_tweets: List["Tweet"] | None) -> dict[str, list["Tweet"]]:
+        relations: dict[str, list[Tweet]] = {}
+        if referenced_tweets:
+            # index once instead of scanning the list for each reference
+            tweets_by_id = {_t.id: _t for _t in referenced_tweets}
+            for t in data["referenced_tweets"]:
+                relations.setdefault(t.get("type"), []).append(tweets_by_id.get(int(t.get("id")), Tweet()))
+        return relations
+
     class Config:
         validate_assignment = True
 
@@ -1,6 +1,8 @@
 from typing import ClassVar
 
-from puntgun.client import NeedClientMixin
+from puntgun.client import NeedClientMixin, isolate_failure
+from puntgun.conf import config
+from puntgun.estimate import Estimate
 from puntgun.rules.base import FromConfig
 from puntgun.rules.data import RuleResult, User
 
@@ -18,6 +20,10 @@ class UserActionRule(FromConfig):
         the result returned in reactivex :class:`Observable` type that contains only one boolean value.
         """
 
+    def estimate(self, users: int | None) -> Estimate:
+        """Predict API calls for acting on given number of users."""
+        return Estimate()
+
 
 class BlockUserActionRule(UserActionRule, NeedClientMixin):
     """Block the given user."""
@@ -25,4 +31,20 @@ class BlockUserActionRule(UserActionRule, NeedClientMixin):
     _keyword: ClassVar[str] = "block"
 
     def __call__(self, user: User) -> RuleResult:
-        return RuleResult(self, self.client.block_user_by_id(user.id))
+        # a failed blocking is recorded and reported as not done, other users are still processed
+        block = isolate_failure("block_user_by_id", self.client.block_user_by_id, lambda: False)
+        # relationships of users from lookups are known, needn't download the relationship lists
+        return RuleResult(self, block(user.id, user.connection_status))
+
+    def estimate(self, users: int | None) -> Estimate:
+        # relationship lists checked before blocking, see Client.block_user_by_id()
+        lists = ["blocked"]
+        if not config.settings.get("block_follower", True):
+            lists.append("follower")
+        if not config.settings.get("block_following", False):
+            lists.append("following")
+
+        if users is None:
+            return Estimate(lists=lists, unknowns=["blocking calls, the number of source users is unknown"])
+        # already blocked users are skipped, but we can't know how many of them are
+        return Estimate({"block": users}, lists=lists)
@@ -6,6 +6,7 @@ from typing import ClassVar
 
 from reactivex import Observable
 
+from puntgun.estimate import Estimate
 from puntgun.rules.base import (
     FromConfig,
     NumericRangeCheckingMixin,
@@ -27,6 +28,18 @@ class UserFilterRule(FromConfig):
         will return a reactivex :class:`Observable` which wraps a :class:`RuleResult` value.
         """
 
+    # :class:`User` attributes this rule reads for judging,
+    # the plan only queries these fields from Twitter API.
+    # None means unknown, all fields will be queried.
+    _reads: ClassVar[frozenset[str] | None] = None
+
+    def required_user_attributes(self) -> set[str] | None:
+        return None if self._reads is None else set(self._reads)
+
+    def estimate(self, users: int | None) -> Estimate:
+        """Predict API calls for judging given number of users, immediate rules needn't call any API."""
+        return Estimate()
+
 
 class PlaceHolderUserFilterRule(UserFilterRule):
     """
@@ -36,7 +49,8 @@ class PlaceHolderUserFilterRule(UserFilterRule):
     so actions can apply on all users.
     """
 
-    _keyword = "placeholder_user_filter_rule"
+    _keyword: ClassVar[str] = "placeholder_user_filter_rule"
+    _reads: ClassVar[frozenset[str]] = frozenset()
 
     def __call__(self, user: User) -> RuleResult:
         return RuleResult.true(self)
@@ -46,6 +60,7 @@ class FollowerUserFilterRule(NumericRangeCheckingMixin, UserFilterRule):
     """Check user's follower count."""
 
     _keyword: ClassVar[str] = "follower"
+    _reads: ClassVar[frozenset[str]] = frozenset({"followers_count"})
 
     def __call__(self, user: User) -> RuleResult:
         return RuleResult(self, super().compare(user.followers_count))
@@ -63,6 +78,7 @@ class FollowingUserFilterRule(NumericRangeCheckingMixin, UserFilterRule):
     """Check user's following count."""
 
     _keyword: ClassVar[str] = "following"
+    _reads: ClassVar[frozenset[str]] = frozenset({"following_count"})
 
     def __call__(self, user: User) -> RuleResult:
         return RuleResult(self, super().compare(user.following_count))
@@ -80,6 +96,7 @@ class CreatedUserFilterRule(TemporalRangeCheckingMixin, UserFilterRule):
     """Check user (account) creating date."""
 
     _keyword: ClassVar[str] = "created"
+    _reads: ClassVar[frozenset[str]] = frozenset({"created_at"})
 
     def __call__(self, user: User) -> RuleResult:
         return RuleResult(self, super().compare(user.created_at))
@@ -95,6 +112,7 @@ class CreatedAfterUserFilterRule(UserFilterRule):
 
 class CreatedWithinDaysUserFilterRule(UserFilterRule):
     _keyword: ClassVar[str] = "created_within_days"
+    _reads: ClassVar[frozenset[str]] = frozenset({"created_at"})
     within_days: int
 
     @classmethod
@@ -108,6 +126,7 @@ class CreatedWithinDaysUserFilterRule(UserFilterRule):
 
 class TextMatchUserFilterRule(UserFilterRule):
     _keyword: ClassVar[str] = "profile_text_matches"
+    _reads: ClassVar[frozenset[str]] = frozenset({"name", "description", "pinned_tweet_text"})
     pattern: str
 
     @classmethod
@@ -125,6 +144,7 @@ class TextMatchUserFilterRule(UserFilterRule):
 
 class FollowingCountRatioUserFilterRule(NumericRangeCheckingMixin, UserFilterRule):
     _keyword: ClassVar[str] = "following_count_ratio"
+    _reads: ClassVar[frozenset[str]] = frozenset({"followers_count", "following_count"})
 
     def __call__(self, user: User) -> RuleResult:
         return RuleResult(self, super().compare(user.followers_count / user.following_count))
@@ -140,6 +160,7 @@ class FollowingCountRatioLessThanUserFilterRule(UserFilterRule):
 
 class TweetCountUserFilterRule(NumericRangeCheckingMixin, UserFilterRule):
     _keyword: ClassVar[str] = "tweet_count"
+    _reads: ClassVar[frozenset[str]] = frozenset({"tweet_count"})
 
     def __call__(self, user: User) -> RuleResult:
         return RuleResult(self, super().compare(user.tweet_count))
@@ -7,6 +7,7 @@ from loguru import logger
 from reactivex import Observable
 from reactivex import operators as op
 
+from puntgun.estimate import Estimate, RelationshipSizes
 from puntgun.record import Record, Recordable
 from puntgun.rules.base import Plan, validate_required_fields_exist
 from puntgun.rules.config_parser import ConfigParser
@@ -99,14 +100,28 @@ class UserPlan(Plan):
         if "that" not in conf:
             conf["that"] = [{"placeholder_user_filter_rule": {}}]
 
-        return cls(
+        plan = cls(
             name=conf["user_plan"],  # using the keyword field for naming this plan
+            tweet_cap=conf.get("tweet_cap"),
             # wrap rules with their rule set
             # for giving them a default running order
             sources=ConfigParser.parse({"any_of": conf["from"]}, UserSourceRule),
             filters=ConfigParser.parse({"any_of": conf["that"]}, UserFilterRule),
             actions=ConfigParser.parse({"all_of": conf["do"]}, UserActionRule),
         )
+        # Only query user fields that filter rules read, smaller responses and cheaper parsing.
+        # Actions and records only need default fields (id, username).
+        plan.sources.project(plan.filters.required_user_attributes())
+        return plan
+
+    def estimate(self, sizes: RelationshipSizes, clients: int = 1) -> Estimate:
+        """Predict API calls of running this plan, in the worst case that all source users trigger filter rules."""
+        sources = self.sources.estimate(sizes)
+        actions = self.actions.estimate(sources.users)
+        if not sources.unflagged and not sources.lookups_fall_over(clients):
+            # relationships are checked with looked up users' own data
+            actions.lists.clear()
+        return sources + self.filters.estimate(sources.users) + actions
 
     def __call__(self) -> Observable[UserPlanResult]:
         """
@@ -17,6 +17,7 @@ from reactivex import Observable
 from reactivex import operators as op
 
 from puntgun.client import NeedClientMixin
+from puntgun.estimate import Estimate, RelationshipSizes
 from puntgun.rules.config_parser import ConfigParser
 from puntgun.rules.data import RuleResult, User
 from puntgun.rules.user.action_rules import UserActionRule
@@ -37,6 +38,14 @@ class UserSourceRuleResultMergingSet(UserSourceRule):
     def parse_from_config(cls, conf: dict) -> UserSourceRuleResultMergingSet:
         return cls(rules=[ConfigParser.parse(c, UserSourceRule) for c in conf["any_of"]])
 
+    def project(self, fields: set[str] | None) -> None:
+        for r in self.rules:
+            r.project(fields)
+
+    def estimate(self, sizes: RelationshipSizes) -> Estimate:
+        # an upper bound, users from different sources may be the same ones
+        return Estimate.sum(r.estimate(sizes) for r in self.rules)
+
     def __call__(self) -> Observable[User]:
         users_observables = [rx.start(r) for r in self.rules]
         return rx.merge(*users_observables).pipe(
@@ -60,6 +69,20 @@ class UserFilterRuleSet(BaseModel):
             immediate_rules=[r for r in rules if not isinstance(r, NeedClientMixin)],
         )
 
+    def required_user_attributes(self) -> set[str] | None:
+        """Union of inner rules' read attributes, None if any of them is unknown."""
+        required: set[str] = set()
+        for r in self.immediate_rules + self.slow_rules:
+            attributes = r.required_user_attributes()
+            if attributes is None:
+                return None
+            required |= attributes
+        return required
+
+    def estimate(self, users: int | None) -> Estimate:
+        """Worst case, no rule short-circuits."""
+        return Estimate.sum(r.estimate(users) for r in self.immediate_rules + self.slow_rules)
+
 
 def execution_wrapper(u: User, rule: UserFilterRule | UserActionRule) -> Callable:
     """
@@ -148,6 +171,9 @@ class UserActionRuleResultCollectingSet(UserActionRule):
     def parse_from_config(cls, conf: dict) -> UserActionRuleResultCollectingSet:
         return cls(rules=[ConfigParser.parse(c, UserActionRule) for c in conf["all_of"]])
 
+    def estimate(self, users: int | None) -> Estimate:
+        return Estimate.sum(r.estimate(users) for r in self.rules)
+
     def __call__(self, user: User) -> Observable[list[RuleResult]]:
         action_results = [rx.start(execution_wrapper(user, r)) for r in self.rules]
         return rx.merge(*action_results).pipe(
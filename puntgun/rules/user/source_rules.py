@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import functools
 import itertools
-from typing import ClassVar
+from typing import Any, Callable, ClassVar
 
 import reactivex as rx
 from loguru import logger
 from reactivex import Observable
 from reactivex import operators as op
 
-from puntgun.client import NeedClientMixin
+from puntgun.client import NeedClientMixin, isolate_failure
+from puntgun.conf import config
+from puntgun.estimate import (
+    LOOKUP_BATCH_SIZE,
+    UNKNOWN_LIST_SIZE,
+    Estimate,
+    RelationshipSizes,
+    pages,
+)
 from puntgun.rules.base import FromConfig, validate_fields_conflict
 from puntgun.rules.data import User
 
@@ -22,9 +31,25 @@ class UserSourceRule(FromConfig):
     and returns an :class:`reactivex.Observable` of :class:`user.User`.
     """
 
+    # :class:`User` attributes the plan reads, None for querying all fields.
+    _fields: set[str] | None = None
+
     def __call__(self) -> Observable[User]:
         """"""
 
+    def project(self, fields: set[str] | None) -> None:
+        """Let the rule only query user fields that the plan needs."""
+        self._fields = fields
+
+    def _with_fields(self, client_func: Callable[..., Any]) -> Callable[..., Any]:
+        if self._fields is None:
+            return client_func
+        return functools.partial(client_func, fields=self._fields)
+
+    def estimate(self, sizes: RelationshipSizes) -> Estimate:
+        """Predict API calls of this rule and the number of users it gets, without querying."""
+        return Estimate(users=None, unknowns=[f"API calls of the source rule [{self.keyword()}]"], unflagged=True)
+
 
 class NameUserSourceRule(UserSourceRule, NeedClientMixin):
     """
@@ -44,11 +69,17 @@ class NameUserSourceRule(UserSourceRule, NeedClientMixin):
             op.buffer_with_count(100),
             # log for debug
             op.do(rx.Observer(on_next=lambda users: logger.debug("Batch of usernames to client: {}", users))),
-            op.map(self.client.get_users_by_usernames),
+            # a batch that still fails after retries is skipped and recorded, instead of stopping the plan
+            op.map(
+                isolate_failure("get_users_by_usernames", self._with_fields(self.client.get_users_by_usernames), list)
+            ),
             op.flat_map(lambda x: x),
             op.do(rx.Observer(on_next=lambda u: logger.debug("User from client: {}", u))),
         )
 
+    def estimate(self, sizes: RelationshipSizes) -> Estimate:
+        return Estimate({"get_users_by": pages(len(self.names), LOOKUP_BATCH_SIZE)}, users=len(self.names))
+
     @classmethod
     def parse_from_config(cls, conf: dict) -> NameUserSourceRule:
         """the config is { 'names': [...] }"""
@@ -70,11 +101,14 @@ class IdUserSourceRule(UserSourceRule, NeedClientMixin):
             # this api also allows to query 100 users at once.
             op.buffer_with_count(100),
             op.do(rx.Observer(on_next=lambda ids: logger.debug("Batch of user ids to client: {}", ids))),
-            op.map(self.client.get_users_by_ids),
+            op.map(isolate_failure("get_users_by_ids", self._with_fields(self.client.get_users_by_ids), list)),
             op.flat_map(lambda x: x),
             op.do(rx.Observer(on_next=lambda u: logger.debug("User from client: {}", u))),
         )
 
+    def estimate(self, sizes: RelationshipSizes) -> Estimate:
+        return Estimate({"get_users": pages(len(self.ids), LOOKUP_BATCH_SIZE)}, users=len(self.ids))
+
     @classmethod
     def parse_from_config(cls, conf: dict) -> IdUserSourceRule:
         return cls.parse_obj(conf)
@@ -98,21 +132,47 @@ class MyFollowerUserSourceRule(UserSourceRule, NeedClientMixin):
         return cls.parse_obj(fields)
 
     def __call__(self) -> rx.Observable[User]:
-        followers = self.client.cached_follower()
-        has_field_configured = self.last or self.first or self.after_user
-        if has_field_configured:
-            return rx.from_iterable(self._take_part_of_followers(followers))
+        if self.client.mirror is not None:
+            # the local mirror only queries changed pages, cheaper than streaming from the API
+            return rx.from_iterable(self._take_part_of_followers(self.client.cached_follower()))
+        elif self.last:
+            # the follower API response puts newer followers on list head,
+            # stop querying pages as soon as we have enough followers.
+            followers = self._with_fields(self.client.iter_follower)(self.client.id)
+            return rx.from_iterable(itertools.islice(followers, self.last))
+        elif self.first or self.after_user:
+            return rx.from_iterable(self._take_part_of_followers(self.client.cached_follower()))
+        else:
+            # if no field, stream all followers page by page
+            return rx.from_iterable(self._with_fields(self.client.iter_follower)(self.client.id, prefetch=True))
+
+    def estimate(self, sizes: RelationshipSizes) -> Estimate:
+        size = sizes.size("follower")
+        wanted = None if self.after_user else (self.last or self.first)
+        users = size if wanted is None else (wanted if size is None else min(wanted, size))
+
+        # same branches as __call__(), followers from the list API come without their relationships
+        if config.settings.get("relationship_mirror", False) or self.first or self.after_user:
+            # the whole list is loaded (or synced) once and shared with other rules
+            return Estimate(users=users, lists=["follower"], unflagged=True)
+        elif self.last:
+            return Estimate({"get_users_followers": pages(users)}, users=users, unflagged=True)
+        elif size is None:
+            return Estimate(
+                {"get_users_followers": 1},
+                users=None,
+                unknowns=[UNKNOWN_LIST_SIZE.format(kind="follower")],
+                unflagged=True,
+            )
         else:
-            # if no field, return all followers
-            return rx.from_iterable(followers)
+            return Estimate({"get_users_followers": pages(size)}, users=size, unflagged=True)
 
     def _take_part_of_followers(self, followers: list[User]) -> list[User]:
         if self.last:
-            # the follower API response puts newer followers on list head.
             return followers[: self.last]
         elif self.first:
             return followers[-self.first :]
-        else:
+        elif self.after_user:
             # find given follower
             peak = next(filter(lambda u: u.username == self.after_user, followers), None)
             if peak is None:
@@ -124,3 +184,5 @@ class MyFollowerUserSourceRule(UserSourceRule, NeedClientMixin):
                 return []
             else:
                 return list(itertools.takewhile(lambda u: u.id != peak.id, followers))
+        else:
+            return followers
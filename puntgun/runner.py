@@ -11,11 +11,14 @@ import reactivex as rx
 from loguru import logger
 from reactivex import operators as op
 
-from puntgun.client import Client
-from puntgun.conf import config
+from puntgun.client import ClientPool
+from puntgun.conf import config, secret
+from puntgun.estimate import Estimate, EstimateReport, RelationshipSizes
+from puntgun.ledger import PlanTweetCap, TweetCapLedger
 from puntgun.record import Recordable, Recorder
 from puntgun.rules.base import Plan
 from puntgun.rules.config_parser import ConfigParser
+from puntgun.telemetry import Telemetry
 
 
 class InvalidConfigurationError(ValueError):
@@ -34,6 +37,7 @@ def print_log_file_and_report_file_position() -> None:
 
 
 def on_unexpected_error(_: Any) -> None:
+    record_telemetry()
     Recorder.write_report_tail()
     print_log_file_and_report_file_position()
     sys.exit(1)
@@ -42,13 +46,13 @@ def on_unexpected_error(_: Any) -> None:
 @logger.catch(onerror=on_unexpected_error)
 def start() -> None:
     # Warm up? Initialization?
-    # Load secrets and create singleton client instance before parsing and executing plans.
+    # Load secrets and create singleton client (pool) instance before parsing and executing plans.
     #
     # I found that after the reactivex pipeline (plan execution) is started,
     # user can't exit the program by pressing "Ctrl+C" easily.
     # And there is no "os._exit()" in os module if I want to exit in sub-thread:
     # https://stackoverflow.com/questions/1489669/how-to-exit-the-entire-application-from-a-python-thread
-    Client.singleton()
+    ClientPool.singleton()
 
     # the "exclude" option of @logger.catch won't stop outputting stack trace
     try:
@@ -103,6 +107,20 @@ def parse_plans_config(_plans_config: list[dict]) -> list[Plan]:
     return plans
 
 
+def estimate_plans(plans: list[Plan]) -> None:
+    """Print predicted API calls and the minimum wall-clock time of plans, without sending any request."""
+    sizes = RelationshipSizes.from_mirror()
+    clients = 1 + secret.extra_credentials_count()
+    estimates = [p.estimate(sizes, clients) for p in plans]
+
+    for p, e in zip(plans, estimates):
+        print(EstimateReport(f"Plan[id={p.id}] {p.name}", e, sizes, clients))
+    # plans run one by one and share rate limits, relationship lists are only loaded once
+    print(EstimateReport("All plans", Estimate.sum(estimates), sizes, clients))
+    for line in tweet_cap_usage():
+        print(line)
+
+
 def execute_plans(plans: list[Plan]) -> None:
     def on_error(e: Exception) -> None:
         logger.error("Error occurred when executing plan", e)
@@ -111,6 +129,7 @@ def execute_plans(plans: list[Plan]) -> None:
     def run_plans() -> None:
         for plan in plans:
             logger.info("Plan[id={}] start", plan.id)
+            PlanTweetCap.start(plan.tweet_cap)
 
             try:
                 # Explicitly blocking execute plans one by one.
@@ -126,9 +145,27 @@ def execute_plans(plans: list[Plan]) -> None:
     # Temporal coupling for compose a correct json format report.
     Recorder.write_report_header(plans)
     run_plans()
+    record_telemetry()
+    for line in tweet_cap_usage():
+        logger.info(line)
     Recorder.write_report_tail()
 
 
+def record_telemetry() -> None:
+    """Write API call metrics of this run into the report, for knowing where the time was spent."""
+    summary = Telemetry.singleton().summary()
+    logger.info("Twitter API calls of this run:\n{}", summary)
+    Recorder.record(summary)
+
+
+def tweet_cap_usage() -> list[str]:
+    """Tweets consumed from the monthly Tweet cap by each credential set, and the projection at the month's end."""
+    ledger = TweetCapLedger.from_settings()
+    if ledger is None:
+        return []
+    return [f"Monthly Tweet cap of token [{token}]: {usage}" for token, usage in ledger.usage().items()]
+
+
 def process_plan_result(result: Recordable) -> None:
     logger.bind(o=True).info("Finished actions on one target: {}", result.to_record())
     Recorder.record(result)
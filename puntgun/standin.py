@@ -0,0 +1,330 @@
+"""
+A local HTTP stand-in for the Twitter API v2 endpoints that :class:`puntgun.client.Client` uses,
+for end-to-end load testing without network (and without spending real rate limit quota).
+
+It serves deterministic synthetic users and tweets computed from their ids (no memory cost per user),
+the real pagination (``next_token``), partial errors, rate limit headers and 429 responses.
+Point the tool at it with the ``api_base_url`` setting, and use an access token
+starting with the id of "me" followed by a dash (e.g. "1-standin"), like real access tokens.
+
+Run it with ``python -m puntgun.standin --users 1000000``.
+"""
+from __future__ import annotations
+
+import datetime
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlparse
+
+import click
+import orjson
+
+from puntgun.client import RATE_LIMITS
+
+# (method, route pattern, endpoint name as the key of the rate limit in RATE_LIMITS)
+ROUTES: list[tuple[str, re.Pattern, str]] = [
+    ("GET", re.compile(r"^/2/users/me$"), "get_me"),
+    ("GET", re.compile(r"^/2/users/by$"), "get_users_by"),
+    ("GET", re.compile(r"^/2/users$"), "get_users"),
+    ("GET", re.compile(r"^/2/users/\d+/blocking$"), "get_blocked"),
+    ("POST", re.compile(r"^/2/users/\d+/blocking$"), "block"),
+    ("GET", re.compile(r"^/2/users/\d+/followers$"), "get_users_followers"),
+    ("GET", re.compile(r"^/2/users/\d+/following$"), "get_users_following"),
+    ("GET", re.compile(r"^/2/tweets/\d+/liking_users$"), "get_liking_users"),
+    ("GET", re.compile(r"^/2/tweets/\d+/retweeted_by$"), "get_retweeters"),
+    ("GET", re.compile(r"^/2/tweets$"), "get_tweets"),
+]
+
+EPOCH = datetime.datetime(2010, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class RateLimited(Exception):
+    def __init__(self, reset_at: int):
+        self.reset_at = reset_at
+
+
+class StandInWorld:
+    """
+    The synthetic data set. Users' ids are 1..users, username of user N is "userN".
+    Every user has the same followers (ids from 2), followed by the same followings;
+    "me" has ``blocked`` initially blocked users (the biggest ids) plus users blocked through the API.
+    Every ``missing_every``-th id (if set) doesn't exist, for producing partial errors.
+    Rate limits of :data:`puntgun.client.RATE_LIMITS` are applied per endpoint and access token
+    unless ``rate_limited`` is False, ``clock`` can be replaced for testing the windows.
+    """
+
+    def __init__(
+        self,
+        users: int = 10000,
+        followers: int = 1000,
+        following: int = 100,
+        blocked: int = 1000,
+        likers: int = 100,
+        missing_every: int = 0,
+        rate_limited: bool = True,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.users = users
+        self.followers = followers
+        self.following = following
+        self.blocked = min(blocked, users)
+        self.likers = likers
+        self.missing_every = missing_every
+        self.rate_limited = rate_limited
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._newly_blocked: list[int] = []
+        self._newly_blocked_set: set[int] = set()
+        # "endpoint:token" -> call times in current window
+        self._calls: dict[str, list[float]] = {}
+
+    def exists(self, user_id: int) -> bool:
+        return 1 <= user_id <= self.users and not (self.missing_every and user_id % self.missing_every == 0)
+
+    def user(self, user_id: int, fields: set[str]) -> dict:
+        data: dict[str, Any] = {"id": str(user_id), "name": f"User {user_id}", "username": f"user{user_id}"}
+        extra = {
+            "created_at": (EPOCH + datetime.timedelta(hours=user_id)).isoformat().replace("+00:00", ".000Z"),
+            "description": f"synthetic user {user_id}",
+            "location": "",
+            "protected": False,
+            "verified": user_id % 1000 == 0,
+            "profile_image_url": f"https://pbs.twimg.com/profile_images/{user_id}.jpg",
+            "public_metrics": {
+                "followers_count": user_id % 5000,
+                "following_count": user_id % 300 + 1,
+                "tweet_count": user_id % 20000,
+                "listed_count": 0,
+            },
+            "pinned_tweet_id": str(user_id * 10),
+            "entities": {},
+        }
+        data.update({k: v for k, v in extra.items() if k in fields})
+        if "connection_status" in fields:
+            # absent if there is no relationship, the client takes it as an empty list
+            status = self.connection_status(user_id)
+            if status:
+                data["connection_status"] = status
+        return data
+
+    def connection_status(self, user_id: int) -> list[str]:
+        """Relationships between "me" and the user, every account has the same ones."""
+        status = []
+        if 2 <= user_id <= self.followers + 1:
+            status.append("followed_by")
+        if self.followers + 2 <= user_id < self.followers + 2 + self.following:
+            status.append("following")
+        with self._lock:
+            if user_id > self.users - self.blocked or user_id in self._newly_blocked_set:
+                status.append("blocking")
+        return status
+
+    def tweet(self, tweet_id: int) -> dict:
+        return {
+            "id": str(tweet_id),
+            "text": f"synthetic tweet {tweet_id}",
+            "edit_history_tweet_ids": [str(tweet_id)],
+            "author_id": str(tweet_id // 10 if self.exists(tweet_id // 10) else 1),
+            "created_at": (EPOCH + datetime.timedelta(minutes=tweet_id)).isoformat().replace("+00:00", ".000Z"),
+        }
+
+    def blocked_ids(self) -> tuple[list[int], range]:
+        """Newest first: (blocked through the API, initially blocked)."""
+        with self._lock:
+            newly = list(reversed(self._newly_blocked))
+        return newly, range(self.users, self.users - self.blocked, -1)
+
+    def block(self, target_id: int) -> None:
+        with self._lock:
+            self._newly_blocked.append(target_id)
+            self._newly_blocked_set.add(target_id)
+
+    def hit(self, endpoint: str, token: str) -> tuple[int, int, int]:
+        """
+        Count one call to the endpoint with the token.
+        :return: (limit, remaining, reset epoch seconds)
+        :raise RateLimited: if the limit is exhausted
+        """
+        limit, window = RATE_LIMITS.get(endpoint, (900, 15 * 60))
+        now = self.clock()
+        with self._lock:
+            calls = [t for t in self._calls.get(f"{endpoint}:{token}", []) if t > now - window]
+            reset_at = int((calls[0] if calls else now) + window)
+            if self.rate_limited and len(calls) >= limit:
+                raise RateLimited(reset_at)
+            calls.append(now)
+            self._calls[f"{endpoint}:{token}"] = calls
+        return limit, max(limit - len(calls), 0), reset_at
+
+
+def not_found(resource: str, parameter: str, value: str) -> dict:
+    return {
+        "value": value,
+        "detail": f"Could not find {resource} with {parameter}: [{value}].",
+        "title": "Not Found Error",
+        "resource_type": resource,
+        "parameter": parameter,
+        "resource_id": value,
+        "type": "https://api.twitter.com/2/problems/resource-not-found",
+    }
+
+
+def paged(query: dict[str, str], world: StandInWorld, fields: set[str], ids: range, head: list[int] = None) -> dict:
+    """
+    Serve one page of a user list (``head`` + ``ids``) without building the whole list,
+    the next token is the offset of the next page.
+    """
+    head = head or []
+    offset = int(query.get("pagination_token") or 0)
+    size = int(query.get("max_results") or 100)
+    page = head[offset : offset + size] + list(ids[max(offset - len(head), 0) : max(offset + size - len(head), 0)])
+    body: dict[str, Any] = {"data": [world.user(i, fields) for i in page], "meta": {"result_count": len(page)}}
+    if offset + size < len(head) + len(ids):
+        body["meta"]["next_token"] = str(offset + size)
+    if not page:
+        del body["data"]
+    return body
+
+
+def handle(world: StandInWorld, endpoint: str, path: str, query: dict[str, str], me: int, payload: dict) -> dict:
+    """Serve one request of the endpoint (tweepy method name) and return the response body."""
+    fields = set(query.get("user.fields", "").split(","))
+
+    if endpoint == "get_me":
+        return {"data": world.user(me, fields)}
+
+    if endpoint in ("get_users", "get_users_by"):
+        parameter, resource = ("usernames", "username") if endpoint == "get_users_by" else ("ids", "id")
+        found, errors = [], []
+        for v in query.get(parameter, "").split(","):
+            # username of user N is "userN"
+            digits = v.removeprefix("user") if parameter == "usernames" else v
+            user_id = int(digits) if digits.isdigit() else 0
+            if world.exists(user_id):
+                found.append(world.user(user_id, fields))
+            else:
+                errors.append(not_found("user", resource, v))
+        body: dict[str, Any] = {}
+        if found:
+            body["data"] = found
+            if "pinned_tweet_id" in query.get("expansions", "") and "pinned_tweet_id" in fields:
+                body["includes"] = {"tweets": [world.tweet(int(u["id"]) * 10) for u in found]}
+        if errors:
+            body["errors"] = errors
+        return body
+
+    if endpoint == "get_tweets":
+        tweets = [world.tweet(int(i)) for i in query.get("ids", "").split(",") if i.isdigit()]
+        body = {"data": tweets}
+        if "author_id" in query.get("expansions", ""):
+            body["includes"] = {"users": [world.user(int(t["author_id"]), fields) for t in tweets]}
+        return body
+
+    if endpoint == "block":
+        world.block(int(payload["target_user_id"]))
+        return {"data": {"blocking": True}}
+    if endpoint == "get_blocked":
+        newly, initially = world.blocked_ids()
+        return paged(query, world, fields, initially, newly)
+    if endpoint == "get_users_followers":
+        return paged(query, world, fields, range(world.followers + 1, 1, -1))
+    if endpoint == "get_users_following":
+        start = world.followers + 2
+        return paged(query, world, fields, range(start + world.following - 1, start - 1, -1))
+    # liking users and retweeters
+    return paged(query, world, fields, range(2, world.likers + 2))
+
+
+def build_handler(world: StandInWorld) -> type[BaseHTTPRequestHandler]:
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _serve(self, method: str) -> None:
+            url = urlparse(self.path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = orjson.loads(self.rfile.read(length)) if length else {}
+            endpoint = next((name for m, p, name in ROUTES if m == method and p.match(url.path)), None)
+            if endpoint is None:
+                return self._reply(404, {"title": "Not Found Error", "detail": url.path}, {})
+
+            # the same token identity as the real API: the OAuth 1.0a access token
+            matched = re.search(r'oauth_token="([^"]*)"', self.headers.get("Authorization", ""))
+            token = matched.group(1) if matched else "anonymous"
+            user_id = token.split("-")[0]
+            me = int(user_id) if user_id.isdigit() else 1
+            try:
+                limit, remaining, reset_at = world.hit(endpoint, token)
+            except RateLimited as e:
+                headers = {"x-rate-limit-limit": "0", "x-rate-limit-remaining": "0", "x-rate-limit-reset": e.reset_at}
+                return self._reply(429, {"title": "Too Many Requests", "status": 429}, headers)
+
+            headers = {"x-rate-limit-limit": limit, "x-rate-limit-remaining": remaining, "x-rate-limit-reset": reset_at}
+            self._reply(200, handle(world, endpoint, url.path, query, me, payload), headers)
+
+        def _reply(self, status: int, body: dict, headers: dict) -> None:
+            content = orjson.dumps(body)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(content)))
+            for k, v in headers.items():
+                self.send_header(k, str(v))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self) -> None:
+            self._serve("GET")
+
+        def do_POST(self) -> None:
+            self._serve("POST")
+
+        def log_message(self, *_: Any) -> None:
+            """Keep quiet, there are millions of requests in a load test."""
+
+    return StandInHandler
+
+
+def serve(world: StandInWorld, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stand-in in a background thread, check ``server.server_address`` for the port if it's 0."""
+    server = ThreadingHTTPServer((host, port), build_handler(world))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True)
+@click.option("--users", default=10000, show_default=True, help="How many users exist.")
+@click.option("--followers", default=1000, show_default=True, help="Follower count of every user.")
+@click.option("--following", default=100, show_default=True, help="Following count of every user.")
+@click.option("--blocked", default=1000, show_default=True, help="How many users are initially blocked.")
+@click.option("--missing-every", default=0, show_default=True, help="Every N-th user id doesn't exist.")
+@click.option("--no-rate-limit", is_flag=True, help="Never response 429.")
+def main(
+    host: str,
+    port: int,
+    users: int,
+    followers: int,
+    following: int,
+    blocked: int,
+    missing_every: int,
+    no_rate_limit: bool,
+) -> None:
+    """Serve a local stand-in of the Twitter API v2 for load testing."""
+    world = StandInWorld(
+        users, followers, following, blocked, missing_every=missing_every, rate_limited=not no_rate_limit
+    )
+    server = serve(world, host, port)
+    print(f"Serving Twitter API stand-in on http://{host}:{server.server_address[1]}, press Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
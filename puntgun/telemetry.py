@@ -0,0 +1,199 @@
+"""
+In-process telemetry of Twitter API calls, for finding out where a run spends its time.
+
+Per tweepy endpoint (method name) it collects request latency histograms, error and 429 counts,
+the rate limit quota reported by the ``x-rate-limit-*`` response headers,
+and the time spent waiting for rate limits before sending requests.
+The summary is written into the report file at the end of a run.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Any, Callable, Mapping
+
+import requests
+
+from puntgun.record import Record, Recordable
+from puntgun.util import single_flight
+
+# Upper bounds (seconds) of latency histogram buckets, the last bucket is unbounded.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class EndpointMetrics:
+    """Metrics of one endpoint, only modified by :class:`Telemetry` under its lock."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.waited = 0.0
+        self.waits = 0
+        # latest values from response headers
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset: int | None = None
+
+    def observe_latency(self, seconds: float) -> None:
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        bounds = [str(b) for b in LATENCY_BUCKETS] + ["+Inf"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "latency": {
+                "sum": round(self.latency_sum, 3),
+                "max": round(self.latency_max, 3),
+                "avg": round(self.latency_sum / self.calls, 3) if self.calls else 0,
+                # cumulative counts like Prometheus histograms: requests took no more than the bound
+                "buckets": dict(zip(bounds, _accumulate(self.latency_buckets))),
+            },
+            "rate_limit": {"limit": self.limit, "remaining": self.remaining, "reset": self.reset},
+            "waited": {"count": self.waits, "seconds": round(self.waited, 3)},
+        }
+
+
+def _accumulate(counts: list[int]) -> list[int]:
+    total, result = 0, []
+    for c in counts:
+        total += c
+        result.append(total)
+    return result
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> int | None:
+    value = headers.get(name)
+    return int(value) if value is not None and value.isdigit() else None
+
+
+class Telemetry:
+    """
+    Collects :class:`EndpointMetrics` of all clients in this process, thread-safe.
+
+    Response headers are captured by a hook on the HTTP session which knows nothing about tweepy methods,
+    so the endpoint being called is passed to the hook through a thread local variable set by :meth:`timed`.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._endpoints: dict[str, EndpointMetrics] = {}
+
+    @staticmethod
+    @single_flight
+    def singleton() -> Telemetry:
+        return Telemetry()
+
+    def _metrics(self, endpoint: str) -> EndpointMetrics:
+        """Call with the lock held."""
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = EndpointMetrics()
+        return self._endpoints[endpoint]
+
+    def timed(self, endpoint: str, client_func: Callable) -> Callable:
+        """Decorator for measuring latency of tweepy client methods, excluding time waited for rate limits."""
+
+        def decorator(*args: Any, **kwargs: Any) -> Any:
+            outer = getattr(self._local, "endpoint", None)
+            self._local.endpoint = endpoint
+            start = self._clock()
+            failed = True
+            try:
+                result = client_func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._local.endpoint = outer
+                self.observe_call(endpoint, self._clock() - start, failed)
+
+        decorator.__name__ = endpoint
+        return decorator
+
+    def observe_call(self, endpoint: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            metrics = self._metrics(endpoint)
+            metrics.calls += 1
+            metrics.errors += failed
+            metrics.observe_latency(seconds)
+
+    def observe_wait(self, endpoint: str, seconds: float) -> None:
+        """Time spent waiting for the endpoint's rate limit before calling it."""
+        with self._lock:
+            metrics = self._metrics(endpoint)
+            metrics.waits += 1
+            metrics.waited += seconds
+
+    def observe_response(self, endpoint: str, status: int, headers: Mapping[str, str]) -> None:
+        with self._lock:
+            metrics = self._metrics(endpoint)
+            metrics.rate_limited += status == 429
+            # not every endpoint returns these headers
+            for attr in ("limit", "remaining", "reset"):
+                value = _int_header(headers, f"x-rate-limit-{attr}")
+                if value is not None:
+                    setattr(metrics, attr, value)
+
+    def response_hook(self, response: requests.Response, *args: Any, **kwargs: Any) -> requests.Response:
+        """
+        Hook for :class:`requests.Session`, see
+        https://requests.readthedocs.io/en/latest/user/advanced/#event-hooks
+        """
+        endpoint = getattr(self._local, "endpoint", None)
+        if endpoint is not None:
+            self.observe_response(endpoint, response.status_code, response.headers)
+        return response
+
+    def install(self, session: requests.Session) -> None:
+        """Capture response headers of the session, the session may be shared by several clients."""
+        hooks = session.hooks.setdefault("response", [])
+        if self.response_hook not in hooks:
+            hooks.append(self.response_hook)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """endpoint -> metrics, a copy that won't change with latter calls."""
+        with self._lock:
+            return {e: m.to_dict() for e, m in sorted(self._endpoints.items())}
+
+    def summary(self) -> TelemetrySummary:
+        return TelemetrySummary(self.snapshot())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+class TelemetrySummary(Recordable):
+    """Metrics of all endpoints called during a run, written into the report file."""
+
+    def __init__(self, endpoints: dict[str, dict[str, Any]]):
+        self.endpoints = endpoints
+
+    def to_record(self) -> Record:
+        return Record(type="api_telemetry", data={"endpoints": self.endpoints})
+
+    @staticmethod
+    def parse_from_record(record: Record) -> TelemetrySummary:
+        return TelemetrySummary(record.data.get("endpoints", {}))
+
+    def __str__(self) -> str:
+        lines = [
+            f"{'Endpoint':<24}{'Calls':>8}{'Errors':>8}{'429s':>6}{'Avg latency':>13}{'Waited':>10}{'Remaining':>11}"
+        ]
+        for endpoint, m in self.endpoints.items():
+            remaining = m["rate_limit"]["remaining"]
+            lines.append(
+                f"{endpoint:<24}{m['calls']:>8}{m['errors']:>8}{m['rate_limited']:>6}"
+                f"{m['latency']['avg']:>12.3f}s{m['waited']['seconds']:>9.1f}s"
+                f"{'-' if remaining is None else remaining:>11}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,66 @@
+"""
+The HTTP transport shared by all Twitter clients (the main one and extra credential sets).
+
+tweepy creates a default :class:`requests.Session` for each client, without timeouts
+and with a connection pool smaller than the number of rule threads querying it at the same time.
+One tuned session reuses kept-alive connections (and TLS handshakes) among all clients.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from puntgun.conf import config
+from puntgun.util import single_flight
+
+TWITTER_API_HOST = "https://api.twitter.com"
+
+
+class TunedSession(requests.Session):
+    """
+    A :class:`requests.Session` with a sized connection pool,
+    compressed responses and default (connect, read) timeouts on every request.
+    """
+
+    def __init__(self, pool_size: int, timeout: tuple[float, float], base_url: str = None):
+        super().__init__()
+        self.timeout = timeout
+        # tweepy always sends requests to the official host, redirect them (e.g. to the local stand-in)
+        self.base_url = base_url.rstrip("/") if base_url else None
+        # Block instead of opening throwaway connections when all pooled ones are in use.
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+
+    def request(self, method: str | bytes, url: str | bytes, *args: Any, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        # requests accepts bytes urls as well
+        url = url.decode("utf-8") if isinstance(url, bytes) else url
+        if self.base_url and url.startswith(TWITTER_API_HOST):
+            url = self.base_url + url[len(TWITTER_API_HOST) :]
+        return super().request(method, url, *args, **kwargs)
+
+
+def build_http_session() -> requests.Session:
+    pool_size = int(config.settings.get("http_pool_size", 32))
+    timeout = (
+        float(config.settings.get("http_connect_timeout", 10)),
+        float(config.settings.get("http_read_timeout", 60)),
+    )
+
+    # imported here because the cassette module builds on this one
+    from puntgun import cassette
+
+    base_url = config.settings.get("api_base_url")
+    mode = cassette.cassette_mode()
+    if mode != "off":
+        return cassette.build_cassette_session(mode, pool_size, timeout, base_url)
+    return TunedSession(pool_size, timeout, base_url)
+
+
+@single_flight
+def shared_http_session() -> requests.Session:
+    return build_http_session()
@@ -1,12 +1,17 @@
 """Util methods for many modules."""
+import functools
 import getpass
 import os
 import shutil
+import threading
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Callable
+from typing import Any, Callable, Generic, TypeVar
 
 from loguru import logger
 
+V = TypeVar("V")
+
 
 def get_input_from_terminal(key: str) -> str:
     return get_input_wrapper(input, "{}: ".format(key))
@@ -34,3 +39,72 @@ def backup_if_exists(path: Path) -> None:
     if path.exists():
         logger.warning("Indicated output file [{}] already exists, back up the origin file", path)
         shutil.copy2(path, path.with_suffix(os.path.splitext(path)[1] + ".bak"))
+
+
+class SingleFlight(Generic[V]):
+    """
+    Lazily load a value once and share it, like a ``functools.lru_cache(maxsize=1)`` on a no-param function,
+    but concurrent callers that miss the cache wait on the one in-flight load instead of loading it again.
+
+    Failures are not cached, the next caller will try loading again.
+    """
+
+    def __init__(self, loader: Callable[[], V]):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._future: Future | None = None
+
+    def __call__(self) -> V:
+        with self._lock:
+            future, leader = self._future, self._future is None
+            if leader:
+                future = self._future = Future()
+
+        if leader:
+            try:
+                future.set_result(self._loader())
+            except BaseException as e:
+                with self._lock:
+                    # may be replaced by a refresh in the meantime
+                    if self._future is future:
+                        self._future = None
+                future.set_exception(e)
+
+        return future.result()
+
+    def invalidate(self) -> None:
+        """Drop the loaded value, it will be loaded again on next call. Callers of an in-flight load aren't affected."""
+        with self._lock:
+            self._future = None
+
+    # the name of functools.lru_cache's equivalent
+    cache_clear = invalidate
+
+    def refresh(self) -> V:
+        """Load the value again now (or join a load started after invalidation) and return the new one."""
+        self.invalidate()
+        return self()
+
+
+def single_flight(func: Callable[[], V]) -> SingleFlight[V]:
+    """Decorator of no-param functions (put it under ``@staticmethod``), see :class:`SingleFlight`."""
+    return functools.update_wrapper(SingleFlight(func), func)
+
+
+class single_flight_method(Generic[V]):
+    """
+    Decorator of no-param methods, each instance gets its own :class:`SingleFlight`,
+    so ``instance.method()`` loads once and ``instance.method.refresh()`` loads again.
+    """
+
+    def __init__(self, func: Callable[[Any], V]):
+        self._func = func
+        self._name = func.__name__
+        functools.update_wrapper(self, func)
+
+    def __get__(self, instance: Any, owner: type | None = None) -> Any:
+        if instance is None:
+            return self
+        # dict.setdefault is atomic, racing first callers get the same one,
+        # and the instance attribute shadows this (non-data) descriptor on latter accesses.
+        return instance.__dict__.setdefault(self._name, SingleFlight(functools.partial(self._func, instance)))
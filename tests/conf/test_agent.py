@@ -0,0 +1,98 @@
+import socket
+import threading
+
+import pytest
+
+from puntgun.client import load_credentials, load_secrets
+from puntgun.conf import agent
+from puntgun.conf.agent import SecretsAgent
+
+secrets = {"ak": "1", "aks": "2", "at": "3", "ats": "4"}
+
+
+@pytest.fixture
+def socket_file(tmp_path):
+    return tmp_path.joinpath("agent.sock")
+
+
+@pytest.fixture
+def running_agent(socket_file):
+    secrets_agent = SecretsAgent(secrets, socket_file, 60)
+    thread = threading.Thread(target=secrets_agent.serve, daemon=True)
+    thread.start()
+    # wait for the socket file
+    for _ in range(100):
+        if socket_file.exists():
+            break
+        thread.join(0.01)
+    yield secrets_agent
+    agent.request("stop", socket_file)
+    thread.join(5)
+
+
+def test_serve_secrets(running_agent, socket_file):
+    assert agent.request_secrets(socket_file) == secrets
+    assert agent.request("status", socket_file)["expires_at"] == running_agent.expires_at
+
+
+def test_socket_file_only_accessible_by_user(running_agent, socket_file):
+    assert socket_file.stat().st_mode & 0o077 == 0
+
+
+def test_stop(running_agent, socket_file):
+    assert agent.request("stop", socket_file) == {"stopped": True}
+    for _ in range(300):
+        if not socket_file.exists():
+            break
+        threading.Event().wait(0.01)
+    assert not socket_file.exists()
+    assert agent.request_secrets(socket_file) is None
+
+
+def test_expiry(socket_file):
+    clock = [0.0]
+    secrets_agent = SecretsAgent(secrets, socket_file, 60, lambda: clock[0])
+    assert not secrets_agent.expired()
+    clock[0] = 60
+    assert secrets_agent.expired()
+    # serving an expired session returns at once and forgets the secrets
+    secrets_agent.serve()
+    assert secrets_agent.handle({"op": "secrets"}) == {"error": "session expired"}
+    assert secrets_agent._secrets == {}
+    assert not socket_file.exists()
+
+
+def test_silent_client_blocks_neither_others_nor_expiry(socket_file):
+    clock = [0.0]
+    secrets_agent = SecretsAgent(secrets, socket_file, 60, lambda: clock[0])
+    thread = threading.Thread(target=secrets_agent.serve, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if socket_file.exists():
+            break
+        thread.join(0.01)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as silent:
+        # connected, but never sends a request line
+        silent.connect(str(socket_file))
+        assert agent.request_secrets(socket_file) == secrets
+
+        clock[0] = 60
+        thread.join(5)
+        assert not thread.is_alive()
+        assert secrets_agent._secrets == {}
+
+
+def test_no_agent(socket_file):
+    assert agent.request_secrets(socket_file) is None
+    # the socket file left by a killed agent
+    socket_file.touch()
+    assert agent.request_secrets(socket_file) is None
+
+
+def test_credentials_from_agent(monkeypatch):
+    monkeypatch.setattr("puntgun.conf.agent.request_secrets", lambda: secrets)
+    monkeypatch.setattr("puntgun.conf.encrypto.load_or_generate_private_key", pytest.fail)
+    load_secrets.cache_clear()
+    assert load_credentials()["access_token"] == "3"
+    load_secrets.cache_clear()
@@ -1,9 +1,11 @@
 """For speed up testing, multiple test cases are compressed into one case."""
+import os
 from io import StringIO
 
 import pytest
+from dynaconf import Dynaconf
 
-from puntgun.conf import encrypto
+from puntgun.conf import encrypto, secret
 
 
 def test_all_cryptographic_methods(generated_key_file):
@@ -58,3 +60,107 @@ def test_load_or_generate_private_key_file(
         == encrypto.decrypt(actual_key_stdin, encrypt_text)
         == encrypto.decrypt(actual_key_generated, encrypt_text)
     )
+
+
+def test_cipher_backends():
+    legacy_key = encrypto.RsaOaepCipher.generate_private_key()
+    key = encrypto.generate_private_key()
+    assert encrypto.cipher_of(legacy_key) is encrypto.RsaOaepCipher
+    assert encrypto.cipher_of(key.public_key()) is encrypto.X25519EnvelopeCipher
+
+    for k in (legacy_key, key):
+        assert encrypto.decrypt(k, encrypto.encrypt(k.public_key(), "text")) == "text"
+
+    # the envelope can hold more than one RSA block
+    long_text = "x" * 1000
+    assert encrypto.decrypt(key, encrypto.encrypt(key.public_key(), long_text)) == long_text
+
+    # modified ciphertext or wrong key
+    ciphertext = bytearray(encrypto.encrypt(key.public_key(), "text"))
+    ciphertext[-1] ^= 1
+    with pytest.raises(ValueError):
+        encrypto.decrypt(key, bytes(ciphertext))
+    with pytest.raises(ValueError):
+        encrypto.decrypt(encrypto.generate_private_key(), encrypto.encrypt(key.public_key(), "text"))
+
+
+def test_migrate_legacy_key_and_secrets_file(monkeypatch, tmp_path, mock_input):
+    pri_key_file, secrets_file = tmp_path.joinpath("pri"), tmp_path.joinpath("s.yml")
+    monkeypatch.setattr("puntgun.conf.config.pri_key_file", pri_key_file)
+    monkeypatch.setattr("puntgun.conf.config.secrets_file", secrets_file)
+    legacy_key = encrypto.RsaOaepCipher.generate_private_key()
+    encrypto.dump_private_key(legacy_key, "pwd", pri_key_file)
+    secrets = {"ak": "1", "aks": "2", "at": "3", "ats": "4"}
+    secret.encrypt_and_save_secrets_into_file(legacy_key.public_key(), secrets_file, **secrets)
+    monkeypatch.setattr("puntgun.conf.config.settings", Dynaconf(settings_files=secrets_file))
+
+    mock_input("pwd", "y")
+    key = encrypto.load_or_generate_private_key()
+
+    assert encrypto.cipher_of(key) is encrypto.X25519EnvelopeCipher
+    # originals are kept
+    assert pri_key_file.with_suffix(".bak").exists()
+    assert secrets_file.with_suffix(".yml.bak").exists()
+    # the loaded settings and files are both migrated
+    assert secret.load_secrets_from_settings(key) == secrets
+    monkeypatch.setattr("puntgun.conf.config.settings", Dynaconf(settings_files=secrets_file))
+    assert secret.load_secrets_from_settings(key) == secrets
+    assert encrypto.cipher_of(encrypto.load_private_key("pwd", pri_key_file)) is encrypto.X25519EnvelopeCipher
+
+
+@pytest.mark.parametrize(
+    "failed_step", ["puntgun.conf.encrypto.dump_private_key", "puntgun.conf.secret.encrypt_and_save_secrets_into_file"]
+)
+def test_failed_migration_keeps_original_files(monkeypatch, tmp_path, failed_step):
+    pri_key_file, secrets_file = tmp_path.joinpath("pri"), tmp_path.joinpath("s.yml")
+    monkeypatch.setattr("puntgun.conf.config.pri_key_file", pri_key_file)
+    monkeypatch.setattr("puntgun.conf.config.secrets_file", secrets_file)
+    legacy_key = encrypto.RsaOaepCipher.generate_private_key()
+    encrypto.dump_private_key(legacy_key, "pwd", pri_key_file)
+    secret.encrypt_and_save_secrets_into_file(legacy_key.public_key(), secrets_file, ak="1", aks="2", at="3", ats="4")
+    monkeypatch.setattr("puntgun.conf.config.settings", Dynaconf(settings_files=secrets_file))
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(failed_step, fail)
+    with pytest.raises(OSError):
+        encrypto.migrate_legacy_key(legacy_key, "pwd")
+
+    # the legacy key still opens the legacy secrets file
+    key = encrypto.load_private_key("pwd", pri_key_file)
+    assert encrypto.cipher_of(key) is encrypto.RsaOaepCipher
+    assert secret.load_and_decrypt_secret_from_settings(key, "ak", Dynaconf(settings_files=secrets_file)) == "1"
+
+
+def test_interrupted_migration_is_finished_on_next_start(monkeypatch, tmp_path):
+    pri_key_file, secrets_file = tmp_path.joinpath("pri"), tmp_path.joinpath("s.yml")
+    monkeypatch.setattr("puntgun.conf.config.pri_key_file", pri_key_file)
+    monkeypatch.setattr("puntgun.conf.config.secrets_file", secrets_file)
+    legacy_key = encrypto.RsaOaepCipher.generate_private_key()
+    encrypto.dump_private_key(legacy_key, "pwd", pri_key_file)
+    secret.encrypt_and_save_secrets_into_file(legacy_key.public_key(), secrets_file, ak="1", aks="2", at="3", ats="4")
+    monkeypatch.setattr("puntgun.conf.config.settings", Dynaconf(settings_files=secrets_file))
+
+    # crash right after the secrets file is moved into place
+    replace, moved = os.replace, []
+
+    def replace_once(src, dst):
+        if moved:
+            raise OSError("killed")
+        moved.append(dst)
+        replace(src, dst)
+
+    monkeypatch.setattr("os.replace", replace_once)
+    with pytest.raises(OSError):
+        encrypto.migrate_legacy_key(legacy_key, "pwd")
+    monkeypatch.setattr("os.replace", replace)
+
+    # the legacy key is still in place, the next start picks up the new key left aside
+    assert encrypto.cipher_of(encrypto.load_private_key("pwd", pri_key_file)) is encrypto.RsaOaepCipher
+    monkeypatch.setattr("puntgun.conf.config.settings", Dynaconf(settings_files=secrets_file))
+    key = encrypto.migrate_legacy_key(legacy_key, "pwd")
+    assert encrypto.cipher_of(key) is encrypto.X25519EnvelopeCipher
+    assert encrypto.cipher_of(encrypto.load_private_key("pwd", pri_key_file)) is encrypto.X25519EnvelopeCipher
+    assert secret.load_and_decrypt_secret_from_settings(key, "ak", Dynaconf(settings_files=secrets_file)) == "1"
+    assert pri_key_file.with_suffix(".bak").exists()
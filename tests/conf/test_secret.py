@@ -1,3 +1,5 @@
+from unittest.mock import MagicMock
+
 import pytest
 import tweepy
 from dynaconf import Dynaconf
@@ -26,6 +28,49 @@ def test_secrets_save_and_load_via_settings_file(tmp_path):
     settings = Dynaconf(settings_files=path)
     assert secret.load_and_decrypt_secret_from_settings(private_key, "a", settings) == "token"
     assert secret.load_and_decrypt_secret_from_settings(private_key, "b", settings) == "another"
+    # all secrets are in one envelope marked with the format version
+    assert settings.get("secrets_format") == 2
+    with pytest.raises(ValueError):
+        secret.load_and_decrypt_secret_from_settings(private_key, "c", settings)
+
+
+def test_decrypt_envelope_once_for_all_secrets(monkeypatch, tmp_path):
+    private_key = encrypto.generate_private_key()
+    path = tmp_path.joinpath("secrets.yml")
+    secrets = {"ak": "1", "aks": "2", "at": "3", "ats": "4"}
+    secret.encrypt_and_save_secrets_into_file(private_key.public_key(), path, **secrets)
+    monkeypatch.setattr("puntgun.conf.config.settings", Dynaconf(settings_files=path))
+    decrypt = MagicMock(side_effect=encrypto.decrypt)
+    monkeypatch.setattr("puntgun.conf.encrypto.decrypt", decrypt)
+    secret.decrypt_envelope.cache_clear()
+
+    assert secret.load_secrets_from_settings(private_key) == secrets
+    assert decrypt.call_count == 1
+
+
+def test_save_and_load_extra_credentials(tmp_path):
+    private_key = encrypto.generate_private_key()
+    path = tmp_path.joinpath("secrets.yml")
+    extra = [{"ak": "1", "aks": "2", "at": "3", "ats": "4"}]
+    secret.encrypt_and_save_secrets_into_file(private_key.public_key(), path, ak="a", extra_credentials=extra)
+    settings = Dynaconf(settings_files=path)
+    # only the count is in plaintext
+    assert secret.extra_credentials_count(settings) == 1
+    assert "ats" not in path.read_text(encoding="utf-8")
+    assert secret.load_extra_credentials_from_settings(private_key, settings) == extra
+
+    legacy_key = encrypto.RsaOaepCipher.generate_private_key()
+    with pytest.raises(ValueError):
+        secret.encrypt_and_save_secrets_into_file(legacy_key.public_key(), path, ak="a", extra_credentials=extra)
+
+
+def test_load_legacy_secrets_file(tmp_path):
+    private_key = encrypto.RsaOaepCipher.generate_private_key()
+    path = tmp_path.joinpath("secrets.yml")
+    secret.encrypt_and_save_secrets_into_file(private_key.public_key(), path, a="token")
+    settings = Dynaconf(settings_files=path)
+    assert settings.get("secrets_format") is None
+    assert secret.load_and_decrypt_secret_from_settings(private_key, "a", settings) == "token"
 
 
 def test_secrets_config_file_exists_check(monkeypatch, tmp_path):
@@ -1,5 +1,8 @@
 from unittest.mock import MagicMock
 
+import tweepy
+
+from puntgun.client import TwitterClientError
 from puntgun.rules.config_parser import ConfigParser
 from puntgun.rules.data import User
 from puntgun.rules.user.action_rules import BlockUserActionRule, UserActionRule
@@ -16,3 +19,20 @@ def test_block_user_action_rule(mock_client):
     assert bool(rule(User())) is True
     # second is False
     assert bool(rule(User())) is False
+
+
+def test_failed_blocking_does_not_stop_the_plan(mock_client, monkeypatch):
+    recorded = []
+    monkeypatch.setattr("puntgun.client.Recorder.record", recorded.append)
+
+    def fail(*_):
+        raise TwitterClientError() from tweepy.errors.TwitterServerError(MagicMock(status_code=503))
+
+    mock_client.block_user_by_id = fail
+    assert bool(ConfigParser.parse({"block": {}}, UserActionRule)(User(id=42))) is False
+    assert recorded[0].query_params == {"args": [42, None]}
+
+
+def test_block_with_relationships_of_user(mock_client):
+    ConfigParser.parse({"block": {}}, UserActionRule)(User(id=42, connection_status=["followed_by"]))
+    mock_client.block_user_by_id.assert_called_once_with(42, ["followed_by"])
@@ -174,6 +174,29 @@ class TestUserPlan:
         plan._filtering().pipe(op.do(rx.Observer(on_next=always_true_zipped_result_checker))).run()
         assert always_true_zipped_result_checker.call_count == 3
 
+    def test_project_fields_read_by_filter_rules(self):
+        plan = ConfigParser.parse(
+            {
+                "user_plan": "plan name",
+                "from": [{"psr": {"num": 3}}],
+                "that": [{"follower_less_than": 10}, {"all_of": [{"created_within_days": 3}]}],
+                "do": [],
+            },
+            Plan,
+        )
+        assert plan.sources.rules[0]._fields == {"followers_count", "created_at"}
+
+        # query all fields if any filter rule doesn't declare what it reads
+        plan = ConfigParser.parse(
+            {"user_plan": "plan name", "from": [{"psr": {"num": 3}}], "that": [{"etf": {}}], "do": []}, Plan
+        )
+        assert plan.sources.rules[0]._fields is None
+
+    def test_tweet_cap(self):
+        conf = {"user_plan": "plan name", "from": [{"psr": {"num": 3}}], "do": []}
+        assert ConfigParser.parse(conf, Plan).tweet_cap is None
+        assert ConfigParser.parse({**conf, "tweet_cap": 1000}, Plan).tweet_cap == 1000
+
     def test_plan_running(self, user_plan_result_checker):
         plan = ConfigParser.parse(
             {
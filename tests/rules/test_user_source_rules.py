@@ -3,6 +3,7 @@ from unittest.mock import MagicMock, call
 import pytest
 import reactivex as rx
 import reactivex.operators as op
+import tweepy
 from hamcrest import all_of, assert_that, contains_string
 from reactivex.internal import SequenceContainsNoElementsError
 
@@ -20,7 +21,8 @@ class TestCommonBehavior:
     def test_client_error_catching(self, mock_client):
         def raise_error(_):
             raise_error.called = True
-            raise client.TwitterClientError()
+            # fatal errors (bad credentials...) still stop the plan
+            raise client.TwitterClientError() from tweepy.errors.Unauthorized(MagicMock(status_code=401))
 
         def assertion_consumer(e):
             assertion_consumer.called = True
@@ -37,6 +39,24 @@ class TestCommonBehavior:
         assert raise_error.called
         assert assertion_consumer.called
 
+    def test_failed_batch_is_skipped(self, mock_client, monkeypatch, user_id_sequence_checker):
+        recorded = []
+        monkeypatch.setattr("puntgun.client.Recorder.record", recorded.append)
+
+        def fail_first_batch(names):
+            if names[0] == "failed":
+                raise client.TwitterClientError() from tweepy.errors.TwitterServerError(MagicMock(status_code=503))
+            return [User(id=i) for i in range(len(names))]
+
+        mock_client.get_users_by_usernames = fail_first_batch
+        rule = NameUserSourceRule.parse_obj({"names": ["failed"] * 100 + ["second_batch"]})
+
+        rule().pipe(op.do(rx.Observer(on_next=user_id_sequence_checker))).run()
+        assert user_id_sequence_checker.call_count == 1
+        # the failed batch is recorded for re-doing it later
+        assert recorded[0].query_func_name == "get_users_by_usernames"
+        assert recorded[0].query_params == {"args": [["failed"] * 100]}
+
     def test_what_happen_when_client_returns_empty_list_as_result(self, mock_client):
         # the client returns an empty list
         mock_get_users_by_usernames = MagicMock(return_value=[])
@@ -108,6 +128,16 @@ class TestMyFollowerUserSourceRule:
         mock_users = [User(id=i, username=str(i)) for i in range(4)]
         mock_func = MagicMock(return_value=mock_users)
         mock_client.cached_follower = mock_func
+        mock_client.mirror = None
+        # the streaming version, records how many followers are consumed
+        mock_client.consumed = []
+
+        def iter_follower(*_, **__):
+            for u in mock_users:
+                mock_client.consumed.append(u)
+                yield u
+
+        mock_client.iter_follower = iter_follower
         return mock_func
 
     def test_fields_conflicting(self):
@@ -131,11 +161,22 @@ class TestMyFollowerUserSourceRule:
         assert user_id_sequence_checker.call_count == 4
         assert user_id_sequence_checker.called_user_ids == {0, 1, 2, 3}
 
-    def test_last_field(self, mock_client_cached_follower_func, user_id_sequence_checker):
+    def test_last_field(self, mock_client, mock_client_cached_follower_func, user_id_sequence_checker):
         rule = MyFollowerUserSourceRule(last=2)
         rule().pipe(op.do(rx.Observer(on_next=user_id_sequence_checker))).run()
         assert user_id_sequence_checker.call_count == 2
         assert user_id_sequence_checker.called_user_ids == {0, 1}
+        # stop consuming the follower stream when we have enough
+        assert len(mock_client.consumed) == 2
+
+    def test_read_from_mirror(self, mock_client, mock_client_cached_follower_func, user_id_sequence_checker):
+        mock_client.mirror = MagicMock()
+        rule = MyFollowerUserSourceRule(last=2)
+        rule().pipe(op.do(rx.Observer(on_next=user_id_sequence_checker))).run()
+        assert user_id_sequence_checker.called_user_ids == {0, 1}
+        # nothing is streamed from the API
+        assert mock_client.consumed == []
+        mock_client_cached_follower_func.assert_called_once()
 
     def test_first_field(self, mock_client_cached_follower_func, user_id_sequence_checker):
         rule = MyFollowerUserSourceRule(first=2)
@@ -0,0 +1,218 @@
+import sqlite3
+from unittest.mock import MagicMock
+
+import orjson
+import pytest
+
+from puntgun.cache import (
+    DiskUserStore,
+    LruCache,
+    MissingUserStore,
+    RelationshipMirror,
+    UserCache,
+)
+from puntgun.rules.data import Tweet, User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_lru_cache_evicts_least_recently_used(clock):
+    cache = LruCache(2, 100, clock)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    # touch 1 so 2 becomes the least recently used one
+    assert cache.get(1) == "a"
+    cache.put(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.get(3) == "c"
+    assert len(cache) == 2
+
+
+def test_lru_cache_expires_entries(clock):
+    cache = LruCache(2, 100, clock)
+    cache.put(1, "a")
+    clock.now += 101
+    assert cache.get(1) is None
+
+
+class TestDiskUserStore:
+    @pytest.fixture
+    def store(self, tmp_path, clock):
+        return DiskUserStore(tmp_path.joinpath("users.db"), 2, 100, clock)
+
+    def test_save_and_load_by_id_or_username(self, store):
+        user = User(id=1, username="Foo", pinned_tweet=Tweet(id=2, text="pinned"), followers_count=3)
+        store.put([user])
+
+        for loaded, attributes in [store.get_by_ids([1])[0], store.get_by_usernames(["fOO"])[0]]:
+            assert loaded == user
+            assert attributes is None
+            assert loaded.followers_count == 3
+            assert loaded.pinned_tweet.text == "pinned"
+
+    def test_relationships_are_not_persisted(self, store):
+        store.put([User(id=1, username="a", connection_status=["following"])])
+        assert store.get_by_ids([1])[0][0].connection_status is None
+
+    def test_partial_users_keep_their_attributes(self, store):
+        store.put([User(id=1, username="a", followers_count=3)], frozenset({"followers_count"}))
+        assert store.get_by_ids([1]) == [(User(id=1, username="a", followers_count=3), {"followers_count"})]
+
+    def test_files_of_former_versions_have_whole_users(self, tmp_path, clock):
+        file = tmp_path.joinpath("users.db")
+        with sqlite3.connect(file) as conn:
+            conn.execute(
+                "CREATE TABLE users "
+                "(id INTEGER PRIMARY KEY, username TEXT, data BLOB NOT NULL, cached_at REAL NOT NULL)"
+            )
+            conn.execute("INSERT INTO users VALUES (1, 'a', ?, ?)", (orjson.dumps({"id": 1}), clock.now))
+        conn.close()
+        assert DiskUserStore(file, 2, 100, clock).get_by_ids([1]) == [(User(id=1), None)]
+
+    def test_expired_users_are_ignored(self, store, clock):
+        store.put([User(id=1, username="a")])
+        clock.now += 101
+        assert store.get_by_ids([1]) == []
+
+    def test_oldest_users_are_evicted_down_to_low_water_mark(self, tmp_path, clock):
+        store = DiskUserStore(tmp_path.joinpath("users.db"), 10, 100, clock)
+        for i in range(10):
+            # replacing existing users isn't counted
+            store.put([User(id=i, username=str(i)), User(id=i, username=str(i))])
+            store.put([User(id=i, username=str(i))])
+            clock.now += 1
+        assert len(store.get_by_ids(list(range(10)))) == 10
+
+        store.put([User(id=10, username="10")])
+        assert [u.id for u, _ in store.get_by_ids(list(range(11)))] == list(range(2, 11))
+
+        # the count survives reopening
+        store = DiskUserStore(tmp_path.joinpath("users.db"), 5, 100, clock)
+        assert [u.id for u, _ in store.get_by_ids(list(range(11)))] == [7, 8, 9, 10]
+
+
+class TestUserCache:
+    def test_memory_tier(self, clock):
+        cache = UserCache(10, 100, clock=clock)
+        cache.put([User(id=1, username="Foo")])
+
+        assert cache.get_by_ids([1, "2"]) == ({1: User(id=1)}, ["2"], frozenset())
+        hits, misses, _ = cache.get_by_usernames(["foo", "bar"])
+        assert list(hits) == ["foo"]
+        assert misses == ["bar"]
+
+    def test_disk_tier(self, tmp_path, clock):
+        disk = DiskUserStore(tmp_path.joinpath("users.db"), 10, 100, clock)
+        UserCache(10, 100, disk, clock).put([User(id=1, username="Foo")])
+
+        # another run with empty memory tier
+        cache = UserCache(10, 100, disk, clock)
+        assert cache.get_by_usernames(["FOO"])[0]["foo"] == User(id=1)
+        assert cache.get_by_ids([1]) == ({1: User(id=1)}, [], frozenset())
+
+    def test_partial_users_serve_lookups_needing_their_attributes(self, tmp_path, clock):
+        disk = DiskUserStore(tmp_path.joinpath("users.db"), 10, 100, clock)
+        memory = UserCache(10, 100, clock=clock)
+        for cache in [UserCache(10, 100, disk, clock), memory]:
+            cache.put([User(id=1, username="Foo")], frozenset({"followers_count", "created_at"}))
+
+        # served by the disk tier in another run, and by the memory tier
+        for cache in [UserCache(10, 100, disk, clock), memory]:
+            assert cache.get_by_ids([1], frozenset({"followers_count"}))[1] == []
+            assert cache.get_by_usernames(["foo"], frozenset())[1] == []
+            # the missed user's attributes are told, for querying them too
+            assert cache.get_by_ids([1], frozenset({"location"})) == ({}, [1], {"followers_count", "created_at"})
+            assert cache.get_by_ids([1])[1] == [1]
+
+    def test_disabled_by_settings(self, mock_configuration):
+        mock_configuration({"user_cache_ttl_hours": 0})
+        assert UserCache.from_settings() is None
+
+
+class TestMissingUserStore:
+    @pytest.fixture
+    def store(self, tmp_path, clock):
+        return MissingUserStore(tmp_path.joinpath("missing.db"), 100, clock)
+
+    def test_exclude_missing_users(self, store):
+        store.put("ids", ["2"])
+        store.put("usernames", ["Foo"])
+        assert store.exclude("ids", [1, 2, "3"]) == [1, "3"]
+        assert store.exclude("usernames", ["FOO", "bar", "2"]) == ["bar", "2"]
+
+    def test_expired_entries_are_ignored(self, store, clock):
+        store.put("ids", [1])
+        clock.now += 101
+        assert store.exclude("ids", [1]) == [1]
+
+    def test_disabled_by_settings(self, mock_configuration):
+        mock_configuration({"missing_user_cache_ttl_hours": 0})
+        assert MissingUserStore.from_settings() is None
+
+
+class TestRelationshipMirror:
+    @pytest.fixture
+    def mirror(self, tmp_path, clock):
+        return RelationshipMirror(tmp_path.joinpath("mirror.db"), 100, clock)
+
+    @staticmethod
+    def pages_of(*pages):
+        """Record how many pages are consumed."""
+        consumed = []
+
+        def gen():
+            for p in pages:
+                consumed.append(p)
+                yield [User(id=i) for i in p]
+
+        return gen(), consumed
+
+    def test_first_sync_loads_whole_list(self, mirror):
+        pages, consumed = self.pages_of([1])
+        users = mirror.sync("blocked", 0, lambda: [User(id=2), User(id=1)], pages)
+        assert [u.id for u in users] == [2, 1]
+        assert consumed == []
+
+    def test_stop_at_page_overlapping_known_users(self, mirror):
+        mirror.sync("blocked", 0, lambda: [User(id=2), User(id=1)], iter([]))
+        pages, consumed = self.pages_of([5, 4], [3, 2], [1])
+        users = mirror.sync("blocked", 0, MagicMock(), pages)
+        assert [u.id for u in users] == [5, 4, 3, 2, 1]
+        assert len(consumed) == 2
+        # new users are prepended once, keep the order on latter syncs
+        pages, _ = self.pages_of([5, 4])
+        assert [u.id for u in mirror.sync("blocked", 0, MagicMock(), pages)] == [5, 4, 3, 2, 1]
+
+    def test_reconcile_after_interval(self, mirror, clock):
+        mirror.sync("blocked", 0, lambda: [User(id=2), User(id=1)], iter([]))
+        clock.now += 101
+        users = mirror.sync("blocked", 0, lambda: [User(id=1)], iter([]))
+        assert [u.id for u in users] == [1]
+
+    def test_lists_are_separated(self, mirror):
+        mirror.sync("blocked", 0, lambda: [User(id=1)], iter([]))
+        assert [u.id for u in mirror.sync("follower", 0, lambda: [User(id=2)], iter([]))] == [2]
+        assert [u.id for u in mirror.sync("blocked", 1, lambda: [User(id=3)], iter([]))] == [3]
+
+    def test_list_sizes(self, mirror, clock):
+        mirror.sync("blocked", 0, lambda: [User(id=2), User(id=1)], iter([]))
+        mirror.sync("follower", 0, lambda: [User(id=3)], iter([]))
+        clock.now += 60
+        mirror.sync("follower", 1, lambda: [], iter([]))
+        assert mirror.list_sizes() == {"blocked": (2, True), "follower": (0, True)}
+
+        # the reconcile interval passed
+        clock.now += 100
+        assert mirror.list_sizes()["blocked"] == (2, False)
@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+import orjson
+import pytest
+import requests
+import tweepy
+
+from puntgun.cassette import (
+    Cassette,
+    CassetteMissError,
+    RecordingSession,
+    ReplayingSession,
+    request_key,
+)
+from puntgun.client import Client
+from puntgun.transport import build_http_session
+
+
+def fake_response(body: dict, status: int = 200) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "OK"
+    response.headers = requests.structures.CaseInsensitiveDict({"x-rate-limit-remaining": "899"})
+    response._content = orjson.dumps(body)
+    return response
+
+
+def tweepy_client_on(session: requests.Session) -> tweepy.Client:
+    clt = tweepy.Client(consumer_key="k", consumer_secret="s", access_token="t", access_token_secret="ts")
+    clt.session = session
+    return clt
+
+
+@pytest.fixture
+def cassette_file(tmp_path):
+    return tmp_path.joinpath("cassette.jsonl")
+
+
+def test_record_then_replay_without_network(cassette_file):
+    me = {"data": {"id": "1", "name": "me", "username": "me"}}
+    users = {"data": [{"id": "2", "name": "u", "username": "u", "public_metrics": {"followers_count": 3}}]}
+
+    with patch("requests.Session.request", side_effect=[fake_response(me), fake_response(users)]):
+        clt = Client(tweepy_client_on(RecordingSession(Cassette(cassette_file), 4, (1, 1))))
+        recorded = clt.get_users_by_ids([2])
+
+    with patch("requests.Session.request", side_effect=AssertionError("no network in replay mode")):
+        clt = Client(tweepy_client_on(ReplayingSession(Cassette(cassette_file).load())))
+        replayed = clt.get_users_by_ids([2])
+
+    assert clt.id == 1
+    assert replayed == recorded
+    assert replayed[0].followers_count == 3
+
+
+def test_replay_same_request_in_recorded_order(cassette_file):
+    cassette = Cassette(cassette_file)
+    key = request_key("GET", "https://api.twitter.com/2/users", {"ids": "1"})
+    cassette.record(key, fake_response({"data": [{"id": "1", "name": "old", "username": "old"}]}))
+    cassette.record(key, fake_response({"data": [{"id": "1", "name": "new", "username": "new"}]}))
+
+    cassette = Cassette(cassette_file).load()
+    names = [cassette.play(key, "").json()["data"][0]["name"] for _ in range(3)]
+    assert names == ["old", "new", "new"]
+
+
+def test_auth_headers_are_not_part_of_the_key():
+    assert request_key("get", "u", {"a": 1}) == request_key("GET", "u", {"a": "1"})
+    assert request_key("GET", "u", {"a": 1}) != request_key("GET", "u", {"a": 2})
+
+
+def test_keys_are_normalised_with_base_url(cassette_file):
+    key = request_key("GET", "https://api.twitter.com/2/users", {"ids": "1"})
+    assert request_key("GET", "http://127.0.0.1:8000/2/users", {"ids": "1"}, base_url="http://127.0.0.1:8000/") == key
+
+    # recorded against the stand-in server, the request is sent to it
+    with patch("requests.Session.request", return_value=fake_response({"data": []})) as send:
+        session = RecordingSession(Cassette(cassette_file), 4, (1, 1), "http://127.0.0.1:8000")
+        session.request("GET", "https://api.twitter.com/2/users", params={"ids": "1"})
+    assert send.call_args.args[1] == "http://127.0.0.1:8000/2/users"
+
+    # and replayed with or without the base URL
+    for base_url in [None, "http://localhost:9000"]:
+        replaying = ReplayingSession(Cassette(cassette_file).load(), base_url)
+        assert replaying.request("GET", "https://api.twitter.com/2/users", params={"ids": "1"}).json() == {"data": []}
+        # params given by position and bytes method or url are keyed the same
+        assert replaying.request(b"GET", b"https://api.twitter.com/2/users", {"ids": "1"}).json() == {"data": []}
+
+
+def test_missed_request(cassette_file):
+    cassette_file.touch()
+    with pytest.raises(CassetteMissError):
+        ReplayingSession(Cassette(cassette_file).load()).request("GET", "https://api.twitter.com/2/users/me")
+
+
+def test_build_session_by_mode(mock_configuration, cassette_file):
+    mock_configuration({"cassette_mode": False})
+    assert not isinstance(build_http_session(), (RecordingSession, ReplayingSession))
+    cassette_file.touch()
+    mock_configuration({"cassette_mode": "replay", "cassette_file": str(cassette_file)})
+    assert isinstance(build_http_session(), ReplayingSession)
+    mock_configuration({"cassette_mode": "record", "cassette_file": str(cassette_file)})
+    assert isinstance(build_http_session(), RecordingSession)
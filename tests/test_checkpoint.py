@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock
+
+import pytest
+import tweepy
+
+from puntgun.checkpoint import PagingCheckpoint
+from puntgun.client import iter_checkpointed_user_api
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def checkpoint(tmp_path, clock):
+    return PagingCheckpoint(tmp_path.joinpath("follower_1.jsonl"), 100, clock)
+
+
+def response_with(data, next_token=None):
+    return tweepy.Response(data=data, includes={}, errors=[], meta={"next_token": next_token} if next_token else {})
+
+
+def test_no_checkpoint_starts_from_first_page(checkpoint):
+    assert checkpoint.load() == ([], None)
+
+
+def test_load_saved_pages_and_next_token(checkpoint):
+    checkpoint.append([{"id": 0}], "t0")
+    checkpoint.append([{"id": 1}, {"id": 2}], "t1")
+    assert checkpoint.load() == ([[{"id": 0}], [{"id": 1}, {"id": 2}]], "t1")
+
+
+def test_expired_checkpoint_is_dropped(checkpoint, clock):
+    checkpoint.append([{"id": 0}], "t0")
+    clock.now += 101
+    assert checkpoint.load() == ([], None)
+    assert not checkpoint.file.exists()
+
+
+def test_finished_checkpoint_is_dropped(checkpoint):
+    checkpoint.append([{"id": 0}], None)
+    assert checkpoint.load() == ([], None)
+
+
+@pytest.mark.parametrize("tail", [b'{"entities": [{"id": 2}], "next_', b'{"entities": [], "next_token": "t2"}'])
+def test_truncated_last_page_is_dropped(checkpoint, tail):
+    checkpoint.append([{"id": 0}], "t0")
+    checkpoint.append([{"id": 1}], "t1")
+    # crashed while writing the third page
+    with open(checkpoint.file, "ab") as f:
+        f.write(tail)
+
+    assert checkpoint.load() == ([[{"id": 0}], [{"id": 1}]], "t1")
+    # later pages are appended after the last complete one
+    checkpoint.append([{"id": 2}], "t2")
+    assert checkpoint.load() == ([[{"id": 0}], [{"id": 1}], [{"id": 2}]], "t2")
+
+
+def test_continue_pagination_after_interruption(checkpoint):
+    clt_func = MagicMock(side_effect=[response_with([{"id": 0}], "t0"), RuntimeError("crash")])
+    users = iter_checkpointed_user_api(clt_func, checkpoint, id=1)
+    with pytest.raises(RuntimeError):
+        list(users)
+
+    # the next run only queries pages after the saved one
+    clt_func = MagicMock(side_effect=[response_with([{"id": 1}], "t1"), response_with([{"id": 2}])])
+    assert [u.id for u in iter_checkpointed_user_api(clt_func, checkpoint, id=1)] == [0, 1, 2]
+    assert clt_func.call_count == 2
+    assert clt_func.call_args_list[0].kwargs["pagination_token"] == "t0"
+    # removed after the last page
+    assert not checkpoint.file.exists()
+
+
+def test_checkpoint_disabled_by_default(mock_configuration):
+    mock_configuration({})
+    assert PagingCheckpoint.from_settings("blocked_1") is None
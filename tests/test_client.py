@@ -1,21 +1,45 @@
+import asyncio
 import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
+import orjson
 import pytest
+import requests
 import tweepy
 from hamcrest import assert_that, contains_string
+from reactivex import operators as op
 
+from puntgun.cache import MissingUserStore, UserCache
 from puntgun.client import (
+    RATE_LIMITS,
+    USER_API_PARAMS,
+    AsyncClient,
     Client,
+    ClientPool,
+    DeadLetter,
+    RateLimitScheduler,
+    RawResponse,
+    RelationshipIndex,
     ResourceNotFoundError,
+    RetryPolicy,
     TwitterApiErrors,
     TwitterClientError,
+    decode_raw_response,
+    is_fatal,
+    isolate_failure,
     paged_api_iter,
     response_to_tweets,
     response_to_users,
+    user_api_params,
 )
+from puntgun.ledger import PlanTweetCap, TweetCapLedger
 from puntgun.record import Record
+from puntgun.rules.base import Plan
+from puntgun.rules.config_parser import ConfigParser
 from puntgun.rules.data import (
     ContextAnnotation,
     Place,
@@ -149,6 +173,143 @@ class TestUserQuerying:
         assert_that(str(e), contains_string("100"))
 
 
+class TestCachedUserQuerying:
+    def test_only_query_missed_users(self, mock_tweepy_client):
+        mock_get_users = MagicMock(
+            side_effect=[response_with(data=[{"id": 1, "username": "a"}]), response_with(data=[{"id": 2}])]
+        )
+        mock_tweepy_client.get_users = mock_get_users
+        clt = Client(mock_tweepy_client, user_cache=UserCache(10, 100))
+
+        assert [u.id for u in clt.get_users_by_ids([1])] == [1]
+        # user 1 is served from the cache, keep the order of given ids
+        assert [u.id for u in clt.get_users_by_ids(["2", 1])] == [2, 1]
+        assert mock_get_users.call_args_list[1][1]["ids"] == ["2"]
+        # cached by username too, no more query
+        assert [u.id for u in clt.get_users_by_usernames(["A"])] == [1]
+        assert mock_get_users.call_count == 2
+
+
+class TestLookupPartialErrors:
+    @staticmethod
+    def error(value, problem, title="Not Found Error"):
+        return {"value": value, "title": title, "type": f"https://api.twitter.com/2/problems/{problem}"}
+
+    def test_remember_missing_users(self, mock_tweepy_client, tmp_path):
+        mock_get_users = MagicMock(
+            return_value=response_with(
+                data=[{"id": 1}],
+                errors=[
+                    self.error("2", "resource-not-found"),
+                    self.error("3", "resource-not-found", title="Forbidden"),
+                ],
+            )
+        )
+        mock_tweepy_client.get_users = mock_get_users
+        clt = Client(mock_tweepy_client, missing_users=MissingUserStore(tmp_path.joinpath("m.db"), 100))
+
+        assert [u.id for u in clt.get_users_by_ids([1, 2, 3])] == [1]
+        # deleted and suspended users aren't queried again
+        mock_get_users.return_value = response_with(data=[{"id": 4}])
+        assert [u.id for u in clt.get_users_by_ids(["2", 3, 4])] == [4]
+        assert mock_get_users.call_args.kwargs["ids"] == [4]
+        # nothing left to query
+        assert clt.get_users_by_ids([2, 3]) == []
+        assert mock_get_users.call_count == 2
+
+    def test_only_query_users_failed_transiently_again(self, mock_tweepy_client):
+        mock_get_users = MagicMock(
+            side_effect=[
+                response_with(
+                    data=[{"id": 1, "username": "a"}],
+                    errors=[self.error("B", "resource-unavailable", "Service Unavailable")],
+                ),
+                response_with(data=[{"id": 2, "username": "b"}]),
+            ]
+        )
+        mock_tweepy_client.get_users = mock_get_users
+        clt = Client(mock_tweepy_client, retry=RetryPolicy(sleep=MagicMock()))
+
+        assert [u.id for u in clt.get_users_by_usernames(["a", "b"])] == [1, 2]
+        assert mock_get_users.call_args.kwargs["usernames"] == ["b"]
+
+    def test_give_up_after_attempts(self, mock_tweepy_client):
+        mock_get_users = MagicMock(
+            return_value=response_with(errors=[self.error("1", "resource-unavailable", "Service Unavailable")])
+        )
+        mock_tweepy_client.get_users = mock_get_users
+        clt = Client(mock_tweepy_client, retry=RetryPolicy(attempts=2, sleep=MagicMock()))
+
+        assert clt.get_users_by_ids([1]) == []
+        assert mock_get_users.call_count == 2
+
+
+class TestFieldProjection:
+    def test_only_query_needed_fields(self, mock_tweepy_client, normal_user_response):
+        mock_get_users = MagicMock(return_value=normal_user_response)
+        mock_tweepy_client.get_users = mock_get_users
+        Client(mock_tweepy_client).get_users_by_ids([1], fields={"followers_count"})
+
+        params = mock_get_users.call_args.kwargs
+        # relationships of looked up users are always requested
+        assert params["user_fields"] == ["id", "name", "public_metrics", "username", "connection_status"]
+        assert "expansions" not in params and "tweet_fields" not in params
+
+    def test_pinned_tweet_text_needs_expansion(self):
+        params = user_api_params({"pinned_tweet_text", "description"})
+        assert params["expansions"] == "pinned_tweet_id"
+        assert params["tweet_fields"] == ["text"]
+        assert "description" in params["user_fields"]
+
+    def test_unknown_attributes_query_all_fields(self):
+        assert user_api_params(None) is USER_API_PARAMS
+        assert user_api_params({"not_a_user_attribute"}) is USER_API_PARAMS
+
+    def test_partial_users_are_cached_with_their_fields(self, mock_tweepy_client, normal_user_response):
+        mock_get_users = MagicMock(return_value=normal_user_response)
+        mock_tweepy_client.get_users = mock_get_users
+        clt = Client(mock_tweepy_client, user_cache=UserCache(10, 100))
+
+        clt.get_users_by_ids([1], fields={"followers_count"})
+        clt.get_users_by_ids([1], fields={"following_count"})
+        assert mock_get_users.call_count == 1
+
+        # queried with the cached fields too
+        clt.get_users_by_ids([1], fields={"created_at"})
+        assert mock_get_users.call_args.kwargs["user_fields"] == [
+            "created_at",
+            "id",
+            "name",
+            "public_metrics",
+            "username",
+            "connection_status",
+        ]
+        clt.get_users_by_ids([1], fields={"followers_count"})
+        assert mock_get_users.call_count == 2
+
+        clt.get_users_by_ids([1])
+        assert mock_get_users.call_args.kwargs["user_fields"][:-1] == USER_API_PARAMS["user_fields"]
+        clt.get_users_by_ids([1], fields={"location"})
+        assert mock_get_users.call_count == 3
+
+    def test_projected_plan_fills_the_cache(self, monkeypatch, mock_tweepy_client, normal_user_response):
+        mock_get_users = MagicMock(return_value=normal_user_response)
+        mock_tweepy_client.get_users = mock_get_users
+        clt = Client(mock_tweepy_client, user_cache=UserCache(10, 100))
+        monkeypatch.setattr("puntgun.client.ClientPool.singleton", lambda: clt)
+        plan = ConfigParser.parse(
+            {"user_plan": "plan", "from": [{"ids": [1]}], "that": [{"follower_less_than": 10}], "do": [{"block": {}}]},
+            Plan,
+        )
+
+        for _ in range(2):
+            assert [u.id for u in plan.sources().pipe(op.to_list()).run()] == [normal_user_response.data[0]["id"]]
+        # the plan only requests the fields its filter reads
+        assert "created_at" not in mock_get_users.call_args.kwargs["user_fields"]
+        # and the second lookup is a cache hit
+        assert mock_get_users.call_count == 1
+
+
 class TestPagedApiIter:
     def test_paged_api_querier(self):
         mock_clt_func = MagicMock(
@@ -169,6 +330,34 @@ class TestPagedApiIter:
         for i in range(1, 3):
             assert mock_clt_func.call_args_list[i] == mock.call(max_results=1000, a="b", pagination_token=i - 1)
 
+    def test_prefetch_next_page(self):
+        mock_clt_func = MagicMock(
+            side_effect=[
+                response_with(meta={"next_token": 0}, data=[{"k": 0}]),
+                response_with(meta={"next_token": 1}, data=[{"k": 1}]),
+                response_with(data=[{"k": 2}]),
+            ]
+        )
+        pages = paged_api_iter(mock_clt_func, {}, prefetch=True)
+        assert next(pages).data[0]["k"] == 0
+        # the second page has been queried before the caller asks for it
+        time.sleep(0.1)
+        assert mock_clt_func.call_count == 2
+        assert [p.data[0]["k"] for p in pages] == [1, 2]
+        assert mock_clt_func.call_count == 3
+
+    def test_stream_entities_page_by_page(self, mock_tweepy_client):
+        mock_get_users_followers = MagicMock(
+            side_effect=[response_with(meta={"next_token": 0}, data=[{"id": 0}]), response_with(data=[{"id": 1}])]
+        )
+        mock_tweepy_client.get_users_followers = mock_get_users_followers
+        followers = Client(mock_tweepy_client).iter_follower(1)
+        # lazy, nothing is queried until consumed
+        assert mock_get_users_followers.call_count == 0
+        assert next(followers).id == 0
+        assert mock_get_users_followers.call_count == 1
+        assert [u.id for u in followers] == [1]
+
     def test_paged_api_querier_with_one_page(self):
         mock_clt_func = MagicMock(return_value=response_with(data=[{"k": 0}]))
         actual = list(paged_api_iter(mock_clt_func, {}))
@@ -189,6 +378,27 @@ class TestPagedUserApi:
             # check user id
             assert id_list[i] == i
 
+    def test_concurrent_callers_download_blocked_list_once(self, mock_tweepy_client):
+        release = threading.Event()
+
+        def get_blocked(**kwargs):
+            release.wait(5)
+            return response_with(data=[{"id": 0}])
+
+        mock_get_blocked = MagicMock(side_effect=get_blocked)
+        mock_get_blocked.__name__ = "mock_get_blocked_func"
+        mock_tweepy_client.get_blocked = mock_get_blocked
+        client = Client(mock_tweepy_client)
+
+        with ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(client.cached_blocked_id_list) for _ in range(8)]
+            release.set()
+            assert all(f.result() == [0] for f in futures)
+        assert mock_get_blocked.call_count == 1
+
+        client.cached_blocked.refresh()
+        assert mock_get_blocked.call_count == 2
+
     def test_get_following(self, mock_tweepy_client):
         mock_tweepy_client.get_users_following = MagicMock(
             side_effect=[response_with(meta={"next_token": 0}, data=[{"id": 0}]), response_with(data=[{"id": 1}])]
@@ -226,6 +436,42 @@ class TestPagedUserApi:
             assert users[i].id == i
 
 
+class TestRelationshipIndex:
+    def test_checks_do_not_wait_for_other_downloads(self):
+        downloading, release = threading.Event(), threading.Event()
+
+        def slow_follower_list():
+            downloading.set()
+            assert release.wait(5)
+            return [User(id=1)]
+
+        blocked = [User(id=0)]
+        index = RelationshipIndex({"blocked": lambda: blocked, "follower": slow_follower_list})
+        assert index.contains("blocked", 0)
+        with ThreadPoolExecutor(1) as pool:
+            follower = pool.submit(index.contains, "follower", 2)
+            downloading.wait(5)
+            # the loaded set and changes are available during the download
+            assert index.contains("blocked", 0)
+            index.add("blocked", 3)
+            index.add("follower", 2)
+            release.set()
+            # the change made during the download is applied on publishing
+            assert follower.result(5)
+        assert index.contains("blocked", 3)
+
+    def test_follow_refreshed_snapshots(self, mock_tweepy_client):
+        mock_tweepy_client.get_blocked = MagicMock(
+            side_effect=[response_with(data=[{"id": 0}]), response_with(data=[{"id": 1}])]
+        )
+        clt = Client(mock_tweepy_client)
+        assert clt.relationships.contains("blocked", 0)
+
+        clt.cached_blocked.refresh()
+        assert clt.relationships.contains("blocked", 1)
+        assert not clt.relationships.contains("blocked", 0)
+
+
 class TestUserBlocking:
     def test_api_response_success(self, mock_tweepy_client):
         mock_tweepy_client.block = MagicMock(return_value=response_with({"blocking": True}))
@@ -242,6 +488,47 @@ class TestUserBlocking:
 
         assert Client(mock_tweepy_client).block_user_by_id(0)
 
+    def test_already_blocked_by_former_call(self, mock_tweepy_client):
+        mock_tweepy_client.get_blocked = MagicMock(return_value=response_with(data=[]))
+        mock_block = MagicMock(return_value=response_with({"blocking": True}))
+        mock_tweepy_client.block = mock_block
+        clt = Client(mock_tweepy_client)
+
+        assert clt.block_user_by_id(123)
+        # ids in string are the same users
+        assert clt.block_user_by_id("123")
+        assert mock_block.call_count == 1
+        assert clt.relationships.contains("blocked", "123")
+        assert not clt.relationships.contains("blocked", 1)
+
+    def test_decide_with_connection_status(self, mock_tweepy_client, mock_configuration):
+        mock_configuration({"block_follower": False})
+        mock_get_blocked = MagicMock(return_value=response_with(data=[]))
+        mock_tweepy_client.get_blocked = mock_get_blocked
+        mock_tweepy_client.get_users_followers = mock_get_followers = MagicMock()
+        mock_tweepy_client.block = mock_block = MagicMock(return_value=response_with({"blocking": True}))
+        clt = Client(mock_tweepy_client)
+
+        assert clt.block_user_by_id(1, ["blocking"])
+        assert not clt.block_user_by_id(2, ["followed_by", "following"])
+        assert clt.block_user_by_id(3, [])
+        # blocked just now, the status queried before is outdated
+        assert clt.block_user_by_id(3, [])
+        assert mock_block.call_count == 1
+        # no relationship list is downloaded
+        mock_get_blocked.assert_not_called()
+        mock_get_followers.assert_not_called()
+        # but blocked users are known after loading the list
+        assert clt.relationships.contains("blocked", 3)
+
+    def test_connection_status_from_lookups(self, mock_tweepy_client):
+        mock_tweepy_client.get_users = MagicMock(
+            return_value=response_with(data=[{"id": 1, "connection_status": ["following"]}, {"id": 2}])
+        )
+        users = Client(mock_tweepy_client).get_users_by_ids([1, 2])
+        # absent field means no relationship
+        assert [u.connection_status for u in users] == [["following"], []]
+
     def test_not_block_following(self, mock_tweepy_client, mock_configuration):
         # mock user 0 is follower
         mock_tweepy_client.get_users_following = MagicMock(return_value=response_with(data=[{"id": 0}]))
@@ -261,6 +548,302 @@ class TestUserBlocking:
         assert not Client(mock_tweepy_client).block_user_by_id(0)
 
 
+class TestAsyncClient:
+    """The coroutines go through the same :class:`Client` methods."""
+
+    def test_get_users(self, mock_user_getting_tweepy_client, normal_user_response):
+        clt = AsyncClient(Client(mock_user_getting_tweepy_client(normal_user_response)), max_workers=2)
+
+        async def run():
+            return await asyncio.gather(*[clt.get_users_by_ids([1]) for _ in range(20)])
+
+        results = asyncio.run(run())
+        assert len(results) == 20
+        assert_normal_user(results[0][0])
+
+    def test_tweepy_exception_handling(self, mock_tweepy_client):
+        mock_tweepy_client.get_users = MagicMock(side_effect=tweepy.errors.TweepyException("inner"))
+        clt = AsyncClient(Client(mock_tweepy_client))
+
+        with pytest.raises(TwitterClientError) as e:
+            asyncio.run(clt.get_users_by_ids([1]))
+        assert_that(str(e.value.__cause__), contains_string("inner"))
+
+    def test_wait_for_rate_limit_on_event_loop(self, mock_user_getting_tweepy_client, normal_user_response):
+        slept_in_thread = []
+        scheduler = RateLimitScheduler({"get_users": (1, 60)}, sleep=slept_in_thread.append)
+        loop_sleep = AsyncMock()
+        clt = AsyncClient(Client(mock_user_getting_tweepy_client(normal_user_response), scheduler), sleep=loop_sleep)
+
+        asyncio.run(clt.get_users_by_ids([1]))
+        loop_sleep.assert_not_awaited()
+        asyncio.run(clt.get_users_by_ids([1]))
+        assert loop_sleep.await_args.args[0] == pytest.approx(60, abs=1)
+
+    def test_block_shares_relationship_index(self, mock_tweepy_client):
+        mock_tweepy_client.get_blocked = mock_get_blocked = MagicMock(return_value=response_with(data=[{"id": 0}]))
+        mock_tweepy_client.block = mock_block = MagicMock(return_value=response_with({"blocking": True}))
+        client = Client(mock_tweepy_client)
+        clt = AsyncClient(client)
+
+        async def run():
+            return await asyncio.gather(clt.block_user_by_id(0), clt.block_user_by_id(1))
+
+        assert asyncio.run(run()) == [True, True]
+        assert mock_block.call_count == 1
+        mock_get_blocked.assert_called_once()
+        # blocked through the facade, known by the blocking client too
+        assert client.block_user_by_id(1)
+        assert mock_block.call_count == 1
+
+
+class TestClientPool:
+    @staticmethod
+    def rate_limited_error(reset_after=100):
+        response = MagicMock(headers={"x-rate-limit-reset": str(datetime.datetime.now().timestamp() + reset_after)})
+        try:
+            raise tweepy.errors.TooManyRequests(response)
+        except tweepy.errors.TooManyRequests as cause:
+            error = TwitterClientError()
+            error.__cause__ = cause
+            return error
+
+    def test_reads_are_balanced_among_clients(self):
+        owner, reader = MagicMock(), MagicMock()
+        pool = ClientPool(owner, [reader])
+        for _ in range(4):
+            pool.get_tweets_by_ids([1])
+        assert owner.get_tweets_by_ids.call_count == reader.get_tweets_by_ids.call_count == 2
+
+    def test_users_lookups_use_owner_quota_first(self, monkeypatch):
+        monkeypatch.setitem(RATE_LIMITS, "get_users", (2, 15 * 60))
+        owner, reader = MagicMock(), MagicMock()
+        pool = ClientPool(owner, [reader])
+        # the owner's lookups tell relationships, blocking the users needn't download relationship lists
+        for _ in range(3):
+            pool.get_users_by_ids([1])
+        assert owner.get_users_by_ids.call_count == 2
+        # readers' lookups don't, they are only used when the owner's quota is used up
+        assert reader.get_users_by_ids.call_count == 1
+        assert reader.lookup_connection_status is False
+
+    def test_fail_over_when_hit_rate_limit(self):
+        owner, reader = MagicMock(), MagicMock()
+        owner.get_users_by_usernames = MagicMock(side_effect=self.rate_limited_error())
+        reader.get_users_by_usernames = MagicMock(return_value=[User(id=1)])
+        pool = ClientPool(owner, [reader])
+
+        assert pool.get_users_by_usernames(["a"]) == [User(id=1)]
+        assert pool.get_users_by_usernames(["b"]) == [User(id=1)]
+        # the rate limited owner client isn't chosen again before the limit resets
+        assert owner.get_users_by_usernames.call_count == 1
+        assert reader.get_users_by_usernames.call_count == 2
+
+    def test_wait_when_all_clients_hit_rate_limit(self):
+        # only the pool's own waits are counted, not sleeps of other threads
+        mock_sleep = MagicMock(side_effect=time.sleep)
+        owner = MagicMock()
+        owner.get_tweets_by_ids = MagicMock(side_effect=[self.rate_limited_error(reset_after=0.1), []])
+
+        assert ClientPool(owner, [], sleep=mock_sleep).get_tweets_by_ids([1]) == []
+        mock_sleep.assert_called_once()
+
+    def test_other_errors_are_raised(self):
+        owner = MagicMock()
+        owner.get_users_by_ids = MagicMock(side_effect=TwitterClientError())
+        with pytest.raises(TwitterClientError):
+            ClientPool(owner, [MagicMock()]).get_users_by_ids([1])
+
+    def test_readers_do_not_query_relationships(self):
+        owner, reader = MagicMock(), MagicMock()
+        ClientPool(owner, [reader])
+        assert reader.lookup_connection_status is False
+        assert owner.lookup_connection_status is not False
+
+    def test_writes_are_pinned_to_owner(self):
+        owner, reader = MagicMock(), MagicMock()
+        pool = ClientPool(owner, [reader])
+        pool.block_user_by_id(1)
+        pool.cached_blocked()
+        owner.block_user_by_id.assert_called_once_with(1)
+        owner.cached_blocked.assert_called_once()
+        reader.block_user_by_id.assert_not_called()
+
+    def test_singleton_without_extra_credentials_is_the_client(self, mock_client, mock_configuration):
+        # plaintext credentials in settings are ignored
+        mock_configuration({"extra_credentials": [{"ak": "1", "aks": "2", "at": "3", "ats": "4"}]})
+        assert ClientPool.singleton() is mock_client
+
+    def test_extra_credentials_are_loaded_from_secrets(self, monkeypatch, tmp_path, mock_configuration):
+        mock_configuration({"extra_credentials_count": 1})
+        monkeypatch.setattr("puntgun.conf.config.config_path", tmp_path)
+        extra = {"ak": "1", "aks": "2", "at": "3", "ats": "4"}
+        monkeypatch.setattr("puntgun.client.load_secrets", lambda: {"ak": "a", "extra_credentials": [extra]})
+        clients = MagicMock()
+        monkeypatch.setattr("puntgun.client.Client", clients)
+        monkeypatch.setattr("puntgun.client.ClientPool._pool_singleton", ClientPool._pool_singleton.__wrapped__)
+
+        pool = ClientPool.singleton()
+        assert pool.owner is clients.singleton.return_value
+        assert clients.call_args.args[0].access_token == "3"
+        # tweets read by the reader are counted in the reader token's cap
+        assert isinstance(clients.call_args.kwargs["tweet_caps"], TweetCapLedger)
+
+
+class TestRateLimitScheduler:
+    @pytest.fixture
+    def fake_clock(self):
+        """A clock that only moves forward when someone sleeps."""
+
+        class FakeClock:
+            now = 1000.0
+            slept = []
+
+            def time(self):
+                return self.now
+
+            def sleep(self, seconds):
+                self.slept.append(seconds)
+                self.now += seconds
+
+        return FakeClock()
+
+    def test_calls_within_budget_do_not_wait(self, fake_clock):
+        scheduler = RateLimitScheduler({"e": (3, 60)}, clock=fake_clock.time, sleep=fake_clock.sleep)
+        for _ in range(3):
+            scheduler.acquire("e")
+        assert fake_clock.slept == []
+
+    def test_queue_callers_after_budget_used_up(self, fake_clock):
+        scheduler = RateLimitScheduler({"e": (2, 60)}, clock=fake_clock.time, sleep=fake_clock.sleep)
+        scheduler.acquire("e")
+        fake_clock.now += 10
+        scheduler.acquire("e")
+        # the third call waits until the first token comes back
+        assert scheduler.next_slot_at("e") == datetime.datetime.fromtimestamp(1060)
+        scheduler.acquire("e")
+        assert fake_clock.slept == [50]
+        # the fourth waits for the second token
+        scheduler.acquire("e")
+        assert fake_clock.slept == [50, 10]
+
+    def test_not_metered_endpoint(self, fake_clock):
+        scheduler = RateLimitScheduler({}, clock=fake_clock.time, sleep=fake_clock.sleep)
+        for _ in range(1000):
+            scheduler.acquire("whatever")
+        assert fake_clock.slept == []
+        assert scheduler.next_slot_at("whatever") == datetime.datetime.fromtimestamp(fake_clock.now)
+
+    def test_client_methods_are_metered(self, fake_clock, mock_user_getting_tweepy_client, normal_user_response):
+        scheduler = RateLimitScheduler({"get_users": (1, 60)}, clock=fake_clock.time, sleep=fake_clock.sleep)
+        clt = Client(mock_user_getting_tweepy_client(normal_user_response), scheduler)
+        clt.get_users_by_ids([1])
+        clt.get_users_by_ids([1])
+        assert fake_clock.slept == [60]
+        assert clt.next_slot_at("get_users") == datetime.datetime.fromtimestamp(fake_clock.now + 60)
+
+    def test_user_lookups_by_ids_and_usernames_are_metered_separately(
+        self, fake_clock, mock_user_getting_tweepy_client, normal_user_response
+    ):
+        scheduler = RateLimitScheduler(
+            {"get_users": (1, 60), "get_users_by": (1, 60)}, clock=fake_clock.time, sleep=fake_clock.sleep
+        )
+        clt = Client(mock_user_getting_tweepy_client(normal_user_response), scheduler)
+        clt.get_users_by_ids([1])
+        clt.get_users_by_usernames(["a"])
+        assert fake_clock.slept == []
+        clt.get_users_by_usernames(["a"])
+        assert fake_clock.slept == [60]
+        assert clt.next_slot_at("get_users") == datetime.datetime.fromtimestamp(fake_clock.now)
+        assert clt.next_slot_at("get_users_by") == datetime.datetime.fromtimestamp(fake_clock.now + 60)
+
+
+class TestRetryPolicy:
+    @staticmethod
+    def error(error_type, status, headers=None):
+        return error_type(MagicMock(status_code=status, headers=headers or {}))
+
+    @pytest.fixture
+    def slept(self):
+        return []
+
+    @pytest.fixture
+    def policy(self, slept):
+        # no jitter for verifying delays
+        return RetryPolicy(
+            attempts=4, base_delay=1, max_delay=3, clock=lambda: 1000, sleep=slept.append, rand=lambda: 1
+        )
+
+    def test_retry_transient_errors_with_backoff(self, policy, slept):
+        func = MagicMock(
+            side_effect=[
+                self.error(tweepy.errors.TwitterServerError, 503),
+                requests.ConnectionError(),
+                requests.Timeout(),
+                "ok",
+            ]
+        )
+        assert policy.retrying("get_users", func)() == "ok"
+        # capped by the max delay
+        assert slept == [1, 2, 3]
+
+    def test_give_up_after_attempts(self, policy, slept):
+        error = self.error(tweepy.errors.TwitterServerError, 500)
+        func = MagicMock(side_effect=error)
+        with pytest.raises(tweepy.errors.TwitterServerError):
+            policy.retrying("get_users", func)()
+        assert func.call_count == 4
+
+    def test_do_not_retry_fatal_errors(self, policy, slept):
+        for error in [self.error(tweepy.errors.Unauthorized, 401), self.error(tweepy.errors.BadRequest, 400)]:
+            func = MagicMock(side_effect=error)
+            with pytest.raises(type(error)):
+                policy.retrying("get_users", func)()
+            assert func.call_count == 1
+        assert slept == []
+
+    def test_wait_for_rate_limit_reset(self, policy, slept):
+        error = self.error(tweepy.errors.TooManyRequests, 429, {"x-rate-limit-reset": "1060"})
+        assert policy.retrying("block", MagicMock(side_effect=[error, True]))()
+        assert slept == [61]
+
+        # the client pool fails over instead
+        policy.retry_rate_limited = False
+        with pytest.raises(tweepy.errors.TooManyRequests):
+            policy.retrying("block", MagicMock(side_effect=error))()
+
+    def test_client_retries_before_raising(self, mock_tweepy_client, normal_user_response, slept):
+        mock_tweepy_client.get_users = MagicMock(
+            side_effect=[self.error(tweepy.errors.TwitterServerError, 503), normal_user_response]
+        )
+        clt = Client(mock_tweepy_client, retry=RetryPolicy(sleep=slept.append))
+        assert clt.get_users_by_ids([1])[0].id == 1
+        assert len(slept) == 1
+
+        mock_tweepy_client.get_users = MagicMock(side_effect=self.error(tweepy.errors.TwitterServerError, 503))
+        clt = Client(mock_tweepy_client, retry=RetryPolicy(attempts=2, sleep=slept.append))
+        with pytest.raises(TwitterClientError) as e:
+            clt.get_users_by_ids([1])
+        assert not is_fatal(e.value)
+
+    def test_isolate_failure(self, monkeypatch):
+        recorded = []
+        monkeypatch.setattr("puntgun.client.Recorder.record", recorded.append)
+
+        def query(ids, fields=None):
+            raise TwitterClientError() from self.error(tweepy.errors.BadRequest, 400)
+
+        assert isolate_failure("get_users_by_ids", query, list)([1, 2], fields={"b", "a"}) == []
+        assert recorded[0].to_record().data["query_params"] == {"args": [[1, 2]], "fields": ["a", "b"]}
+        assert DeadLetter.parse_from_record(recorded[0].to_record()).query_func_name == "get_users_by_ids"
+
+        def unauthorized():
+            raise TwitterClientError() from self.error(tweepy.errors.Unauthorized, 401)
+
+        with pytest.raises(TwitterClientError):
+            isolate_failure("get_me", unauthorized, list)()
+
+
 class TestTweetQuerying:
     """
     The structural complexity and content diversity of Tweet entity is far exceeds that of User entity,
@@ -275,6 +858,19 @@ class TestTweetQuerying:
     def test_response_transformation(self, full_tweet_response):
         assert_full_tweet(response_to_tweets(full_tweet_response)[0])
 
+    def test_join_includes_of_many_tweets(self):
+        """Every tweet gets its own includes, and several references of the same type are all kept."""
+        referenced = [dict(basic_tweet_data, id=i, text=str(i)) for i in range(3, 6)]
+        data = [
+            dict(basic_tweet_data, id=i, referenced_tweets=[{"id": str(i + 3), "type": "quoted"}]) for i in range(3)
+        ]
+        data[0]["referenced_tweets"] = [{"id": "4", "type": "quoted"}, {"id": "5", "type": "quoted"}]
+        tweets = response_to_tweets(response_with(data=data, includes={"tweets": referenced}))
+
+        assert [t.id for t in tweets[0].related_tweets["quoted"]] == [4, 5]
+        assert tweets[1].related_tweets["quoted"][0].text == "4"
+        assert tweets[2].related_tweets["quoted"][0].text == "5"
+
     def test_get_basic_fields_tweet(self, mock_tweet_getting_tweepy_client, basic_tweet_response):
         """Test if Tweet DTO can convert None values into default values."""
         assert_basic_tweet(Client(mock_tweet_getting_tweepy_client(basic_tweet_response)).get_tweets_by_ids([1])[0])
@@ -284,6 +880,147 @@ class TestTweetQuerying:
         assert_full_tweet(Client(mock_tweet_getting_tweepy_client(full_tweet_response)).get_tweets_by_ids([1])[0])
 
 
+class TestTweetSearching:
+    @pytest.fixture(autouse=True)
+    def no_plan_cap(self):
+        PlanTweetCap.start(None)
+        yield
+        PlanTweetCap.start(None)
+
+    @staticmethod
+    def pages(*sizes):
+        """Responses of searching, each page has "size" tweets and all pages but the last have next token."""
+        return [
+            response_with(
+                data=[dict(basic_tweet_data, id=i) for i in range(size)],
+                meta={"next_token": str(n)} if n < len(sizes) - 1 else {},
+            )
+            for n, size in enumerate(sizes)
+        ]
+
+    def test_query_until_the_last_page(self, mock_tweepy_client):
+        mock_search = mock_tweepy_client.search_recent_tweets = MagicMock(side_effect=self.pages(100, 100, 5))
+        tweets = Client(mock_tweepy_client).search_tweets("puntgun")
+
+        assert len(tweets) == 205
+        assert [c.kwargs["next_token"] for c in mock_search.call_args_list] == [None, "0", "1"]
+        assert mock_search.call_args.kwargs["query"] == "puntgun"
+        assert mock_search.call_args.kwargs["sort_order"] == "recency"
+
+    def test_query_hundreds_number_pages(self, mock_tweepy_client):
+        mock_tweepy_client.search_recent_tweets = MagicMock(side_effect=self.pages(100, 100, 100))
+        assert len(Client(mock_tweepy_client).search_tweets("puntgun", hundreds_number=2)) == 200
+
+    def test_stop_before_monthly_cap_is_used_up(self, mock_tweepy_client, tmp_path):
+        mock_search = mock_tweepy_client.search_recent_tweets = MagicMock(side_effect=self.pages(100, 100, 100))
+        caps = TweetCapLedger(tmp_path.joinpath("caps.db"), 255)
+        client = Client(mock_tweepy_client, tweet_caps=caps)
+
+        # the last page is shrunk to the remaining allowance
+        client.search_tweets("puntgun")
+        assert [c.kwargs["max_results"] for c in mock_search.call_args_list] == [100, 100, 55]
+        # the cap is used up (the responses don't respect max_results), no more query
+        assert client.search_tweets("again") == []
+        assert mock_search.call_count == 3
+        assert caps.consumed(client.token) == 300
+
+    def test_tweet_lookups_are_counted(self, mock_tweepy_client, tmp_path):
+        mock_tweepy_client.get_tweets = MagicMock(return_value=response_with(data=[{"id": 1}, {"id": 2}]))
+        caps = TweetCapLedger(tmp_path.joinpath("caps.db"), 255)
+        client = Client(mock_tweepy_client, tweet_caps=caps)
+
+        client.get_tweets_by_ids([1, 2])
+        assert caps.consumed(client.token) == 2
+
+    def test_plan_cap(self, mock_tweepy_client):
+        mock_search = mock_tweepy_client.search_recent_tweets = MagicMock(side_effect=self.pages(100, 100))
+        PlanTweetCap.start(105)
+
+        assert len(Client(mock_tweepy_client).search_tweets("puntgun")) == 100
+        # 5 tweets left can't afford the smallest page
+        assert mock_search.call_count == 1
+
+
+class TestRawResponses:
+    """Response bodies are parsed into raw dicts, entities are built without validation unless configured."""
+
+    raw_time = "2022-06-30T09:00:00.000Z"
+    raw_user = {
+        "id": "1",
+        "name": "Test User",
+        "username": "TestUser",
+        "pinned_tweet_id": "3",
+        "url": "https://t.co/1",
+        "entities": {"url": {"urls": [{"url": "https://t.co/1", "expanded_url": "exp"}]}},
+        "created_at": raw_time,
+        "public_metrics": {"followers_count": 1, "following_count": 2, "tweet_count": 3, "listed_count": 4},
+        "protected": False,
+    }
+    raw_tweet = {
+        "id": "3",
+        "author_id": "1",
+        "text": "text",
+        "created_at": raw_time,
+        "conversation_id": "3",
+        "reply_settings": "following",
+        "public_metrics": {"retweet_count": 1, "reply_count": 2, "like_count": 3, "quote_count": 4},
+        "context_annotations": [{"domain": {"id": "1", "name": "dn"}, "entity": {"id": "2", "name": "en"}}],
+        "referenced_tweets": [{"id": "4", "type": "quoted"}],
+        "geo": {"place_id": "1"},
+    }
+
+    @staticmethod
+    def http_response(body):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = orjson.dumps(body)
+        return resp
+
+    def test_users_are_same_as_validated(self):
+        body = {"data": [self.raw_user, {"id": "2"}], "includes": {"tweets": [self.raw_tweet]}}
+        raw = decode_raw_response(lambda: self.http_response(body))()
+        validated = decode_raw_response(lambda: self.http_response(body), validate=True)()
+
+        assert isinstance(raw, RawResponse)
+        assert not isinstance(validated, RawResponse)
+        assert [u.dict() for u in response_to_users(raw)] == [u.dict() for u in response_to_users(validated)]
+        user = response_to_users(raw)[0]
+        assert user.id == 1
+        assert user.url == "exp"
+        assert user.created_at == datetime.datetime(2022, 6, 30, 9, tzinfo=datetime.timezone.utc)
+        assert user.pinned_tweet_text == "text"
+
+    def test_tweets_are_same_as_validated(self):
+        body = {
+            "data": [self.raw_tweet],
+            "includes": {
+                "users": [self.raw_user],
+                "tweets": [dict(self.raw_tweet, id="4", referenced_tweets=None)],
+                "places": [{"id": "1", "full_name": "Manhattan, NY"}],
+            },
+        }
+        raw = response_to_tweets(decode_raw_response(lambda: self.http_response(body))())
+        validated = response_to_tweets(decode_raw_response(lambda: self.http_response(body), validate=True)())
+
+        assert [t.dict() for t in raw] == [t.dict() for t in validated]
+        assert raw[0].author.username == "TestUser"
+        assert raw[0].related_tweets["quoted"][0].id == 4
+        assert raw[0].reply_settings == ReplySettings.FOLLOWING
+        assert raw[0].place.full_name == "Manhattan, NY"
+
+    def test_client_requests_raw_responses(self, mock_tweepy_client, mock_configuration):
+        mock_configuration({"validate_responses": False})
+        mock_tweepy_client.get_users = MagicMock(return_value=self.http_response({"data": [self.raw_user]}))
+        client = Client(mock_tweepy_client)
+
+        assert mock_tweepy_client.return_type is requests.Response
+        assert client.get_users_by_ids([1])[0].username == "TestUser"
+
+    def test_empty_body(self):
+        resp = decode_raw_response(lambda: self.http_response({}))()
+        assert response_to_users(resp) == []
+
+
 test_time = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
 test_url = "https://example.com"
 common_user_data = {
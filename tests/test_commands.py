@@ -73,3 +73,11 @@ def test_gen_new_password(mock_secrets_config_file, mock_input):
     mock_input("new_pwd", "y")
     actual = secret.load_or_request_all_secrets(encrypto.load_or_generate_private_key())
     assert actual == {"ak": "ak", "aks": "aks", "at": "at", "ats": "ats"}
+
+
+def test_agent_status_and_stop_without_agent(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr("puntgun.conf.config.reload_important_files", MagicMock())
+    monkeypatch.setattr("puntgun.conf.config.config_path", tmp_path)
+    commands.Agent.status({})
+    commands.Agent.stop({})
+    assert capsys.readouterr().out.count("No secrets agent is running.") == 2
@@ -0,0 +1,103 @@
+import pytest
+
+from puntgun.client import RATE_LIMITS
+from puntgun.estimate import (
+    Estimate,
+    EstimateReport,
+    RelationshipSizes,
+    minimum_seconds,
+)
+from puntgun.rules.base import Plan
+from puntgun.rules.config_parser import ConfigParser
+
+
+@pytest.fixture
+def settings(mock_configuration):
+    mock_configuration({"block_follower": True, "block_following": False})
+
+
+def parse_plan(sources, actions=None):
+    return ConfigParser.parse({"user_plan": "plan", "from": sources, "do": actions or [{"block": {}}]}, Plan)
+
+
+def test_minimum_seconds():
+    # first window's quota is available at once
+    assert minimum_seconds("block", 50) == 0
+    assert minimum_seconds("block", 51) == 15 * 60
+    assert minimum_seconds("block", 1000) == 19 * 15 * 60
+    # lookups are balanced among credential sets
+    assert minimum_seconds("get_users", 1800, clients=2) == 0
+    # relationship list queries are pinned to the owner account
+    assert minimum_seconds("get_users_followers", 30, clients=2) == 15 * 60
+    assert minimum_seconds("unmetered", 10000) == 0
+
+
+def test_sizes_from_synced_mirror():
+    sizes = RelationshipSizes({"follower": 150000, "blocked": 3000}, synced=["blocked"])
+    assert sizes.pages("follower") == 150
+    # only the newest page is queried by the mirror
+    assert sizes.pages("blocked") == 1
+    assert sizes.pages("following") is None
+
+
+def test_estimate_follower_plan(settings):
+    plan = parse_plan([{"my_followers": {}}, {"ids": list(range(250))}])
+    sizes = RelationshipSizes({"follower": 150000, "blocked": 3000, "following": 500})
+
+    estimate = plan.estimate(sizes)
+    assert estimate.users == 150250
+    assert estimate.lists == {"blocked", "following"}
+
+    report = EstimateReport("plan", estimate, sizes)
+    assert report.calls == {
+        "get_users_followers": 150,
+        "get_users": 3,
+        "block": 150250,
+        "get_blocked": 3,
+        "get_users_following": 1,
+    }
+    assert report.bottleneck() == "block"
+    assert report.minimum_seconds() == (150250 // 50 - 1) * 15 * 60
+    assert "at least" not in str(report)
+
+
+def test_relationship_lists_are_loaded_once_among_plans(settings):
+    sizes = RelationshipSizes({"follower": 20000, "blocked": 20000, "following": 0})
+    plans = [parse_plan([{"my_followers": {"first": 10}}]), parse_plan([{"names": ["a", "b"]}])]
+
+    report = EstimateReport("all", Estimate.sum(p.estimate(sizes) for p in plans), sizes)
+    assert report.calls["get_users_followers"] == 20
+    assert report.calls["get_blocked"] == 20
+    assert report.calls["block"] == 12
+    # 20 pages of both lists, the second window is needed
+    assert report.minimum_seconds() == 15 * 60
+
+
+def test_report_unknown_sizes(settings):
+    report = EstimateReport(
+        "plan", parse_plan([{"my_followers": {}}]).estimate(RelationshipSizes()), RelationshipSizes()
+    )
+    assert report.estimate.users is None
+    text = str(report)
+    assert "Source users: unknown" in text
+    assert "at least" in text
+    assert "size of your follower list" in text
+    assert "size of your blocked list" in text
+
+
+def test_looked_up_users_need_no_relationship_list(settings):
+    sizes = RelationshipSizes({"blocked": 3000, "following": 500})
+    estimate = parse_plan([{"names": ["a"]}, {"ids": list(range(499))}]).estimate(sizes)
+    # relationships come with the looked up users
+    assert estimate.lists == set()
+    assert EstimateReport("plan", estimate, sizes).calls == {"get_users_by": 1, "get_users": 5, "block": 500}
+
+
+def test_pooled_lookups_over_owner_quota_need_relationship_lists(settings, monkeypatch):
+    monkeypatch.setitem(RATE_LIMITS, "get_users", (2, 900))
+    sizes = RelationshipSizes({"blocked": 3000, "following": 500})
+    plan = parse_plan([{"ids": list(range(299))}])
+    assert plan.estimate(sizes, clients=1).lists == set()
+    # the third lookup is sent by an extra credential set, whose users come without relationships
+    assert plan.estimate(sizes, clients=2).lists == {"blocked", "following"}
+    assert parse_plan([{"ids": list(range(199))}]).estimate(sizes, clients=2).lists == set()
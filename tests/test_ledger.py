@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from puntgun.client import RateLimitScheduler
+from puntgun.ledger import BudgetLedger, PlanTweetCap, TweetCapLedger, token_identity
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def ledger_file(tmp_path):
+    return tmp_path.joinpath("ledger.db")
+
+
+def test_processes_share_the_budget(ledger_file, clock):
+    """Each ledger instance has its own connection to the file, like one process."""
+    a, b = BudgetLedger(ledger_file, clock), BudgetLedger(ledger_file, clock)
+
+    assert [a.reserve("t", "block", 2, 100), b.reserve("t", "block", 2, 100)] == [1000, 1000]
+    # the budget is used up by two processes, the third call waits for a window
+    assert a.reserve("t", "block", 2, 100) == 1100
+    assert b.next_slot("t", "block", 2, 100) == 1100
+
+
+def test_budgets_are_separated_by_token_and_endpoint(ledger_file, clock):
+    ledger = BudgetLedger(ledger_file, clock)
+    ledger.reserve("t", "block", 1, 100)
+
+    assert ledger.reserve("another", "block", 1, 100) == 1000
+    assert ledger.reserve("t", "get_users", 1, 100) == 1000
+
+
+def test_spent_calls_come_back_after_window(ledger_file, clock):
+    ledger = BudgetLedger(ledger_file, clock)
+    ledger.reserve("t", "block", 1, 100)
+    clock.now += 100
+    assert ledger.reserve("t", "block", 1, 100) == 1100
+
+
+def test_concurrent_reservations_never_take_same_slot(ledger_file, clock):
+    ledgers = [BudgetLedger(ledger_file, clock) for _ in range(4)]
+    with ThreadPoolExecutor(4) as pool:
+        slots = list(pool.map(lambda i: ledgers[i % 4].reserve("t", "block", 1, 10), range(20)))
+
+    assert sorted(slots) == [1000 + 10 * i for i in range(20)]
+
+
+def test_token_identity_hides_secrets():
+    identity = token_identity("consumer", "access")
+    assert "consumer" not in identity and "access" not in identity
+    assert identity == token_identity("consumer", "access")
+    assert identity != token_identity("consumer", "another")
+
+
+def test_scheduler_waits_for_slots_taken_by_others(ledger_file, clock):
+    other = BudgetLedger(ledger_file, clock)
+    for _ in range(2):
+        other.reserve("t", "block", 2, 100)
+
+    slept = []
+    scheduler = RateLimitScheduler(
+        {"block": (2, 100)}, clock, slept.append, ledger=BudgetLedger(ledger_file, clock), token="t"
+    )
+    scheduler.acquire("block")
+    assert slept == [100]
+    # the second call taken by the other process comes back at the same time
+    assert scheduler.next_slot_at("block").timestamp() == 1100
+
+
+def test_disabled_by_settings(mock_configuration):
+    mock_configuration({"budget_ledger": False})
+    assert BudgetLedger.from_settings() is None
+
+
+class TestTweetCapLedger:
+    @pytest.fixture
+    def ledger(self, ledger_file, clock):
+        # 2022-06-16 00:00:00 UTC, the middle of the month
+        clock.now = 1655337600
+        return TweetCapLedger(ledger_file, 100, clock)
+
+    def test_account_tweets_per_token(self, ledger):
+        ledger.consume("t", 30)
+        ledger.consume("t", 20)
+        ledger.consume("another", 1)
+        assert ledger.consumed("t") == 50
+        assert ledger.remaining("t") == 50
+        assert ledger.remaining("nobody") == 100
+
+    def test_file_is_created_on_first_consumption(self, ledger, ledger_file):
+        assert ledger.remaining("t") == 100
+        assert ledger.usage() == {}
+        assert not ledger_file.exists()
+
+        ledger.consume("t", 1)
+        assert ledger_file.exists()
+        assert list(ledger.usage()) == ["t"]
+
+    def test_reset_every_month(self, ledger, clock):
+        ledger.consume("t", 100)
+        assert ledger.remaining("t") == 0
+        clock.now += 15 * 24 * 3600
+        assert ledger.remaining("t") == 100
+
+    def test_project_usage_at_month_end(self, ledger):
+        ledger.consume("t", 40)
+        usage = ledger.usage()["t"]
+        assert (usage.consumed, usage.remaining, usage.projected) == (40, 60, 80)
+        assert "80 projected" in str(usage)
+
+
+def test_plan_tweet_cap():
+    PlanTweetCap.start(10)
+    PlanTweetCap.consume(4)
+    assert PlanTweetCap.allowed() == 6
+    PlanTweetCap.consume(10)
+    assert PlanTweetCap.allowed() == 0
+
+    PlanTweetCap.start(None)
+    PlanTweetCap.consume(4)
+    assert PlanTweetCap.allowed() is None
@@ -46,7 +46,10 @@ def test_parse_plans_fail(mock_configuration, clean_config_parser_errors):
 def test_execute_success(mock_record_logger, mock_plan_configuration):
     runner.execute_plans(runner.parse_plans_config(runner.get_and_validate_plan_config()))
     records_in_report = load_report(mock_record_logger.get_content()).get("records")
-    assert_that(records_in_report, contains_inanyorder(*[{"type": "tr", "data": {"v": i}} for i in range(4)]))
+    plan_records = [r for r in records_in_report if r["type"] == "tr"]
+    assert_that(plan_records, contains_inanyorder(*[{"type": "tr", "data": {"v": i}} for i in range(4)]))
+    # API call metrics of the run are recorded after plan results
+    assert records_in_report[-1]["type"] == "api_telemetry"
 
 
 class TResult(Recordable):
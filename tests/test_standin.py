@@ -0,0 +1,85 @@
+import pytest
+import requests
+import tweepy
+
+from puntgun.client import Client, RetryPolicy, TwitterClientError, is_rate_limited
+from puntgun.standin import StandInWorld, serve
+from puntgun.transport import TunedSession
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def world():
+    return StandInWorld(users=5000, followers=2500, following=30, blocked=1500, missing_every=7, clock=FakeClock())
+
+
+@pytest.fixture
+def client(world):
+    server = serve(world)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    clt = tweepy.Client(consumer_key="k", consumer_secret="s", access_token="1-standin", access_token_secret="ts")
+    # don't wait for the rate limit reset, verify the 429 response instead
+    yield Client(clt, session=TunedSession(4, (5, 5), base_url), retry=RetryPolicy(retry_rate_limited=False))
+    server.shutdown()
+
+
+def test_me(client):
+    assert client.id == 1
+    assert client.me.username == "user1"
+
+
+def test_lookup_with_partial_errors(client, monkeypatch):
+    recorded = []
+    monkeypatch.setattr("puntgun.client.Recorder.record", recorded.append)
+    users = client.get_users_by_ids([1, 7, 8], fields={"followers_count"})
+    assert [u.id for u in users] == [1, 8]
+    assert users[1].followers_count == 8
+    # the missing user is recorded as an api error
+    assert recorded[0][0].value == "7"
+    assert client.get_users_by_usernames(["user2"])[0].id == 2
+
+
+def test_relationships_of_looked_up_users(client, world):
+    users = client.get_users_by_ids([2, world.followers + 2, world.users, 1])
+    assert [u.connection_status for u in users] == [["followed_by"], ["following"], ["blocking"], []]
+
+
+def test_real_pagination(client):
+    followers = client.get_follower(1)
+    assert len(followers) == 2500
+    assert followers[0].id == 2501
+
+
+def test_blocking_is_reflected_in_blocked_list(client):
+    assert client.block_user_by_id(5)
+    blocked = client.get_blocked()
+    assert len(blocked) == 1501
+    assert blocked[0].id == 5
+
+
+def test_rate_limit_headers_and_429(client, world):
+    for _ in range(15):
+        client.get_following(1)
+    with pytest.raises(TwitterClientError) as e:
+        client.get_following(1)
+    assert is_rate_limited(e.value)
+    # limits are reset after the window
+    world.clock.now += 15 * 60 + 1
+    assert len(client.get_following(1)) == 30
+
+
+def test_rate_limit_headers(world):
+    server = serve(world)
+    try:
+        resp = requests.get(f"http://127.0.0.1:{server.server_address[1]}/2/users/me")
+        assert resp.headers["x-rate-limit-limit"] == "75"
+        assert resp.headers["x-rate-limit-remaining"] == "74"
+    finally:
+        server.shutdown()
@@ -0,0 +1,110 @@
+from unittest.mock import MagicMock
+
+import orjson
+import pytest
+import tweepy
+
+from puntgun.client import Client, RateLimitScheduler
+from puntgun.record import Record
+from puntgun.standin import StandInWorld, serve
+from puntgun.telemetry import Telemetry, TelemetrySummary
+from puntgun.transport import TunedSession
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def telemetry(clock):
+    return Telemetry(clock)
+
+
+def test_timed_calls(telemetry, clock):
+    def slow(seconds):
+        clock.now += seconds
+        return seconds
+
+    def failing():
+        raise ValueError()
+
+    timed = telemetry.timed("get_users", slow)
+    assert timed(0.3) == 0.3
+    timed(7)
+    with pytest.raises(ValueError):
+        telemetry.timed("get_users", failing)()
+
+    metrics = telemetry.snapshot()["get_users"]
+    assert metrics["calls"] == 3
+    assert metrics["errors"] == 1
+    assert metrics["latency"]["max"] == 7
+    assert metrics["latency"]["buckets"]["0.05"] == 1
+    assert metrics["latency"]["buckets"]["0.5"] == 2
+    assert metrics["latency"]["buckets"]["10"] == 3
+    assert metrics["latency"]["buckets"]["+Inf"] == 3
+
+
+def test_response_headers_are_attributed_to_calling_endpoint(telemetry):
+    response = MagicMock(status_code=429, headers={"x-rate-limit-remaining": "0", "x-rate-limit-reset": "1700"})
+    # responses out of endpoint calls are ignored
+    telemetry.response_hook(response)
+    assert telemetry.snapshot() == {}
+
+    # the innermost endpoint gets the response, the outer one is restored after the inner call
+    inner = telemetry.timed("get_blocked", lambda: telemetry.response_hook(response))
+    outer = telemetry.timed("block", lambda: (inner(), telemetry.response_hook(MagicMock(status_code=200, headers={}))))
+    outer()
+
+    metrics = telemetry.snapshot()
+    assert metrics["get_blocked"]["rate_limited"] == 1
+    assert metrics["get_blocked"]["rate_limit"] == {"limit": None, "remaining": 0, "reset": 1700}
+    assert metrics["block"]["rate_limited"] == 0
+
+
+def test_install_hook_once(telemetry):
+    session = TunedSession(1, (1, 1))
+    telemetry.install(session)
+    telemetry.install(session)
+    assert session.hooks["response"] == [telemetry.response_hook]
+
+
+def test_scheduler_waits_are_recorded(telemetry, clock):
+    scheduler = RateLimitScheduler({"block": (1, 60)}, clock, MagicMock(), telemetry)
+    scheduler.acquire("block")
+    scheduler.acquire("block")
+    assert telemetry.snapshot()["block"]["waited"] == {"count": 1, "seconds": 60}
+
+
+def test_summary_record(telemetry):
+    telemetry.observe_call("get_users", 0.2)
+    summary = telemetry.summary()
+    record = Record.parse_from_dict(orjson.loads(summary.to_record().to_json()))
+    assert TelemetrySummary.parse_from_record(record).endpoints == summary.endpoints
+    assert "get_users" in str(summary)
+
+
+def test_capture_from_real_responses():
+    Telemetry.singleton().reset()
+    server = serve(StandInWorld(users=3000, followers=2500, blocked=0))
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        clt = tweepy.Client(consumer_key="k", consumer_secret="s", access_token="1-t", access_token_secret="ts")
+        Client(clt, session=TunedSession(2, (5, 5), base_url)).get_follower(1)
+    finally:
+        server.shutdown()
+
+    metrics = Telemetry.singleton().snapshot()
+    assert metrics["get_me"]["calls"] == 1
+    assert metrics["get_users_followers"]["calls"] == 3
+    assert metrics["get_users_followers"]["rate_limit"]["limit"] == 15
+    assert metrics["get_users_followers"]["rate_limit"]["remaining"] == 12
+    assert "request" not in metrics
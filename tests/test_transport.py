@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock, patch
+
+import tweepy
+
+from puntgun.client import Client
+from puntgun.transport import TunedSession, build_http_session
+
+
+def test_default_timeout_on_every_request():
+    session = TunedSession(4, (1, 2))
+    with patch("requests.Session.request") as mock_request:
+        session.request("GET", "https://api.twitter.com")
+        session.request("GET", "https://api.twitter.com", timeout=5)
+    assert mock_request.call_args_list[0].kwargs["timeout"] == (1, 2)
+    assert mock_request.call_args_list[1].kwargs["timeout"] == 5
+
+
+def test_redirect_to_base_url():
+    session = TunedSession(4, (1, 2), "http://localhost:8000/")
+    with patch("requests.Session.request") as mock_request:
+        session.request("GET", "https://api.twitter.com/2/users", {"ids": "1"})
+        session.request(b"GET", b"https://api.twitter.com/2/users")
+    for call in mock_request.call_args_list:
+        assert call.args[1] == "http://localhost:8000/2/users"
+    # other arguments are forwarded as they are
+    assert mock_request.call_args_list[0].args[2] == {"ids": "1"}
+
+
+def test_pool_and_compression():
+    session = TunedSession(4, (1, 2))
+    adapter = session.get_adapter("https://api.twitter.com")
+    assert adapter._pool_maxsize == 4
+    assert "gzip" in session.headers["Accept-Encoding"]
+
+
+def test_build_from_settings(mock_configuration):
+    mock_configuration({"http_pool_size": 8, "http_connect_timeout": 3, "http_read_timeout": 4})
+    session = build_http_session()
+    assert session.timeout == (3, 4)
+    assert session.get_adapter("https://api.twitter.com")._pool_maxsize == 8
+
+
+def test_clients_share_session():
+    session = TunedSession(4, (1, 2))
+    one, another = [MagicMock(get_me=MagicMock(return_value=tweepy.Response({}, {}, [], {}))) for _ in range(2)]
+    Client(one, session=session)
+    Client(another, session=session)
+    assert one.session is another.session is session
+    # a real tweepy client sends requests through the given session
+    real = tweepy.Client("token")
+    real.session = session
+    with patch("requests.Session.request", side_effect=RuntimeError("sent")) as mock_request:
+        try:
+            real.get_user(id=1)
+        except RuntimeError:
+            pass
+    assert mock_request.call_args.kwargs["timeout"] == (1, 2)
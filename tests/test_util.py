@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from puntgun.util import SingleFlight, single_flight_method
+
+
+class SlowLoader:
+    """Hold loads until released, counting how many times it's called."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        return [self.calls]
+
+
+def test_concurrent_callers_share_one_load():
+    loader = SlowLoader()
+    flight = SingleFlight(loader)
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flight) for _ in range(8)]
+        loader.release.set()
+        results = [f.result() for f in futures]
+
+    assert loader.calls == 1
+    assert all(r is results[0] for r in results)
+    # later calls hit the loaded value
+    assert flight() is results[0]
+
+
+def test_failure_is_not_cached():
+    outcomes = [ValueError("boom"), "ok"]
+
+    def loader():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    flight = SingleFlight(loader)
+    with pytest.raises(ValueError):
+        flight()
+    assert flight() == "ok"
+
+
+def test_refresh():
+    loader = SlowLoader()
+    loader.release.set()
+    flight = SingleFlight(loader)
+
+    assert flight() == [1]
+    assert flight.refresh() == [2]
+    assert flight() == [2]
+
+    flight.invalidate()
+    assert flight() == [3]
+
+
+def test_single_flight_method_per_instance():
+    class Owner:
+        def __init__(self, value):
+            self.value = value
+            self.loads = 0
+
+        @single_flight_method
+        def load(self):
+            self.loads += 1
+            return self.value
+
+    a, b = Owner(1), Owner(2)
+    assert (a.load(), a.load(), b.load()) == (1, 1, 2)
+    assert (a.loads, b.loads) == (1, 1)
+
+    a.value = 3
+    assert a.load.refresh() == 3
+    assert b.load() == 2